@@ -0,0 +1,228 @@
+"""Benchmark the sample data pipeline in generate_sample_data.py
+
+Each scale runs in a fresh process so peak RSS belongs to that run alone.
+Documents go either to a pure in-memory client or, with --client emulator,
+to the Firestore emulator at FIRESTORE_EMULATOR_HOST. Every batch commit is
+timed, which gives the write latency percentiles and splits CPU time into
+generation (everything outside commit()) and I/O (inside commit()).
+
+Results are compared against a JSON baseline; --save writes a new one.
+
+    python benchmark_sample_data.py --scales 100,1000,10000
+    python benchmark_sample_data.py --save
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python benchmark_sample_data.py --client emulator
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+
+import generate_sample_data as seeder
+
+CLIENTS = ('memory', 'emulator')
+DEFAULT_SCALES = (100, 1000, 5000)
+DEFAULT_BASELINE_PATH = 'benchmark_baseline.json'
+
+# A run counts as a regression once docs/sec drops (or peak RSS grows) by
+# more than this fraction of the baseline
+DEFAULT_TOLERANCE = 0.2
+
+# Stages that write fewer documents than this finish too quickly to compare
+MIN_COMPARED_DOCUMENTS = 100
+
+# Fixed seed and reference time so every run generates the same documents
+BENCHMARK_SEED = 1
+BENCHMARK_TIME = datetime.datetime(2025, 1, 1)
+
+class TimedClient:
+    """Wrap a Firestore client so every batch commit is timed"""
+
+    def __init__(self, client):
+        self.client = client
+        self.latencies = []
+        self.io_cpu = 0.0
+
+    def batch(self):
+        return TimedBatch(self, self.client.batch())
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+class TimedBatch:
+    def __init__(self, timer, batch):
+        self.timer = timer
+        self.batch = batch
+
+    def commit(self):
+        start, start_cpu = time.perf_counter(), time.process_time()
+        try:
+            return self.batch.commit()
+        finally:
+            self.timer.latencies.append(time.perf_counter() - start)
+            self.timer.io_cpu += time.process_time() - start_cpu
+
+    def __getattr__(self, name):
+        return getattr(self.batch, name)
+
+def peak_rss_mb():
+    """Return this process's peak resident set size in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes everywhere else
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+def reset_emulator():
+    """Delete every document in the emulator's database"""
+    project = os.environ.get('GCLOUD_PROJECT', seeder.EMULATOR_PROJECT)
+    url = (f"http://{os.environ['FIRESTORE_EMULATOR_HOST']}/emulator/v1/projects/{project}"
+           f"/databases/(default)/documents")
+    urllib.request.urlopen(urllib.request.Request(url, method='DELETE')).close()
+
+def run_stage(client, batch_size, fn):
+    """Run fn(writer) on a fresh BatchWriter and measure it"""
+    first_commit = len(client.latencies)
+    io_cpu = client.io_cpu
+    start, start_cpu = time.perf_counter(), time.process_time()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        with seeder.BatchWriter(client, batch_size=batch_size) as writer:
+            fn(writer)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - start_cpu
+    io_cpu = client.io_cpu - io_cpu
+    latencies = client.latencies[first_commit:]
+    return {
+        'documents': writer.committed,
+        'batches': writer.batches,
+        'seconds': round(elapsed, 4),
+        'docs_per_sec': round(writer.committed / elapsed, 1) if elapsed else None,
+        'commit_p50_ms': round(seeder.percentile(latencies, 50) * 1000, 3) if latencies else None,
+        'commit_p99_ms': round(seeder.percentile(latencies, 99) * 1000, 3) if latencies else None,
+        'generation_cpu_seconds': round(cpu - io_cpu, 4),
+        'io_cpu_seconds': round(io_cpu, 4),
+        'io_wait_seconds': round(max(0.0, sum(latencies) - io_cpu), 4)
+    }
+
+def run_scale(client_kind, num_users, batch_size=seeder.MAX_BATCH_SIZE, commit_latency=0.0):
+    """Benchmark generate_metadata(), generate_user() and generate_social_graph() for num_users"""
+    if client_kind == 'emulator':
+        reset_emulator()
+        client = TimedClient(seeder.get_db())
+    else:
+        client = TimedClient(seeder.MemoryClient(commit_latency))
+    seed, now = BENCHMARK_SEED, BENCHMARK_TIME
+    user_ids = [seeder.user_id_for(seed, index) for index in range(num_users)]
+
+    def users(writer):
+        for index, user_id in enumerate(user_ids):
+            rng = seeder.seeded_rng(seed, 'user', index)
+            seeder.generate_user(writer, seeder.synthetic_user(index, rng), user_id=user_id, now=now, rng=rng)
+
+    stages = {
+        'metadata': run_stage(client, batch_size, seeder.generate_metadata),
+        'users': run_stage(client, batch_size, users),
+        'social_graph': run_stage(client, batch_size,
+                                  lambda writer: seeder.generate_social_graph(user_ids, writer, seed))
+    }
+    return {'users': num_users, 'peak_rss_mb': round(peak_rss_mb(), 1), 'stages': stages}
+
+def run_benchmark(client_kind='memory', scales=DEFAULT_SCALES, batch_size=seeder.MAX_BATCH_SIZE,
+                  commit_latency=0.0):
+    """Run every scale in its own process and collect the results"""
+    context = multiprocessing.get_context('spawn')
+    runs = {}
+    for num_users in scales:
+        print(f"Benchmarking {num_users} users against the {client_kind} client...")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            run = pool.submit(run_scale, client_kind, num_users, batch_size, commit_latency).result()
+        for name, stage in run['stages'].items():
+            print(f"  {name:>12}: {stage['documents']:>8} docs  {stage['docs_per_sec'] or 0:>9.0f} docs/sec  "
+                  f"p50 {stage['commit_p50_ms'] or 0:.1f} ms  p99 {stage['commit_p99_ms'] or 0:.1f} ms  "
+                  f"cpu {stage['generation_cpu_seconds']:.2f}s gen / {stage['io_cpu_seconds']:.2f}s io")
+        print(f"  peak RSS {run['peak_rss_mb']:.1f} MB")
+        runs[str(num_users)] = run
+    return {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'client': client_kind,
+        'batch_size': batch_size,
+        'commit_latency_ms': commit_latency * 1000,
+        'runs': runs
+    }
+
+def find_regressions(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Return a message for every stage that is slower, or run that uses more memory, than the baseline"""
+    regressions = []
+    for scale, run in results['runs'].items():
+        base = baseline.get('runs', {}).get(scale)
+        if base is None:
+            continue
+        if run['peak_rss_mb'] > base['peak_rss_mb'] * (1 + tolerance):
+            regressions.append(f"{scale} users: peak RSS {run['peak_rss_mb']} MB vs {base['peak_rss_mb']} MB")
+        for name, stage in run['stages'].items():
+            base_stage = base['stages'].get(name)
+            if not base_stage or min(stage['documents'], base_stage['documents']) < MIN_COMPARED_DOCUMENTS:
+                continue
+            if stage['docs_per_sec'] < base_stage['docs_per_sec'] * (1 - tolerance):
+                regressions.append(f"{scale} users, {name}: {stage['docs_per_sec']:.0f} docs/sec "
+                                   f"vs {base_stage['docs_per_sec']:.0f} docs/sec")
+    return regressions
+
+def parse_scales(value):
+    """Parse a comma-separated list of user counts such as '100,1000,5000'"""
+    try:
+        scales = [int(scale) for scale in value.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected user counts like 100,1000,5000, got {value!r}")
+    if any(scale < 1 for scale in scales):
+        raise argparse.ArgumentTypeError(f"invalid scales {value!r}")
+    return scales
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark FitCheck sample data generation")
+    parser.add_argument('--client', choices=CLIENTS, default='memory',
+                        help="write to an in-memory client or the emulator at FIRESTORE_EMULATOR_HOST (default: memory)")
+    parser.add_argument('--scales', type=parse_scales, default=list(DEFAULT_SCALES), metavar='N,N,...',
+                        help="user counts to benchmark (default: 100,1000,5000)")
+    parser.add_argument('--batch-size', type=int, default=seeder.MAX_BATCH_SIZE,
+                        help=f"writes per committed batch (max {seeder.MAX_BATCH_SIZE})")
+    parser.add_argument('--commit-latency', type=float, default=0.0, metavar='MS',
+                        help="simulated round trip per commit for the memory client (default: 0)")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE_PATH,
+                        help=f"baseline results to compare against (default: {DEFAULT_BASELINE_PATH})")
+    parser.add_argument('--save', action='store_true',
+                        help="write the results to the baseline file instead of comparing")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f"allowed slowdown before a stage counts as a regression (default: {DEFAULT_TOLERANCE})")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.client == 'emulator' and not os.environ.get('FIRESTORE_EMULATOR_HOST'):
+        raise SystemExit("--client emulator needs FIRESTORE_EMULATOR_HOST, e.g. localhost:8080")
+    results = run_benchmark(args.client, args.scales, args.batch_size, args.commit_latency / 1000)
+
+    if args.save or not os.path.exists(args.baseline):
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for setting in ('client', 'batch_size', 'commit_latency_ms'):
+            if baseline.get(setting) != results[setting]:
+                raise SystemExit(f"{args.baseline} was recorded with {setting}={baseline.get(setting)!r}; "
+                                 f"rerun with matching options or --save a new baseline")
+        regressions = find_regressions(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
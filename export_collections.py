@@ -0,0 +1,203 @@
+"""Snapshot Firestore collections to local files to build fixtures from real data
+
+Each collection group is split into ranges with a partition query, and a
+pool of workers reads the partitions concurrently, paging through each one
+with start_after cursors so no stream stays open for long. Documents are
+streamed straight into FileSink files, one set per partition, in the layout
+export_sample_data() writes, so `generate_sample_data.py load` can replay a
+snapshot into the emulator.
+
+With --anonymize, names, emails and photo URLs are replaced by pseudonyms
+derived from the owning user's ID, so every copy of a user (the profile,
+feed posts, check-ins, comments) still agrees after anonymization.
+
+    python export_collections.py --output prod_snapshot --anonymize
+    python export_collections.py --collections feed,stories --format parquet --workers 16
+"""
+import argparse
+import hashlib
+import os
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import generate_sample_data as seeder
+
+# Collection groups read by default; checkIns, following and followers are
+# the users/{id} subcollections
+DEFAULT_COLLECTION_GROUPS = ('users', 'feed', 'stories', 'checkIns', 'following', 'followers')
+
+DEFAULT_OUTPUT_DIR = 'firestore_snapshot'
+DEFAULT_WORKERS = 8
+DEFAULT_PAGE_SIZE = 1000
+
+# Partitions requested per worker; more, smaller partitions keep the pool
+# busy when some ranges hold far more documents than others
+PARTITIONS_PER_WORKER = 4
+
+# Fields holding personal data, by what replaces them
+NAME_FIELDS = ('displayName', 'userDisplayName')
+PHOTO_FIELDS = ('photoURL', 'userPhotoURL')
+EMAIL_FIELDS = ('email',)
+
+class Anonymizer:
+    """Replace names, emails and photo URLs with pseudonyms of the owning user
+
+    A user's pseudonym is a name from the seeder's first/last name lists
+    picked by a salted hash of their user ID. Without a fixed salt every run
+    draws a new one, so pseudonyms cannot be matched to user IDs by hashing
+    them again.
+    """
+
+    def __init__(self, salt=None):
+        self.salt = salt or secrets.token_hex(16)
+
+    def pseudonym(self, user_id):
+        digest = hashlib.sha256(f"{self.salt}/{user_id}".encode()).digest()
+        index = int.from_bytes(digest[:8], 'big')
+        first = seeder.first_names[index % len(seeder.first_names)]
+        last = seeder.last_names[index // len(seeder.first_names) % len(seeder.last_names)]
+        return f"{first} {last}", digest[8:12].hex()
+
+    def anonymize(self, path, doc_id, data):
+        """Return data with its personal fields replaced; users/{id} documents belong to id"""
+        owner = doc_id if path == 'users' else data.get('userId')
+        if owner is None or not any(field in data for field in NAME_FIELDS + PHOTO_FIELDS + EMAIL_FIELDS):
+            return data
+        name, tag = self.pseudonym(owner)
+        data = dict(data)
+        for field in NAME_FIELDS:
+            if data.get(field) is not None:
+                data[field] = name
+        for field in PHOTO_FIELDS:
+            if data.get(field) is not None:
+                data[field] = f"https://ui-avatars.com/api/?name={name.replace(' ', '+')}&background=random&size=200"
+        for field in EMAIL_FIELDS:
+            if data.get(field) is not None:
+                data[field] = f"user-{tag}@example.com"
+        return data
+
+def plain_value(value):
+    """Convert the Firestore types FileSink cannot write (references, geo points) to plain values
+
+    Bytes fields are left as they are: FileSink tags them in NDJSON and
+    stores them as binary columns in Parquet, so they load back as bytes.
+    """
+    if isinstance(value, dict):
+        return {key: plain_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [plain_value(item) for item in value]
+    if hasattr(value, 'latitude') and hasattr(value, 'longitude'):
+        return {'latitude': value.latitude, 'longitude': value.longitude}
+    if hasattr(value, 'path') and hasattr(value, 'parent'):
+        # A DocumentReference is kept as its path
+        return value.path
+    return value
+
+def partition_queries(db, collection_group, partition_count):
+    """Return the queries of up to partition_count disjoint ranges covering collection_group"""
+    partitions = list(db.collection_group(collection_group).get_partitions(partition_count))
+    return [partition.query() for partition in partitions]
+
+def query_pages(query, page_size=DEFAULT_PAGE_SIZE):
+    """Yield the documents of a partition query page by page
+
+    Partition queries are ordered by document name, so each page starts
+    after the last document of the one before and keeps the partition's
+    end cursor.
+    """
+    query = query.limit(page_size)
+    cursor = None
+    while True:
+        page = list((query if cursor is None else query.start_after(cursor)).stream())
+        yield from page
+        if len(page) < page_size:
+            return
+        cursor = page[-1]
+
+def export_collections(output_dir=DEFAULT_OUTPUT_DIR, collection_groups=DEFAULT_COLLECTION_GROUPS, fmt='ndjson',
+                       workers=DEFAULT_WORKERS, page_size=DEFAULT_PAGE_SIZE, anonymizer=None, metrics=None):
+    """Read every document of collection_groups from Firestore into output_dir
+
+    Every partition is written to its own files (feed-p0003.ndjson.gz and so
+    on), so workers never share a file and nothing is buffered beyond one
+    page and one Parquet row group per worker.
+    """
+    db = seeder.get_db()
+    metrics = metrics or seeder.SeedMetrics()
+    workers = max(1, workers)
+    start = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"Partitioning {', '.join(collection_groups)}...")
+    tasks = []
+    for collection_group in collection_groups:
+        queries = partition_queries(db, collection_group, workers * PARTITIONS_PER_WORKER)
+        tasks += [(collection_group, index, query) for index, query in enumerate(queries)]
+    print(f"Exporting {len(tasks)} partitions to {output_dir} with {workers} workers...")
+    metrics.stage('export', len(tasks))
+
+    def export_partition(task):
+        collection_group, index, query = task
+        with seeder.FileSink(output_dir, fmt, suffix=f"-p{index:04}", metrics=metrics) as sink:
+            for snapshot in query_pages(query, page_size):
+                path = snapshot.reference.path.rpartition('/')[0]
+                data = plain_value(snapshot.to_dict())
+                if anonymizer is not None:
+                    data = anonymizer.anonymize(path, snapshot.id, data)
+                sink.set(path, snapshot.id, data)
+        return sink.written, sink.bytes_written
+
+    documents = 0
+    bytes_written = 0
+    failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for (collection_group, index, _), future in zip(tasks, [pool.submit(export_partition, task) for task in tasks]):
+            try:
+                written, size = future.result()
+                documents += written
+                bytes_written += size
+                metrics.advance()
+            except Exception as e:
+                failed += 1
+                metrics.record_error(f"Error exporting partition {index} of {collection_group}: {e}")
+    metrics.finish()
+
+    elapsed = time.perf_counter() - start
+    print(f"Exported {documents} documents ({bytes_written / 1e6:.1f} MB) to {output_dir} "
+          f"in {elapsed:.1f}s ({documents / elapsed:.0f} docs/sec)")
+    if failed:
+        print(f"{failed} partitions failed; their files are incomplete")
+    return documents
+
+def parse_collection_groups(value):
+    """Parse a comma-separated list of collection groups such as 'feed,checkIns'"""
+    groups = [group for group in value.split(',') if group]
+    if not groups or any('/' in group for group in groups):
+        raise argparse.ArgumentTypeError(f"expected collection group names like feed,checkIns, got {value!r}")
+    return groups
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Snapshot FitCheck Firestore collections to NDJSON or Parquet")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT_DIR,
+                        help=f"directory the snapshot is written to (default: {DEFAULT_OUTPUT_DIR})")
+    parser.add_argument('--format', choices=seeder.EXPORT_FORMATS, default='ndjson',
+                        help="file format of the snapshot (default: ndjson)")
+    parser.add_argument('--collections', type=parse_collection_groups, default=list(DEFAULT_COLLECTION_GROUPS),
+                        metavar='GROUP,...', help="collection groups to export (default: " + ','.join(DEFAULT_COLLECTION_GROUPS) + ")")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f"partitions read concurrently (default: {DEFAULT_WORKERS})")
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE,
+                        help=f"documents read per query page (default: {DEFAULT_PAGE_SIZE})")
+    parser.add_argument('--anonymize', action='store_true',
+                        help="replace names, emails and photo URLs with per-user pseudonyms")
+    parser.add_argument('--anonymize-salt',
+                        help="salt for the pseudonyms, to keep them stable across snapshots (default: random)")
+    parser.add_argument('--metrics-out', metavar='PATH',
+                        help="write run metrics to PATH at exit: JSON for a .json path, Prometheus text otherwise")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    anonymizer = Anonymizer(args.anonymize_salt) if args.anonymize or args.anonymize_salt else None
+    seeder.run_with_metrics(args, lambda metrics: export_collections(
+        args.output, args.collections, args.format, args.workers, args.page_size, anonymizer, metrics))
@@ -0,0 +1,160 @@
+"""Fit check-in distributions to a snapshot for generate_sample_data.py --distributions
+
+Reads a directory in the FileSink layout (a snapshot from
+export_collections.py, or the seeder's own export) and summarizes its
+check-ins into the spec that generate_sample_data.Distributions compiles:
+the workout, location and photo shares, every integer field and the
+activity, location and tag frequencies. Integer fields with few distinct
+values keep their exact frequencies; wider ones become a histogram of
+HISTOGRAM_BINS equal-width bins. Each fitness level found on the users
+documents with enough check-ins gets its own overrides.
+
+    python fit_distributions.py firestore_snapshot --output distributions.json
+    python generate_sample_data.py export --users 10000 --distributions distributions.json
+"""
+import argparse
+import json
+from collections import Counter
+
+import generate_sample_data as seeder
+
+# Integer fields with at most this many distinct values keep exact weights
+MAX_EXACT_VALUES = 64
+HISTOGRAM_BINS = 32
+
+# Fitness levels with fewer check-ins than this use the overall distributions
+MIN_LEVEL_CHECK_INS = 100
+
+# Collection groups check-ins are read from, in order of preference: the
+# seeder's users/{id}/checkIns copies, else the app's top-level collection
+CHECK_IN_GROUPS = ('users.checkIns', 'checkIns')
+
+class CheckInSummary:
+    """Frequencies of every distribution field over a set of check-ins"""
+
+    def __init__(self):
+        self.check_ins = 0
+        self.workouts = 0
+        self.with_location = 0
+        self.with_photo = 0
+        self.integers = {key: Counter() for key in seeder.INTEGER_DISTRIBUTIONS}
+        self.categories = {key: Counter() for key in seeder.CATEGORY_DISTRIBUTIONS}
+
+    def add(self, data):
+        self.check_ins += 1
+        for field in ('likes', 'comments'):
+            if isinstance(data.get(field), int):
+                self.integers[field][data[field]] += 1
+        if data.get('status') != 'workout':
+            return
+        self.workouts += 1
+        self.with_location += data.get('location') is not None
+        self.with_photo += data.get('photoUrl') is not None
+        for field in ('duration', 'intensity', 'mood'):
+            if isinstance(data.get(field), int):
+                self.integers[field][data[field]] += 1
+        tags = data.get('tags') or []
+        self.integers['tagCount'][len(tags)] += 1
+        self.categories['tags'].update(tags)
+        for key in ('activityType', 'location'):
+            if data.get(key) is not None:
+                self.categories[key][data[key]] += 1
+
+    def spec(self):
+        """Return the distributions spec of the summarized check-ins, leaving out fields never seen"""
+        spec = {'workoutShare': round(self.workouts / self.check_ins, 4)}
+        if self.workouts:
+            spec['locationShare'] = round(self.with_location / self.workouts, 4)
+            spec['photoShare'] = round(self.with_photo / self.workouts, 4)
+        for key, counts in self.integers.items():
+            if counts:
+                spec[key] = fit_integer(counts)
+        for key, counts in self.categories.items():
+            if counts:
+                spec[key] = {'weights': dict(counts.most_common())}
+        return spec
+
+def fit_integer(counts):
+    """Turn a Counter of integer values into exact weights or an equal-width histogram"""
+    values = sorted(counts)
+    if len(values) <= MAX_EXACT_VALUES:
+        return {'weights': {str(value): counts[value] for value in values}}
+    low, high = values[0], values[-1] + 1
+    width = -(-(high - low) // HISTOGRAM_BINS)
+    edges = list(range(low, high, width)) + [high]
+    bins = [0] * (len(edges) - 1)
+    for value, count in counts.items():
+        bins[min((value - low) // width, len(bins) - 1)] += count
+    return {'histogram': {'edges': edges, 'counts': bins}}
+
+def fit_distributions(input_dir, min_level_check_ins=MIN_LEVEL_CHECK_INS):
+    """Read the snapshot in input_dir and return its distributions spec"""
+    # The first pass only picks up fitness levels and which check-in group is there
+    levels = {}
+    groups = set()
+    for path, doc_id, data in seeder.read_exported_documents(input_dir):
+        group = seeder.collection_group_name(path)
+        if group == 'users':
+            levels[doc_id] = data.get('fitnessLevel')
+        elif group in CHECK_IN_GROUPS:
+            groups.add(group)
+    group = next((group for group in CHECK_IN_GROUPS if group in groups), None)
+    if group is None:
+        raise ValueError(f"No check-ins in {input_dir}; expected one of the {', '.join(CHECK_IN_GROUPS)} groups")
+
+    overall = CheckInSummary()
+    by_level = {}
+    per_user = Counter(dict.fromkeys(levels, 0))
+    for path, doc_id, data in seeder.read_exported_documents(input_dir):
+        if seeder.collection_group_name(path) != group:
+            continue
+        overall.add(data)
+        level = levels.get(data.get('userId'))
+        if level is not None:
+            by_level.setdefault(level, CheckInSummary()).add(data)
+        if data.get('userId') is not None:
+            per_user[data['userId']] += 1
+    for user_id, count in per_user.items():
+        overall.integers['checkInsPerUser'][count] += 1
+        level = levels.get(user_id)
+        if level in by_level:
+            by_level[level].integers['checkInsPerUser'][count] += 1
+
+    spec = overall.spec()
+    fitted_levels = {level: summary.spec() for level, summary in sorted(by_level.items())
+                     if summary.check_ins >= min_level_check_ins}
+    if fitted_levels:
+        spec['fitnessLevels'] = fitted_levels
+    print(f"Fitted {overall.check_ins} check-ins of {len(per_user)} users from {group}"
+          + (f", with overrides for {', '.join(fitted_levels)}" if fitted_levels else ""))
+    return spec
+
+def write_spec(spec, path):
+    """Write spec as YAML for a .yaml/.yml path (needs PyYAML) and as JSON otherwise"""
+    with open(path, 'w') as f:
+        if path.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("YAML output requires PyYAML (pip install pyyaml)")
+            yaml.safe_dump(spec, f, sort_keys=False)
+        else:
+            json.dump(spec, f, indent=2)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fit FitCheck check-in distributions to a Firestore snapshot")
+    parser.add_argument('input', help="snapshot directory, as written by export_collections.py")
+    parser.add_argument('--output', default='distributions.json',
+                        help="spec file to write, YAML for .yaml/.yml (default: distributions.json)")
+    parser.add_argument('--min-level-check-ins', type=int, default=MIN_LEVEL_CHECK_INS,
+                        help=f"check-ins a fitness level needs for its own overrides (default: {MIN_LEVEL_CHECK_INS})")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        spec = fit_distributions(args.input, args.min_level_check_ins)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    write_spec(spec, args.output)
+    print(f"Wrote distributions to {args.output}")
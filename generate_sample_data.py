@@ -1,15 +1,1224 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
+"""Generate FitCheck sample data, as a library and from the command line
+
+Importing the module does no I/O, and the Firestore client behind get_db()
+is only created on first use. generate_check_in() and generate_story()
+return plain documents; generate_user() and the other stages send theirs
+to a writer's set() and complete_unit(): a BatchWriter in front of the
+project in serviceAccountKey.json, the emulator or a MemoryClient (see
+DB_TARGETS and use_db()), or a FileSink writing NDJSON or Parquet files.
+
+Run as `python -m generate_sample_data` the CLI starts from the cached
+bytecode instead of compiling this file on every start.
+
+    python generate_sample_data.py generate --users 1000 --seed 7 --workers 8
+    python -m generate_sample_data generate --target memory --users 100
+    python generate_sample_data.py export --engine numpy --users 100000 --output sample_data_export
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python generate_sample_data.py load --input sample_data_export
+    python generate_sample_data.py clear
+"""
+import base64
 import datetime
+import bisect
+import hashlib
+import heapq
+import io
+import itertools
+import json
+import os
 import random
+import string
+import sys
+import threading
 import time
-import uuid
-from google.cloud.firestore_v1.transforms import SERVER_TIMESTAMP
+from array import array
+from collections import deque
+
+# Clients are created on first use and shared by every writer and worker
+# thread (a Firestore client pools its own gRPC channel), so importing this
+# module never reads credentials or opens a connection, and the generators and
+# the offline export work without the Firebase SDK installed
+_clients = {}
+_db_lock = threading.Lock()
+
+# Where get_db() writes: the project in serviceAccountKey.json, the local
+# emulator, or a MemoryClient in this process
+DB_TARGETS = ('firestore', 'emulator', 'memory')
+_db_target = None
+
+# Project used against the emulator when GCLOUD_PROJECT is not set; the demo-
+# prefix keeps the Firebase tools from ever reaching a real project
+EMULATOR_PROJECT = 'demo-fitcheck'
+DEFAULT_EMULATOR_HOST = 'localhost:8080'
+
+def use_db(target):
+    """Send every later get_db() call without a target to target, one of DB_TARGETS"""
+    global _db_target
+    if target not in DB_TARGETS:
+        raise ValueError(f"Unknown target {target!r}, expected one of {', '.join(DB_TARGETS)}")
+    _db_target = target
+
+def get_db(target=None):
+    """Return the shared client for target, creating it on first use
+
+    target defaults to the one chosen with use_db(), else to the emulator
+    when FIRESTORE_EMULATOR_HOST is set and to the project in
+    serviceAccountKey.json otherwise. The emulator target falls back to
+    DEFAULT_EMULATOR_HOST and needs no service account key.
+    """
+    target = target or _db_target or ('emulator' if os.environ.get('FIRESTORE_EMULATOR_HOST') else 'firestore')
+    with _db_lock:
+        if target not in _clients:
+            _clients[target] = _create_client(target)
+        return _clients[target]
+
+def _create_client(target):
+    if target == 'memory':
+        return MemoryClient()
+    if target == 'emulator':
+        from google.cloud import firestore
+
+        os.environ.setdefault('FIRESTORE_EMULATOR_HOST', DEFAULT_EMULATOR_HOST)
+        return firestore.Client(project=os.environ.get('GCLOUD_PROJECT', EMULATOR_PROJECT))
+    if target == 'firestore':
+        import firebase_admin
+        from firebase_admin import credentials, firestore
+
+        cred = credentials.Certificate('serviceAccountKey.json')
+        firebase_admin.initialize_app(cred)
+        return firestore.client()
+    raise ValueError(f"Unknown target {target!r}, expected one of {', '.join(DB_TARGETS)}")
+
+class MemoryClient:
+    """In-memory stand-in for a Firestore client
+
+    Implements only what BatchWriter uses: collection(path).document(id) and
+    batch() with set(), update() and delete(). Documents land in
+    self.documents keyed by path, with SERVER_TIMESTAMP set to the commit
+    time and Increment added to the stored value. commit_latency adds a fixed
+    delay per commit to mimic a network round trip.
+    """
+
+    resolves_placeholders = True
+
+    def __init__(self, commit_latency=0.0):
+        self.commit_latency = commit_latency
+        self.documents = {}
+        self.lock = threading.Lock()
+
+    def collection(self, path):
+        return MemoryCollection(path)
+
+    def batch(self):
+        return MemoryBatch(self)
+
+class MemoryCollection:
+    def __init__(self, path):
+        self.path = path
+
+    def document(self, doc_id):
+        return f"{self.path}/{doc_id}"
+
+class MemoryBatch:
+    def __init__(self, client):
+        self.client = client
+        self.writes = []
+
+    def set(self, ref, data):
+        self.writes.append((ref, dict(data)))
+
+    def update(self, ref, data):
+        self.writes.append((ref, ('update', data)))
+
+    def delete(self, ref):
+        self.writes.append((ref, None))
+
+    def commit(self):
+        if self.client.commit_latency:
+            time.sleep(self.client.commit_latency)
+        now = datetime.datetime.now(datetime.timezone.utc)
+        with self.client.lock:
+            documents = self.client.documents
+            for ref, data in self.writes:
+                if data is None:
+                    documents.pop(ref, None)
+                    continue
+                document = documents[ref] if isinstance(data, tuple) else {}
+                for key, value in (data[1] if isinstance(data, tuple) else data).items():
+                    if value is SERVER_TIMESTAMP:
+                        value = now
+                    elif isinstance(value, Increment):
+                        value = document.get(key, 0) + value.amount
+                    document[key] = value
+                documents[ref] = document
+        results, self.writes = self.writes, []
+        return results
+
+class _ServerTimestamp:
+    """Placeholder for a server-side timestamp, translated by each sink when it writes"""
+
+    def __repr__(self):
+        return 'SERVER_TIMESTAMP'
+
+SERVER_TIMESTAMP = _ServerTimestamp()
+
+class Increment:
+    """Placeholder for a server-side numeric increment, translated by BatchWriter"""
+
+    def __init__(self, amount=1):
+        self.amount = amount
+
+    def __repr__(self):
+        return f'Increment({self.amount})'
+
+# Characters used by Firestore's auto-generated document IDs
+AUTO_ID_CHARS = string.ascii_letters + string.digits
+
+def new_doc_id(rng=random):
+    """Create a random 20-character document ID in the same format as Firestore's document()"""
+    return ''.join(rng.choices(AUTO_ID_CHARS, k=20))
+
+def seeded_rng(seed, *key):
+    """Create the random stream for one unit of work (a user, a follower, ...)
+
+    With a seed, the stream depends only on the seed and key, so a unit
+    produces the same data whichever worker, shard or machine generates it.
+    Without a seed the stream is freshly seeded from the OS.
+    """
+    if seed is None:
+        return random.Random()
+    return random.Random('/'.join(str(part) for part in (seed,) + key))
+
+def derived_id(seed, *key):
+    """Derive a stable Firestore-style document ID from the seed and key, or a random one without a seed"""
+    if seed is None:
+        return new_doc_id()
+    digest = int.from_bytes(hashlib.sha256('/'.join(str(part) for part in (seed,) + key).encode()).digest(), 'big')
+    chars = []
+    for _ in range(20):
+        digest, remainder = divmod(digest, len(AUTO_ID_CHARS))
+        chars.append(AUTO_ID_CHARS[remainder])
+    return ''.join(chars)
+
+# Length of Firestore auto-IDs and of the IDs derived from a seed
+DOC_ID_LENGTH = 20
+
+class DocIdTable:
+    """Compact, append-only list of 20-character document IDs
+
+    IDs are packed back to back in one bytearray: 20 bytes per ID instead of
+    a ~70-byte str object plus an 8-byte list slot, so the user ID list of a
+    10M-user run takes 200 MB instead of almost 800 MB. Indexing and
+    iteration hand back ordinary strings.
+    """
+
+    def __init__(self, doc_ids=()):
+        self.data = bytearray()
+        self.extend(doc_ids)
+
+    @classmethod
+    def from_seed(cls, seed, count):
+        """Build the table of user_id_for(seed, 0..count-1)"""
+        return cls(user_id_for(seed, index) for index in range(count))
+
+    def append(self, doc_id):
+        encoded = doc_id.encode('ascii')
+        if len(encoded) != DOC_ID_LENGTH:
+            raise ValueError(f"Expected a {DOC_ID_LENGTH}-character document ID, got {doc_id!r}")
+        self.data += encoded
+
+    def extend(self, doc_ids):
+        for doc_id in doc_ids:
+            self.append(doc_id)
+
+    def __len__(self):
+        return len(self.data) // DOC_ID_LENGTH
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('document ID index out of range')
+        start = index * DOC_ID_LENGTH
+        return self.data[start:start + DOC_ID_LENGTH].decode('ascii')
+
+    def __iter__(self):
+        for start in range(0, len(self.data), DOC_ID_LENGTH):
+            yield self.data[start:start + DOC_ID_LENGTH].decode('ascii')
+
+class StringTable:
+    """Intern strings as small integer codes; code 0 stands for None"""
+
+    def __init__(self, values=()):
+        self.values = [None]
+        self.codes = {None: 0}
+        for value in values:
+            self.code(value)
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def __getitem__(self, code):
+        return self.values[code]
+
+def user_id_for(seed, index):
+    """Return the document ID of user number index in a seeded dataset"""
+    return derived_id(seed, 'users', index)
+
+def shard_indices(count, shard=(0, 1)):
+    """Return the indices out of range(count) that belong to shard (index, count)"""
+    shard_index, shard_count = shard
+    return range(shard_index, count, shard_count)
+
+# Firestore rejects batches with more than 500 operations
+MAX_BATCH_SIZE = 500
+
+# Default write budget; Firestore's ramp-up guidance starts new traffic at 500 ops/sec
+DEFAULT_WRITE_RATE = 500
+
+# Retry policy for commits rejected with RESOURCE_EXHAUSTED
+MAX_COMMIT_RETRIES = 6
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 32
+
+# Attempts a BulkWriter makes at one write before giving up on it, as its
+# default error handler does
+BULK_WRITER_MAX_ATTEMPTS = 15
+
+# Upper bounds in seconds of the commit latency histogram buckets
+COMMIT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Seconds of history behind the rolling docs/sec rate
+RATE_WINDOW_SECONDS = 10
+
+# Minimum seconds between progress updates on a terminal and in logs
+PROGRESS_INTERVAL_SECONDS = 0.5
+PROGRESS_LOG_INTERVAL_SECONDS = 10
+
+class TokenBucket:
+    """Thread-safe token bucket that limits how many writes are issued per second"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(rate, MAX_BATCH_SIZE))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Block until tokens are available and take them"""
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+def call_with_backoff(fn, max_retries=MAX_COMMIT_RETRIES, on_retry=None):
+    """Call fn, retrying with exponential backoff and jitter while Firestore reports RESOURCE_EXHAUSTED"""
+    try:
+        from google.api_core.exceptions import ResourceExhausted
+    except ImportError:
+        # Without the SDK the client is a MemoryClient, which never throttles
+        return fn()
+
+    for attempt in range(max_retries + 1):
+        try:
+            return fn()
+        except ResourceExhausted:
+            if attempt == max_retries:
+                raise
+            if on_retry is not None:
+                on_retry()
+            delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt)
+            time.sleep(delay / 2 + random.uniform(0, delay / 2))
+
+def percentile(values, q):
+    """Return the q-th percentile (0-100) of values by the nearest-rank method"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, round(q / 100 * len(ordered)) - 1))]
+
+class SeedMetrics:
+    """Thread-safe counters for a seeding run, reported as one progress line
+
+    Writers report whole batches rather than single documents, so the
+    bookkeeping stays off the per-document path: record_writes() takes the
+    per-collection-group counts of a batch plus its commit latency.
+    Throttle waits, retries and errors are counted as they happen. The
+    progress line is redrawn at most every PROGRESS_INTERVAL_SECONDS on a
+    terminal (every PROGRESS_LOG_INTERVAL_SECONDS when output is a log), and
+    dump() writes the final numbers as JSON or Prometheus text.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stderr
+        self.interactive = self.stream.isatty()
+        self.interval = PROGRESS_INTERVAL_SECONDS if self.interactive else PROGRESS_LOG_INTERVAL_SECONDS
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.documents = {}
+        self.total_documents = 0
+        self.commits = 0
+        self.latency_counts = [0] * (len(COMMIT_LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.retries = 0
+        self.throttled = 0
+        self.throttled_seconds = 0.0
+        self.errors = 0
+        self.stage_name = None
+        self.stage_done = 0
+        self.stage_total = None
+        self._window = deque([(self.started, 0)])
+        self._last_progress = 0.0
+        self._line_open = False
+
+    def record_writes(self, groups, seconds=None):
+        """Count documents written per collection group, plus the commit latency if there was one"""
+        with self.lock:
+            for group, count in groups.items():
+                self.documents[group] = self.documents.get(group, 0) + count
+                self.total_documents += count
+            if seconds is not None:
+                self.commits += 1
+                self.latency_sum += seconds
+                self.latency_counts[bisect.bisect_left(COMMIT_LATENCY_BUCKETS, seconds)] += 1
+            now = time.monotonic()
+            self._window.append((now, self.total_documents))
+            while len(self._window) > 2 and self._window[1][0] < now - RATE_WINDOW_SECONDS:
+                self._window.popleft()
+        self.progress()
+
+    def record_throttle(self, seconds):
+        with self.lock:
+            self.throttled += 1
+            self.throttled_seconds += seconds
+
+    def record_retry(self):
+        with self.lock:
+            self.retries += 1
+
+    def record_error(self, message):
+        with self.lock:
+            self.errors += 1
+        self.log(message)
+
+    def stage(self, name, total=None):
+        """Start counting progress of a new stage, such as 'users' out of total"""
+        self.progress(force=True)
+        with self.lock:
+            self.stage_name, self.stage_done, self.stage_total = name, 0, total
+        self._end_line()
+
+    def advance(self, count=1):
+        with self.lock:
+            self.stage_done += count
+        self.progress()
+
+    def rate(self):
+        """Documents per second over the last RATE_WINDOW_SECONDS"""
+        (first_time, first_count), (_, last_count) = self._window[0], self._window[-1]
+        elapsed = time.monotonic() - first_time
+        return (last_count - first_count) / elapsed if elapsed > 0 else 0.0
+
+    def latency_quantile(self, q):
+        """Upper bound of the histogram bucket holding the q quantile of commit latency"""
+        if not self.commits:
+            return None
+        rank = q * self.commits
+        seen = 0
+        for bound, count in zip(COMMIT_LATENCY_BUCKETS + (float('inf'),), self.latency_counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def progress(self, force=False):
+        """Redraw the progress line if the update interval has passed"""
+        now = time.monotonic()
+        if not force and now - self._last_progress < self.interval:
+            return
+        with self.lock:
+            if not self.total_documents and not self.stage_done:
+                return
+            self._last_progress = now
+            stage = self.stage_name or 'write'
+            if self.stage_total:
+                stage += f" {self.stage_done}/{self.stage_total}"
+            elif self.stage_done:
+                stage += f" {self.stage_done}"
+            line = f"{stage} | {self.total_documents} docs | {self.rate():.0f} docs/sec"
+            if self.commits:
+                line += f" | p99 commit <= {self.latency_quantile(0.99) * 1000:.0f} ms"
+            if self.throttled_seconds >= 0.05:
+                line += f" | throttle wait {self.throttled_seconds:.1f}s"
+            if self.retries:
+                line += f" | {self.retries} retries"
+            if self.errors:
+                line += f" | {self.errors} errors"
+            if self.interactive:
+                self.stream.write(f"\r\033[K{line}")
+                self._line_open = True
+            else:
+                self.stream.write(line + '\n')
+            self.stream.flush()
+
+    def _end_line(self):
+        if self._line_open:
+            self.stream.write('\n')
+            self.stream.flush()
+            self._line_open = False
+
+    def log(self, message):
+        """Print a message on its own line without mangling the progress line"""
+        self._end_line()
+        print(message)
+
+    def finish(self):
+        """Draw the final progress line and end it"""
+        self.progress(force=True)
+        self._end_line()
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                'elapsed_seconds': round(time.monotonic() - self.started, 3),
+                'documents': dict(self.documents),
+                'total_documents': self.total_documents,
+                'docs_per_sec': round(self.rate(), 1),
+                'commits': self.commits,
+                'commit_latency_seconds': {
+                    'buckets': {str(bound): count for bound, count in
+                                zip(COMMIT_LATENCY_BUCKETS + ('+Inf',), self.latency_counts)},
+                    'sum': round(self.latency_sum, 6),
+                    'p50_upper_bound': self.latency_quantile(0.5),
+                    'p99_upper_bound': self.latency_quantile(0.99)
+                },
+                'retries': self.retries,
+                'throttled': self.throttled,
+                'throttled_seconds': round(self.throttled_seconds, 3),
+                'errors': self.errors
+            }
+
+    def prometheus_text(self):
+        """Render the counters in the Prometheus text exposition format"""
+        with self.lock:
+            lines = ['# HELP seed_documents_written_total Documents written per collection group',
+                     '# TYPE seed_documents_written_total counter']
+            lines += [f'seed_documents_written_total{{collection="{group}"}} {count}'
+                      for group, count in sorted(self.documents.items())]
+            lines += ['# HELP seed_commit_latency_seconds Latency of batch commits',
+                      '# TYPE seed_commit_latency_seconds histogram']
+            cumulative = 0
+            for bound, count in zip(COMMIT_LATENCY_BUCKETS + ('+Inf',), self.latency_counts):
+                cumulative += count
+                lines.append(f'seed_commit_latency_seconds_bucket{{le="{bound}"}} {cumulative}')
+            lines += [f'seed_commit_latency_seconds_sum {self.latency_sum}',
+                      f'seed_commit_latency_seconds_count {self.commits}',
+                      '# TYPE seed_commit_retries_total counter',
+                      f'seed_commit_retries_total {self.retries}',
+                      '# TYPE seed_throttled_total counter',
+                      f'seed_throttled_total {self.throttled}',
+                      '# TYPE seed_throttled_seconds_total counter',
+                      f'seed_throttled_seconds_total {self.throttled_seconds}',
+                      '# TYPE seed_errors_total counter',
+                      f'seed_errors_total {self.errors}',
+                      '# TYPE seed_documents_per_second gauge',
+                      f'seed_documents_per_second {self.rate():.1f}',
+                      '# TYPE seed_elapsed_seconds gauge',
+                      f'seed_elapsed_seconds {time.monotonic() - self.started:.3f}']
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path):
+        """Write the metrics to path, as JSON for a .json path and Prometheus text otherwise"""
+        with open(path, 'w') as f:
+            if path.endswith('.json'):
+                json.dump(self.as_dict(), f, indent=2)
+            else:
+                f.write(self.prometheus_text())
+
+def run_with_metrics(args, fn):
+    """Return fn(metrics) for a new SeedMetrics, writing it to args.metrics_out (if set) when fn ends
+
+    The metrics are dumped even when the run fails or is interrupted, to
+    show where it stalled. Every command-line tool runs its work through this.
+    """
+    metrics = SeedMetrics()
+    try:
+        return fn(metrics)
+    finally:
+        if args.metrics_out:
+            metrics.dump(args.metrics_out)
+            metrics.log(f"Wrote metrics to {args.metrics_out}")
+
+class LostWritesError(Exception):
+    """A commit failed and its batch was dropped
+
+    units lists the units of work passed to complete_unit() whose writes
+    were in the dropped batch.
+    """
+
+    def __init__(self, units, error):
+        super().__init__(str(error))
+        self.units = units
+
+class BatchWriter:
+    """Collect document writes into batches and commit them automatically
+
+    Writes are grouped into a Firestore WriteBatch (or handed to a BulkWriter
+    when use_bulk_writer is set) and committed every batch_size operations
+    instead of paying one round trip per document. Call flush() (or use the
+    writer as a context manager) to commit whatever is still pending.
+
+    With a journal, every committed batch records the paths it created, and
+    units of work passed to complete_unit() are marked done in the same step.
+    With SeedMetrics, every commit reports its per-collection counts,
+    latency, throttle wait and retries.
+
+    A commit that still fails after the retries drops its batch, so the
+    failure is not repeated by every later flush, and raises
+    LostWritesError naming the completed units that lost writes with it.
+    A BulkWriter never raises from flush() and drops the writes it gives up
+    on, so those are collected by its error handler and raise
+    LostWritesError from flush() the same way, before anything is journaled.
+    """
+
+    def __init__(self, client, batch_size=MAX_BATCH_SIZE, use_bulk_writer=False, limiter=None,
+                 journal=None, metrics=None):
+        self.client = client
+        # A MemoryClient applies SERVER_TIMESTAMP and Increment itself
+        self.resolves_placeholders = getattr(client, 'resolves_placeholders', False)
+        self.batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+        self.use_bulk_writer = use_bulk_writer
+        self.limiter = limiter
+        self.journal = journal
+        self.metrics = metrics
+        self.pending = 0
+        self.committed = 0
+        self.batches = 0
+        self._paths = []
+        self._units = []
+        self._collections = {}
+        self._failed_writes = []
+        self._failed_lock = threading.Lock()
+        self._batch = client.bulk_writer() if use_bulk_writer else client.batch()
+        if use_bulk_writer:
+            self._batch.on_write_error(self._on_bulk_write_error)
+
+    def _on_bulk_write_error(self, error, bulk_writer):
+        """BulkWriter error handler: retry like the default handler, remembering the writes given up on"""
+        if error.attempts < BULK_WRITER_MAX_ATTEMPTS:
+            if self.metrics is not None:
+                self.metrics.record_retry()
+            return True
+        with self._failed_lock:
+            self._failed_writes.append(f"{error.operation.reference.path}: {error.message}")
+        return False
+
+    def _field_value(self, value):
+        if self.resolves_placeholders:
+            return value
+        if value is SERVER_TIMESTAMP:
+            from google.cloud.firestore_v1.transforms import SERVER_TIMESTAMP as server_timestamp
+            return server_timestamp
+        if isinstance(value, Increment):
+            from google.cloud.firestore_v1.transforms import Increment as increment
+            return increment(value.amount)
+        return value
+
+    def set(self, path, doc_id, data):
+        """Queue a set() of path/doc_id, committing the batch once it is full"""
+        data = {key: self._field_value(value) for key, value in data.items()}
+        self._batch.set(self.client.collection(path).document(doc_id), data)
+        if self.journal is not None:
+            self._paths.append(f"{path}/{doc_id}")
+        self._queued(path)
+
+    def update(self, path, doc_id, data):
+        """Queue an update() of fields of an existing document, committing the batch once it is full"""
+        data = {key: self._field_value(value) for key, value in data.items()}
+        self._batch.update(self.client.collection(path).document(doc_id), data)
+        self._queued(path)
+
+    def delete(self, path, doc_id):
+        """Queue a delete() of path/doc_id, committing the batch once it is full"""
+        self._batch.delete(self.client.collection(path).document(doc_id))
+        self._queued(path)
+
+    def _queued(self, path):
+        if self.metrics is not None:
+            self._collections[path] = self._collections.get(path, 0) + 1
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def complete_unit(self, name):
+        """Mark a unit of work done in the journal once everything queued so far is committed"""
+        self._units.append(name)
+        if not self.pending:
+            self.flush()
+
+    def flush(self):
+        """Commit all pending writes"""
+        if not self.pending:
+            if self._units:
+                self._record_journal()
+            return
+        if self.limiter is not None:
+            start = time.perf_counter()
+            self.limiter.acquire(self.pending)
+            waited = time.perf_counter() - start
+            if self.metrics is not None and waited > 0.001:
+                self.metrics.record_throttle(waited)
+        start = time.perf_counter()
+        try:
+            if self.use_bulk_writer:
+                # BulkWriter retries throttled writes on its own
+                self._batch.flush()
+                with self._failed_lock:
+                    failed, self._failed_writes = self._failed_writes, []
+                if failed:
+                    raise RuntimeError(f"{len(failed)} writes failed, the first {failed[0]}")
+            else:
+                call_with_backoff(self._batch.commit,
+                                  on_retry=self.metrics.record_retry if self.metrics is not None else None)
+        except Exception as e:
+            units = self._units
+            self.discard()
+            raise LostWritesError(units, e) from e
+        if not self.use_bulk_writer:
+            self._batch = self.client.batch()
+        if self.metrics is not None:
+            self._record_metrics(time.perf_counter() - start)
+        self.committed += self.pending
+        self.batches += 1
+        self.pending = 0
+        self._record_journal()
+
+    def discard(self):
+        """Drop the writes queued since the last commit, e.g. after a commit failed for good"""
+        if not self.use_bulk_writer:
+            self._batch = self.client.batch()
+        self.pending = 0
+        self._paths = []
+        self._units = []
+        self._collections = {}
+
+    def _record_metrics(self, seconds):
+        groups = {}
+        for path, count in self._collections.items():
+            group = collection_group_name(path)
+            groups[group] = groups.get(group, 0) + count
+        self._collections = {}
+        self.metrics.record_writes(groups, seconds)
+
+    def _record_journal(self):
+        if self.journal is not None:
+            self.journal.record_batch(self._paths, self._units)
+        self._paths = []
+        self._units = []
 
-cred = credentials.Certificate('serviceAccountKey.json')
-firebase_admin.initialize_app(cred)
+    def close(self):
+        self.flush()
+        if self.use_bulk_writer:
+            self._batch.close()
 
-db = firestore.client()
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Only commit on a clean exit so a failed user does not leave a half-written batch behind
+        if exc_type is None:
+            self.close()
+        return False
+
+DEFAULT_JOURNAL_PATH = 'sample_data_journal.db'
+
+class SeedJournal:
+    """Local SQLite record of what a seeding run has committed
+
+    Holds the settings of the current run, the units of work (a user, a
+    follower's edges, the metadata) already committed, and the path of every
+    document written. --resume reads the settings and done units to skip
+    finished work. clear_sample_data() reads the paths to delete exactly the
+    seeded documents without scanning any collection.
+    """
+
+    def __init__(self, path=DEFAULT_JOURNAL_PATH):
+        self.path = path
+        import sqlite3
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS units (name TEXT PRIMARY KEY)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS documents (path TEXT PRIMARY KEY) WITHOUT ROWID")
+
+    def start_run(self, settings):
+        """Record the settings of a new run and forget the units of any earlier one
+
+        Document paths are kept, so clearing still removes every run's data.
+        """
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM settings")
+            self.conn.execute("DELETE FROM units")
+            self.conn.executemany("INSERT INTO settings VALUES (?, ?)",
+                                  [(key, json.dumps(value)) for key, value in settings.items()])
+
+    def settings(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT key, value FROM settings").fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def record_batch(self, paths, units=()):
+        """Record the documents of a committed batch and the units it completed"""
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO documents VALUES (?)", ((path,) for path in paths))
+            self.conn.executemany("INSERT OR IGNORE INTO units VALUES (?)", ((unit,) for unit in units))
+
+    def done_units(self, prefix=''):
+        """Return the names of the finished units starting with prefix"""
+        with self.lock:
+            rows = self.conn.execute("SELECT name FROM units WHERE name LIKE ? || '%'", (prefix,)).fetchall()
+        return {name for name, in rows}
+
+    def document_count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def iter_document_chunks(self, size):
+        """Yield the recorded document paths in chunks of size, in path order"""
+        last = ''
+        while True:
+            with self.lock:
+                rows = self.conn.execute("SELECT path FROM documents WHERE path > ? ORDER BY path LIMIT ?",
+                                         (last, size)).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            yield [path for path, in rows]
+
+    def forget(self, paths):
+        """Drop deleted documents from the journal"""
+        with self.lock, self.conn:
+            self.conn.executemany("DELETE FROM documents WHERE path = ?", ((path,) for path in paths))
+
+    def reset(self):
+        """Forget the current run's settings and finished units"""
+        self.start_run({})
+
+    def close(self):
+        self.conn.close()
+
+EXPORT_FORMATS = ('ndjson', 'parquet')
+
+# Rows buffered per Parquet row group
+PARQUET_ROW_GROUP_SIZE = 50000
+
+# gzip's default level 9 makes compression the bottleneck of an NDJSON export
+# for a few percent of size; level 6 is zlib's usual speed/size balance
+NDJSON_COMPRESS_LEVEL = 6
+
+# Documents between metrics reports from a FileSink
+FILE_METRICS_EVERY = 1000
+
+def collection_group_name(path):
+    """Map a collection path such as users/abc/checkIns to its group name, users.checkIns"""
+    return '.'.join(path.split('/')[::2])
+
+def _encode_json_value(value):
+    """json.dumps() hook for the values Firestore documents hold but JSON does not"""
+    if isinstance(value, datetime.datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, bytes):
+        return {'__bytes__': base64.b64encode(value).decode('ascii')}
+    if value is SERVER_TIMESTAMP:
+        return {'__sentinel__': 'serverTimestamp'}
+    raise TypeError(f"Cannot export value of type {type(value).__name__}")
+
+def _decode_json_object(obj):
+    """json.loads() hook reversing _encode_json_value()"""
+    if '__datetime__' in obj:
+        return datetime.datetime.fromisoformat(obj['__datetime__'])
+    if '__bytes__' in obj:
+        return base64.b64decode(obj['__bytes__'])
+    if obj.get('__sentinel__') == 'serverTimestamp':
+        return SERVER_TIMESTAMP
+    return obj
+
+# Parquet column listing the fields a row lacks, which are stored as nulls
+PARQUET_ABSENT_COLUMN = '__absent__'
+
+# Field metadata marking a Parquet column stored as JSON text, used for
+# fields whose values mix types or whose maps differ in keys
+PARQUET_JSON_METADATA = {b'encoding': b'json'}
+
+def _uniform_shape(values):
+    """Whether all the maps among values, and within their fields and list items, have the same keys"""
+    maps = [value for value in values if isinstance(value, dict)]
+    if maps:
+        keys = maps[0].keys()
+        if any(value.keys() != keys for value in maps[1:]):
+            return False
+        if not all(_uniform_shape([value[key] for value in maps]) for key in keys):
+            return False
+    lists = [value for value in values if isinstance(value, list)]
+    return not lists or _uniform_shape([item for value in lists for item in value])
+
+def _parquet_column(values):
+    """Convert the values of one field to an Arrow array, falling back to JSON text"""
+    import pyarrow as pa
+
+    types = set(map(type, values))
+    if (dict not in types and list not in types) or _uniform_shape(values):
+        try:
+            return pa.array(values), None
+        except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+            pass
+    text = [None if value is None else json.dumps(value, default=_encode_json_value) for value in values]
+    return pa.array(text, pa.string()), PARQUET_JSON_METADATA
+
+def _parquet_table(rows):
+    """Build a table holding every field of rows, listing the fields each row lacks in PARQUET_ABSENT_COLUMN"""
+    import pyarrow as pa
+
+    keys = list(dict.fromkeys(itertools.chain.from_iterable(rows)))
+    arrays = []
+    fields = []
+    for key in keys:
+        array, metadata = _parquet_column([row.get(key) for row in rows])
+        arrays.append(array)
+        fields.append(pa.field(key, array.type, metadata=metadata))
+    absent = [[key for key in keys if key not in row] if len(row) < len(keys) else None for row in rows]
+    arrays.append(pa.array(absent, pa.list_(pa.string())))
+    fields.append(pa.field(PARQUET_ABSENT_COLUMN, pa.list_(pa.string())))
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+def _conform_table(table, schema):
+    """Return table in a file's schema, with fields it lacks added as absent nulls
+
+    Returns None when table has a field the schema does not, or a field of a
+    different type, so the rows need a file of their own.
+    """
+    import pyarrow as pa
+
+    if any(schema.get_field_index(name) < 0 for name in table.column_names):
+        return None
+    absent = table.column(PARQUET_ABSENT_COLUMN).to_pylist()
+    arrays = []
+    for field in schema:
+        if field.name == PARQUET_ABSENT_COLUMN:
+            continue
+        index = table.schema.get_field_index(field.name)
+        if index < 0:
+            arrays.append(pa.nulls(len(table), field.type))
+            absent = [(names or []) + [field.name] for names in absent]
+            continue
+        column = table.column(index)
+        if table.schema.field(index).metadata != field.metadata:
+            return None
+        if column.type != field.type:
+            if not pa.types.is_null(column.type):
+                return None
+            column = column.cast(field.type)
+        arrays.append(column)
+    arrays.append(pa.array([names or None for names in absent], pa.list_(pa.string())))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+class FileSink:
+    """Stream documents to local files instead of Firestore
+
+    Accepts the same set()/flush()/close() calls as BatchWriter and writes one
+    file per collection group (users.checkIns.ndjson.gz holds the check-ins of
+    every user). Each record carries its full document path under __path__.
+    NDJSON files are gzip'd and written line by line; Parquet files (which
+    need pyarrow) are written one row group at a time, so memory stays bounded
+    by the row group size whatever the size of the export. A row group holds
+    every field of its rows, and a row group with fields or types the file
+    does not have starts a new part file (users.1.parquet) with its own
+    schema.
+    With SeedMetrics, per-collection counts are reported every
+    FILE_METRICS_EVERY documents.
+    """
+
+    def __init__(self, output_dir, fmt='ndjson', row_group_size=PARQUET_ROW_GROUP_SIZE, suffix='',
+                 export_time=None, metrics=None):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format {fmt!r}, expected one of {EXPORT_FORMATS}")
+        if fmt == 'parquet':
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise ImportError("Parquet export requires pyarrow (pip install pyarrow)")
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.fmt = fmt
+        self.row_group_size = row_group_size
+        self.suffix = suffix
+        # Server timestamps have no server to resolve them, so they become the export time
+        self.export_time = export_time or datetime.datetime.now()
+        self.metrics = metrics
+        self.written = 0
+        self.bytes_written = 0
+        self._groups = {}
+        self._files = {}
+        self._rows = {}
+        self._parquet_writers = {}
+        self._parquet_parts = {}
+
+    def set(self, path, doc_id, data):
+        """Append one document to the file for its collection group"""
+        group = collection_group_name(path)
+        record = {'__path__': f"{path}/{doc_id}", **data}
+        if self.fmt == 'ndjson':
+            line = json.dumps(record, default=_encode_json_value) + '\n'
+            self._ndjson_file(group).write(line)
+            self.bytes_written += len(line)
+        else:
+            rows = self._rows.setdefault(group, [])
+            rows.append({key: self.export_time if value is SERVER_TIMESTAMP else value
+                         for key, value in record.items()})
+            if len(rows) >= self.row_group_size:
+                self._write_row_group(group)
+        self.written += 1
+        if self.metrics is not None:
+            self._groups[group] = self._groups.get(group, 0) + 1
+            if self.written % FILE_METRICS_EVERY == 0:
+                self._record_metrics()
+
+    def _record_metrics(self):
+        if self._groups:
+            self.metrics.record_writes(self._groups)
+            self._groups = {}
+
+    def complete_unit(self, name):
+        """Files have no journal, so there is nothing to record"""
+
+    def _ndjson_file(self, group):
+        import gzip
+
+        if group not in self._files:
+            path = os.path.join(self.output_dir, f"{group}{self.suffix}.ndjson.gz")
+            # A zero mtime in the gzip header keeps seeded exports byte-identical
+            raw = gzip.GzipFile(path, 'wb', compresslevel=NDJSON_COMPRESS_LEVEL, mtime=0)
+            self._files[group] = io.TextIOWrapper(raw, encoding='utf-8')
+        return self._files[group]
+
+    def _write_row_group(self, group):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        rows = self._rows.pop(group, None)
+        if not rows:
+            return
+        table = _parquet_table(rows)
+        writer = self._parquet_writers.get(group)
+        if writer is not None:
+            conformed = _conform_table(table, writer.schema)
+            if conformed is None:
+                writer.close()
+                writer = None
+                self._parquet_parts[group] = self._parquet_parts.get(group, 0) + 1
+            else:
+                table = conformed
+        if writer is None:
+            # Columns that were empty in the first row group default to strings
+            schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                                for field in table.schema])
+            table = table.cast(schema)
+            part = self._parquet_parts.get(group, 0)
+            name = f"{group}{self.suffix}.{part}.parquet" if part else f"{group}{self.suffix}.parquet"
+            writer = pq.ParquetWriter(os.path.join(self.output_dir, name), schema, compression='zstd')
+            self._parquet_writers[group] = writer
+        writer.write_table(table)
+        self.bytes_written += table.nbytes
+
+    def flush(self):
+        """Write buffered rows out to disk"""
+        for group in list(self._rows):
+            self._write_row_group(group)
+        for file in self._files.values():
+            file.flush()
+        if self.metrics is not None:
+            self._record_metrics()
+
+    def close(self):
+        self.flush()
+        for file in self._files.values():
+            file.close()
+        for writer in self._parquet_writers.values():
+            writer.close()
+        self._files = {}
+        self._parquet_writers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+def read_exported_documents(input_dir):
+    """Yield (collection_path, doc_id, data) for every document in a FileSink export directory"""
+    import glob
+    import gzip
+
+    for path in sorted(glob.glob(os.path.join(input_dir, '*.ndjson.gz'))):
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            for line in file:
+                data = json.loads(line, object_hook=_decode_json_object)
+                collection_path, _, doc_id = data.pop('__path__').rpartition('/')
+                yield collection_path, doc_id, data
+    for path in sorted(glob.glob(os.path.join(input_dir, '*.parquet'))):
+        import pyarrow.parquet as pq
+
+        file = pq.ParquetFile(path)
+        json_fields = [field.name for field in file.schema_arrow if field.metadata == PARQUET_JSON_METADATA]
+        for batch in file.iter_batches():
+            for data in batch.to_pylist():
+                # Fields the document did not have were stored as nulls
+                for key in data.pop(PARQUET_ABSENT_COLUMN, None) or ():
+                    del data[key]
+                for key in json_fields:
+                    if data.get(key) is not None:
+                        data[key] = json.loads(data[key], object_hook=_decode_json_object)
+                collection_path, _, doc_id = data.pop('__path__').rpartition('/')
+                yield collection_path, doc_id, data
+
+def write_documents(writer, documents):
+    """Send (collection_path, doc_id, data) tuples to a writer and return how many were written"""
+    count = 0
+    for path, doc_id, data in documents:
+        writer.set(path, doc_id, data)
+        count += 1
+    return count
+
+class ObservingWriter:
+    """Wrap a writer and show every document set through it to observers first
+
+    Observers are objects with an observe(path, doc_id, data) method, such as
+    TimelineBuilder; everything else is delegated to the wrapped writer.
+    """
+
+    def __init__(self, writer, observers):
+        self.writer = writer
+        self.observers = observers
+
+    def set(self, path, doc_id, data):
+        for observer in self.observers:
+            observer.observe(path, doc_id, data)
+        self.writer.set(path, doc_id, data)
+
+    def __getattr__(self, name):
+        return getattr(self.writer, name)
+
+# With counter shards, every feed post keeps its counts in this subcollection
+# of numbered shard documents, feed/{id}/counterShards/0 and so on
+COUNTER_SHARD_COLLECTION = 'counterShards'
+
+# Counters kept in the shards: seeded posts carry likes and comments, the app
+# and the traffic simulator increment likes and commentCount
+COUNTER_FIELDS = ('likes', 'comments', 'commentCount')
+
+# Map on a sharded post holding the shard totals its counts already include.
+# The app still increments likes and commentCount on the post itself, so the
+# rollup adds only what the shards gained since and keeps those increments
+COUNTER_ROLLUP_FIELD = 'counterRollup'
+
+def post_counts(data):
+    """Return the counter fields of a post that hold counts"""
+    return {field: data[field] for field in COUNTER_FIELDS if isinstance(data.get(field), int)}
+
+def counter_shard_paths(path, doc_id, num_shards):
+    """Yield (collection_path, doc_id) of the num_shards counter shards of a post"""
+    for index in range(num_shards):
+        yield f"{path}/{doc_id}/{COUNTER_SHARD_COLLECTION}", str(index)
+
+def counter_shard_documents(path, doc_id, data, num_shards):
+    """Yield the num_shards counter shards of a post, with its counts split evenly across them"""
+    counts = post_counts(data)
+    for index, (shard_path, shard_id) in enumerate(counter_shard_paths(path, doc_id, num_shards)):
+        shard = {field: count // num_shards + (index < count % num_shards) for field, count in counts.items()}
+        shard['updatedAt'] = SERVER_TIMESTAMP
+        yield shard_path, shard_id, shard
+
+class CounterShardWriter:
+    """Wrap a writer so feed posts keep their likes and comments in sharded counters
+
+    A single post document takes about one sustained write per second, so a
+    popular post cannot keep up with its likes. set() of a feed post also
+    writes num_shards counter shards holding the post's counts, and records
+    num_shards on the post as counterShards and the counts as the shard
+    totals already rolled up into it. update() of a post sends Increment
+    counter fields to one shard picked at random instead, so concurrent
+    likes land on different documents. The counts on the post
+    itself are only refreshed by the rollup job in sharded_counters.py.
+    delete() of a post deletes its shards with it, so expiring story copies
+    leave none behind. Everything else is delegated to the wrapped writer.
+    """
+
+    def __init__(self, writer, num_shards, rng=random):
+        if num_shards < 1:
+            raise ValueError(f"num_shards must be at least 1, got {num_shards}")
+        self.writer = writer
+        self.num_shards = num_shards
+        self.rng = rng
+
+    def set(self, path, doc_id, data):
+        if path != 'feed':
+            self.writer.set(path, doc_id, data)
+            return
+        data = dict(data, counterShards=self.num_shards, **{COUNTER_ROLLUP_FIELD: post_counts(data)})
+        self.writer.set(path, doc_id, data)
+        write_documents(self.writer, counter_shard_documents(path, doc_id, data, self.num_shards))
+
+    def update(self, path, doc_id, data):
+        increments = {field: value for field, value in data.items()
+                      if path == 'feed' and field in COUNTER_FIELDS and isinstance(value, Increment)}
+        if increments:
+            shard = str(self.rng.randrange(self.num_shards))
+            self.writer.update(f"{path}/{doc_id}/{COUNTER_SHARD_COLLECTION}", shard,
+                               dict(increments, updatedAt=SERVER_TIMESTAMP))
+        fields = {field: value for field, value in data.items() if field not in increments}
+        if fields:
+            self.writer.update(path, doc_id, fields)
+
+    def delete(self, path, doc_id):
+        if path == 'feed':
+            for shard_path, shard_id in counter_shard_paths(path, doc_id, self.num_shards):
+                self.writer.delete(shard_path, shard_id)
+        self.writer.delete(path, doc_id)
+
+    def __getattr__(self, name):
+        return getattr(self.writer, name)
+
+def _value_size(value):
+    if isinstance(value, str):
+        return len(value.encode('utf-8')) + 1
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, (list, tuple)):
+        return sum(_value_size(item) for item in value)
+    if isinstance(value, dict):
+        return sum(_value_size(key) + _value_size(item) for key, item in value.items())
+    # Numbers, timestamps and server timestamps
+    return 8
+
+def document_size(path, doc_id, data):
+    """Estimate a document's stored size in bytes using Firestore's storage size rules"""
+    name_size = sum(len(part.encode('utf-8')) + 1 for part in f"{path}/{doc_id}".split('/')) + 16
+    return name_size + _value_size(data) + 32
 
 # Expanded list of users with more variety (50+ users)
 sample_users = [
@@ -298,32 +1507,469 @@ sample_locations = [
     "Track Field"
 ]
 
-def get_random_date(days_back=30):
+# Name pools for synthetic users, split out of the sample users above
+first_names = sorted({user['displayName'].split(' ', 1)[0] for user in sample_users})
+last_names = sorted({user['displayName'].split(' ', 1)[1] for user in sample_users})
+
+# Streak range seen in the sample users for each fitness level
+streak_ranges = {}
+for _user in sample_users:
+    low, high = streak_ranges.get(_user['fitnessLevel'], (_user['streak'], _user['streak']))
+    streak_ranges[_user['fitnessLevel']] = (min(low, _user['streak']), max(high, _user['streak']))
+del _user
+
+# Defaults used when generating users
+DEFAULT_CHECK_INS_PER_USER = (5, 12)
+DEFAULT_DAYS_BACK = 30
+
+# Stories disappear this long after they are posted
+STORY_LIFETIME = datetime.timedelta(hours=24)
+
+# Check-ins per second written by the append command, and the most seconds a
+# written check-in may wait in a partly filled batch
+DEFAULT_APPEND_RATE = 10
+APPEND_FLUSH_SECONDS = 1.0
+
+# Events per second emitted by the simulate command, by kind
+DEFAULT_SIMULATION_RATES = {'check_in': 5, 'story': 0.5, 'like': 20, 'comment': 3, 'follow': 1}
+
+# Writes that may wait for the writer before event producers are held back
+SIMULATION_QUEUE_SIZE = 2000
+
+# Seconds between sweeps that delete the simulation's expired stories
+STORY_CLEANUP_INTERVAL_SECONDS = 30
+
+# Newest simulated posts that likes and comments are aimed at
+RECENT_POSTS = 1000
+
+# Social graph shape: follow counts follow a power law between MIN_FOLLOWING
+# and MAX_FOLLOWING, followees are drawn by Pareto popularity, and about one
+# user in a thousand is a celebrity drawing a quarter of all follows
+MIN_FOLLOWING = 3
+MAX_FOLLOWING = 1000
+FOLLOWING_ALPHA = 2.5
+POPULARITY_ALPHA = 1.5
+CELEBRITY_FRACTION = 0.001
+CELEBRITY_SHARE = 0.25
+
+# Generation engines: per-call random module draws, or NumPy columns per chunk of users
+ENGINES = ('python', 'numpy')
+ENGINE_CHUNK_SIZE = 1000
+
+def synthetic_user(index, rng=random):
+    """Create the profile for synthetic user number index
+
+    Names walk through every first/last name pair before repeating, and repeats
+    get a numeric suffix, so every index maps to a unique display name. The
+    fitness level follows the mix in sample_users and the streak stays within
+    the range seen for that level.
+    """
+    pairs = len(first_names) * len(last_names)
+    pair, cycle = index % pairs, index // pairs
+    first = first_names[pair % len(first_names)]
+    last = last_names[pair // len(first_names)]
+    display_name = f"{first} {last}" if cycle == 0 else f"{first} {last} {cycle + 1}"
+    
+    fitness_level = get_random_item(sample_users, rng)['fitnessLevel']
+    min_streak, max_streak = streak_ranges[fitness_level]
+    return {
+        'displayName': display_name,
+        'streak': rng.randint(min_streak, max_streak),
+        'fitnessLevel': fitness_level
+    }
+
+def get_random_date(days_back=30, now=None, rng=random):
     """Generate a random date within the last X days"""
-    now = datetime.datetime.now()
-    random_days = random.randint(0, days_back)
-    random_seconds = random.randint(0, 24 * 60 * 60)
+    now = now or datetime.datetime.now()
+    random_days = rng.randint(0, days_back)
+    random_seconds = rng.randint(0, 24 * 60 * 60)
     random_date = now - datetime.timedelta(days=random_days, seconds=random_seconds)
     return random_date
 
-def get_random_item(array):
+# Relative activity in each hour of the day: quiet overnight, a morning peak
+# before work, a lunchtime bump and the largest peak after work
+HOURLY_ACTIVITY = (1.0, 0.5, 0.3, 0.3, 0.5, 2.0, 5.0, 8.0, 6.0, 3.0, 2.5, 3.0,
+                   5.0, 3.5, 2.5, 2.5, 3.5, 6.0, 9.0, 8.0, 5.0, 3.0, 2.0, 1.5)
+
+# Relative activity from Monday to Sunday
+WEEKDAY_ACTIVITY = (1.15, 1.1, 1.05, 1.0, 0.9, 0.75, 0.8)
+
+# Share of a user's posts made around their habitual hour, and the standard
+# deviation in hours of how far they drift from it
+HABIT_SHARE = 0.7
+HABIT_SPREAD_HOURS = 1.0
+
+class UniformTimestamps:
+    """Spread timestamps evenly over the last days_back days, like get_random_date()"""
+
+    def user_habit(self, rng=random):
+        return None
+
+    def sample(self, days_back, now, rng=random, habit=None):
+        return get_random_date(days_back, now, rng)
+
+    def sample_array(self, count, days_back, now, rng, habits=None):
+        """Draw count timestamps as int64 microseconds since the epoch"""
+        now_us = int(now.timestamp() * 1_000_000)
+        offsets = rng.integers(0, days_back + 1, count) * 86400 + rng.integers(0, 24 * 60 * 60 + 1, count)
+        return now_us - offsets * 1_000_000
+
+class DiurnalTimestamps:
+    """Cluster timestamps the way real check-ins arrive
+
+    Days are weighted by WEEKDAY_ACTIVITY and hours by HOURLY_ACTIVITY, so
+    posts bunch up in the morning and evening peaks and thin out at the
+    weekend. Each user also gets a habitual hour drawn from the same hourly
+    profile (user_habit()); HABIT_SHARE of their posts land around it. A time
+    later than now on the current day is moved back one day.
+    """
+
+    def __init__(self, hourly=HOURLY_ACTIVITY, weekdays=WEEKDAY_ACTIVITY, habit_share=HABIT_SHARE,
+                 habit_spread=HABIT_SPREAD_HOURS):
+        self.hourly = hourly
+        self.hour_weights = list(itertools.accumulate(hourly))
+        self.weekdays = weekdays
+        self.habit_share = habit_share
+        self.habit_spread = habit_spread
+        self._day_weights = {}
+
+    def day_weights(self, days_back, now):
+        """Weights of 0..days_back days ago by the weekday each falls on"""
+        key = (days_back, now.date())
+        if key not in self._day_weights:
+            self._day_weights[key] = [self.weekdays[(now.date() - datetime.timedelta(days=day)).weekday()]
+                                      for day in range(days_back + 1)]
+        return self._day_weights[key]
+
+    def user_habit(self, rng=random):
+        """Draw the hour of the day (as a float) a user usually posts at"""
+        return rng.choices(range(24), cum_weights=self.hour_weights)[0] + rng.random()
+
+    def sample(self, days_back, now, rng=random, habit=None):
+        day = rng.choices(range(days_back + 1), self.day_weights(days_back, now))[0]
+        if habit is not None and rng.random() < self.habit_share:
+            hour = (habit + rng.gauss(0, self.habit_spread)) % 24
+        else:
+            hour = rng.choices(range(24), cum_weights=self.hour_weights)[0] + rng.random()
+        midnight = datetime.datetime.combine(now.date(), datetime.time(), now.tzinfo)
+        timestamp = midnight - datetime.timedelta(days=day) + datetime.timedelta(hours=hour)
+        if timestamp > now:
+            timestamp -= datetime.timedelta(days=1)
+        return timestamp.replace(microsecond=0)
+
+    def sample_array(self, count, days_back, now, rng, habits=None):
+        """Draw count timestamps as int64 microseconds since the epoch
+
+        habits holds one habitual hour per row, NaN for rows without one.
+        """
+        import numpy as np
+
+        day_weights = np.array(self.day_weights(days_back, now))
+        days = rng.choice(days_back + 1, count, p=day_weights / day_weights.sum())
+        hour_weights = np.array(self.hourly)
+        hours = rng.choice(24, count, p=hour_weights / hour_weights.sum()) + rng.random(count)
+        if habits is not None:
+            habits = np.asarray(habits, dtype=np.float64)
+            near = (rng.random(count) < self.habit_share) & ~np.isnan(habits)
+            drift = rng.normal(0, self.habit_spread, count)
+            hours = np.where(near, np.mod(habits + drift, 24), hours)
+        now_us = int(now.timestamp() * 1_000_000)
+        midnight_us = int(datetime.datetime.combine(now.date(), datetime.time(), now.tzinfo).timestamp() * 1_000_000)
+        timestamps = midnight_us - days * 86_400_000_000 + (hours * 3_600_000_000).astype(np.int64)
+        timestamps = np.where(timestamps > now_us, timestamps - 86_400_000_000, timestamps)
+        return timestamps // 1_000_000 * 1_000_000
+
+TIMESTAMP_MODELS = {'uniform': UniformTimestamps, 'diurnal': DiurnalTimestamps}
+
+def timestamp_model(name):
+    """Create the timestamp model registered under name in TIMESTAMP_MODELS"""
+    if name not in TIMESTAMP_MODELS:
+        raise ValueError(f"Unknown timestamp model {name!r}, expected one of {tuple(TIMESTAMP_MODELS)}")
+    return TIMESTAMP_MODELS[name]()
+
+# Distributions the generator draws check-ins from unless a distributions
+# file says otherwise. Integer fields take an inclusive [min, max] range,
+# {'weights': {value: weight}} or a fitted {'histogram': {'edges': [...],
+# 'counts': [...]}} whose bins are half-open; categories take
+# {'weights': {name: weight}} or a list of equally likely names.
+DEFAULT_DISTRIBUTIONS = {
+    'workoutShare': 0.7,
+    'locationShare': 0.7,
+    'photoShare': 0.6,
+    'checkInsPerUser': list(DEFAULT_CHECK_INS_PER_USER),
+    'likes': [0, 30],
+    'comments': [0, 10],
+    'tagCount': [1, 5],
+    'duration': [15, 120],
+    'intensity': [1, 10],
+    'mood': [1, 5],
+    'activityType': activities,
+    'location': sample_locations,
+    'tags': sample_tags
+}
+SHARE_DISTRIBUTIONS = ('workoutShare', 'locationShare', 'photoShare')
+INTEGER_DISTRIBUTIONS = ('checkInsPerUser', 'likes', 'comments', 'tagCount', 'duration', 'intensity', 'mood')
+CATEGORY_DISTRIBUTIONS = ('activityType', 'location', 'tags')
+
+class AliasTable:
+    """Draw from a discrete distribution in O(1) with Vose's alias method
+
+    Building the table is O(n) once; every draw then takes one uniform
+    column and one biased coin flip, however many weighted values there are.
+    """
+
+    def __init__(self, weights):
+        if not weights or any(weight < 0 for weight in weights) or not sum(weights) > 0:
+            raise ValueError("an alias table needs non-negative weights with a positive sum")
+        n = len(weights)
+        total = float(sum(weights))
+        scaled = [weight * n / total for weight in weights]
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+        # Columns left over are full up to rounding error and keep prob 1
+        self._arrays = None
+
+    def __len__(self):
+        return len(self.prob)
+
+    def sample(self, rng=random):
+        """Draw one index"""
+        column = int(rng.random() * len(self.prob))
+        return column if rng.random() < self.prob[column] else self.alias[column]
+
+    def sample_array(self, size, rng):
+        """Draw size indices at once from a NumPy Generator"""
+        import numpy as np
+
+        if self._arrays is None:
+            self._arrays = (np.array(self.prob), np.array(self.alias))
+        prob, alias = self._arrays
+        columns = rng.integers(0, len(prob), size)
+        return np.where(rng.random(size) < prob[columns], columns, alias[columns])
+
+class IntegerDistribution:
+    """An integer field: a uniform range, weighted values or a fitted histogram
+
+    Histograms pick a bin from an alias table and a value uniformly within
+    it. A plain range draws exactly what rng.randint() always drew, so the
+    default distributions reproduce the hard-coded generator.
+    """
+
+    def __init__(self, spec):
+        self.table = None
+        self.values = None
+        self.lows = None
+        if isinstance(spec, (list, tuple)):
+            self.low, self.high = int(spec[0]), int(spec[1])
+            self.maximum = self.high
+        elif 'weights' in spec:
+            self.values = [int(value) for value in spec['weights']]
+            self.table = AliasTable([float(weight) for weight in spec['weights'].values()])
+            self.maximum = max(self.values)
+        elif 'histogram' in spec:
+            edges, counts = spec['histogram']['edges'], spec['histogram']['counts']
+            if len(edges) != len(counts) + 1 or any(low >= high for low, high in zip(edges, edges[1:])):
+                raise ValueError(f"a histogram needs increasing edges, one more than counts, got {spec!r}")
+            self.lows = [int(edge) for edge in edges[:-1]]
+            self.widths = [int(high) - int(low) for low, high in zip(edges, edges[1:])]
+            self.table = AliasTable([float(count) for count in counts])
+            self.maximum = int(edges[-1]) - 1
+        else:
+            raise ValueError(f"expected [min, max], {{'weights': ...}} or {{'histogram': ...}}, got {spec!r}")
+
+    def sample(self, rng=random):
+        if self.table is None:
+            return rng.randint(self.low, self.high)
+        index = self.table.sample(rng)
+        if self.lows is not None:
+            return self.lows[index] + int(rng.random() * self.widths[index])
+        return self.values[index]
+
+    def sample_array(self, size, rng):
+        """Draw size values at once from a NumPy Generator"""
+        import numpy as np
+
+        if self.table is None:
+            return rng.integers(self.low, self.high + 1, size)
+        index = self.table.sample_array(size, rng)
+        if self.lows is not None:
+            lows, widths = np.array(self.lows), np.array(self.widths)
+            return lows[index] + (rng.random(size) * widths[index]).astype(np.int64)
+        return np.array(self.values)[index]
+
+class CategoryDistribution:
+    """A categorical field drawn from names, with an alias table unless all names are equally likely
+
+    names is the vocabulary every fitness level shares, so NumPy columns of
+    indices mean the same name whichever level drew them; names the spec
+    does not mention get weight 0.
+    """
+
+    def __init__(self, spec, names):
+        self.names = names
+        if isinstance(spec, dict) and 'weights' in spec:
+            weights = [float(spec['weights'].get(name, 0)) for name in names]
+        elif isinstance(spec, (list, tuple)):
+            listed = set(spec)
+            weights = [1.0 if name in listed else 0.0 for name in names]
+        else:
+            raise ValueError(f"expected a list of names or {{'weights': ...}}, got {spec!r}")
+        self.weights = weights
+        self.choices = len(weights) - weights.count(0.0)
+        self.uniform = self.choices == len(weights)
+        self.table = None if self.uniform else AliasTable(weights)
+
+    def sample(self, rng=random):
+        if self.uniform:
+            return rng.choice(self.names)
+        return self.names[self.table.sample(rng)]
+
+    def sample_distinct(self, count, rng=random):
+        """Draw count different names, weighted by redrawing repeats"""
+        if self.uniform:
+            return rng.sample(self.names, count)
+        picked = []
+        for _ in range(min(count, self.choices)):
+            name = self.sample(rng)
+            while name in picked:
+                name = self.sample(rng)
+            picked.append(name)
+        return picked
+
+    def sample_array(self, size, rng):
+        """Draw size indices into names at once from a NumPy Generator"""
+        if self.uniform:
+            return rng.integers(0, len(self.names), size)
+        return self.table.sample_array(size, rng)
+
+    def distinct_array(self, size, count, rng):
+        """Draw count different indices into names for each of size rows
+
+        Rows rank random keys and keep the count smallest. Weighted rows use
+        exponential keys divided by the weights (Efraimidis-Spirakis), which
+        picks without replacement in proportion to weight.
+        """
+        import numpy as np
+
+        if self.uniform:
+            # In key order, the 5 smallest keys match random.sample(names, 5)
+            keys = rng.random((size, len(self.names)), dtype=np.float32)
+        else:
+            with np.errstate(divide='ignore'):
+                keys = rng.exponential(size=(size, len(self.names))) / np.array(self.weights)
+        choice = np.argpartition(keys, count - 1, axis=1)[:, :count]
+        return np.take_along_axis(choice, np.argsort(np.take_along_axis(keys, choice, axis=1), axis=1), axis=1)
+
+class CheckInDistributions:
+    """The compiled distributions one fitness level draws its check-ins from"""
+
+    def __init__(self, spec, vocabularies):
+        for key in SHARE_DISTRIBUTIONS:
+            if not 0 <= spec[key] <= 1:
+                raise ValueError(f"{key} must be between 0 and 1, got {spec[key]!r}")
+        self.workout_share = spec['workoutShare']
+        self.location_share = spec['locationShare']
+        self.photo_share = spec['photoShare']
+        self.check_ins_per_user = IntegerDistribution(spec['checkInsPerUser'])
+        self.likes = IntegerDistribution(spec['likes'])
+        self.comments = IntegerDistribution(spec['comments'])
+        self.tag_count = IntegerDistribution(spec['tagCount'])
+        self.duration = IntegerDistribution(spec['duration'])
+        self.intensity = IntegerDistribution(spec['intensity'])
+        self.mood = IntegerDistribution(spec['mood'])
+        self.activity = CategoryDistribution(spec['activityType'], vocabularies['activityType'])
+        self.location = CategoryDistribution(spec['location'], vocabularies['location'])
+        self.tags = CategoryDistribution(spec['tags'], vocabularies['tags'])
+
+def _category_names(spec):
+    return list(spec['weights']) if isinstance(spec, dict) and 'weights' in spec else list(spec)
+
+class Distributions:
+    """Check-in distributions compiled from a distributions spec
+
+    spec holds any of the DEFAULT_DISTRIBUTIONS keys, plus 'fitnessLevels'
+    mapping a level to the keys that differ for its users. Everything is
+    compiled once up front, so the per-record cost of a draw is O(1)
+    whatever the number of weighted categories.
+    """
+
+    def __init__(self, spec=None, check_ins_per_user=DEFAULT_CHECK_INS_PER_USER):
+        spec = dict(spec or {})
+        levels = spec.pop('fitnessLevels', {})
+        for overrides in [spec, *levels.values()]:
+            unknown = set(overrides) - set(DEFAULT_DISTRIBUTIONS)
+            if unknown:
+                raise ValueError(f"Unknown distributions {sorted(unknown)}, expected some of {sorted(DEFAULT_DISTRIBUTIONS)}")
+        base = {**DEFAULT_DISTRIBUTIONS, 'checkInsPerUser': list(check_ins_per_user), **spec}
+        merged = {level: {**base, **overrides} for level, overrides in levels.items()}
+        # The default lists come first, in order, so the default draws are unchanged
+        vocabularies = {}
+        for key in CATEGORY_DISTRIBUTIONS:
+            names = dict.fromkeys(_category_names(DEFAULT_DISTRIBUTIONS[key]))
+            for level_spec in [base, *merged.values()]:
+                names.update(dict.fromkeys(_category_names(level_spec[key])))
+            vocabularies[key] = list(names)
+        self.base = CheckInDistributions(base, vocabularies)
+        self.levels = {level: CheckInDistributions(level_spec, vocabularies) for level, level_spec in merged.items()}
+
+    def for_level(self, fitness_level):
+        """Return the distributions for users of fitness_level"""
+        return self.levels.get(fitness_level, self.base)
+
+    @property
+    def max_tag_count(self):
+        return max(level.tag_count.maximum for level in [self.base, *self.levels.values()])
+
+def load_distributions(path):
+    """Read a distributions spec from a JSON or (with PyYAML) YAML file"""
+    with open(path) as f:
+        if path.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("YAML distributions require PyYAML (pip install pyyaml)")
+            return yaml.safe_load(f) or {}
+        return json.load(f)
+
+# Compiled from DEFAULT_DISTRIBUTIONS; used whenever no distributions are given
+default_distributions = Distributions()
+
+def get_random_item(array, rng=random):
     """Get a random item from an array"""
-    return random.choice(array)
+    return rng.choice(array)
 
-def get_random_tags(min_tags=1, max_tags=5):
+def get_random_tags(min_tags=1, max_tags=5, rng=random):
     """Create a random list of tags"""
-    num_tags = random.randint(min_tags, max_tags)
-    return random.sample(sample_tags, num_tags)
+    num_tags = rng.randint(min_tags, max_tags)
+    return rng.sample(sample_tags, num_tags)
 
-def get_random_achievements(min_achievements=0, max_achievements=5):
+def get_random_achievements(min_achievements=0, max_achievements=5, rng=random):
     """Create a random list of achievements"""
-    num_achievements = random.randint(min_achievements, max_achievements)
-    return random.sample(sample_achievements, num_achievements)
+    num_achievements = rng.randint(min_achievements, max_achievements)
+    return rng.sample(sample_achievements, num_achievements)
 
-def generate_check_in(user_id, user_name, user_photo=None):
-    """Create a random check-in with more detailed data"""
-    # 70% chance to have a workout, 30% chance to be busy
-    status = 'workout' if random.random() < 0.7 else 'busy'
+def generate_check_in(user_id, user_name, user_photo=None, days_back=DEFAULT_DAYS_BACK, now=None, rng=random,
+                      timestamps=None, habit=None, distributions=None):
+    """Create a random check-in with more detailed data
+
+    timestamps is a timestamp model such as DiurnalTimestamps (uniform when
+    omitted) and habit the owner's habitual hour from its user_habit().
+    distributions is the CheckInDistributions of the owner's fitness level
+    (see Distributions.for_level()), the defaults when omitted.
+    """
+    now = now or datetime.datetime.now()
+    timestamps = timestamps or UniformTimestamps()
+    distributions = distributions or default_distributions.base
+    # 70% chance to have a workout, 30% chance to be busy by default
+    status = 'workout' if rng.random() < distributions.workout_share else 'busy'
     
     # Base check-in data
     check_in = {
@@ -331,90 +1977,89 @@ def generate_check_in(user_id, user_name, user_photo=None):
         'userDisplayName': user_name,
         'userPhotoURL': user_photo,
         'status': status,
-        'timestamp': get_random_date(),
-        'likes': random.randint(0, 30),  # Random likes count
-        'comments': random.randint(0, 10)  # Random comments count
+        'timestamp': timestamps.sample(days_back, now, rng, habit),
+        'likes': distributions.likes.sample(rng),  # Random likes count
+        'comments': distributions.comments.sample(rng)  # Random comments count
     }
     
     # Add activity-specific data if it's a workout
     if status == 'workout':
-        check_in['activityType'] = get_random_item(activities)
-        check_in['notes'] = get_random_item(sample_notes)
+        check_in['activityType'] = distributions.activity.sample(rng)
+        check_in['notes'] = get_random_item(sample_notes, rng)
         
-        # Add tags to the check-in (1-5 random tags)
-        check_in['tags'] = get_random_tags()
+        # Add tags to the check-in (1-5 random tags by default)
+        check_in['tags'] = distributions.tags.sample_distinct(distributions.tag_count.sample(rng), rng)
         
-        # Add workout duration (15-120 minutes)
-        check_in['duration'] = random.randint(15, 120)
+        # Add workout duration (15-120 minutes by default)
+        check_in['duration'] = distributions.duration.sample(rng)
         
         # Add workout intensity (1-10)
-        check_in['intensity'] = random.randint(1, 10)
+        check_in['intensity'] = distributions.intensity.sample(rng)
         
-        # Add location (70% chance)
-        if random.random() < 0.7:
-            check_in['location'] = get_random_item(sample_locations)
+        # Add location (70% chance by default)
+        if rng.random() < distributions.location_share:
+            check_in['location'] = distributions.location.sample(rng)
         
         # Add mood (1-5 stars)
-        check_in['mood'] = random.randint(1, 5)
+        check_in['mood'] = distributions.mood.sample(rng)
         
-        # 60% chance to have a photo
-        if random.random() < 0.6:
-            check_in['photoUrl'] = get_random_item(sample_photo_urls)
+        # 60% chance to have a photo by default
+        if rng.random() < distributions.photo_share:
+            check_in['photoUrl'] = get_random_item(sample_photo_urls, rng)
     
     return check_in
 
-def generate_story(user_id, user_name, user_photo=None):
-    """Create a random story with more details"""
-    now = datetime.datetime.now()
-    expires_at = now + datetime.timedelta(hours=24)
+def generate_story(user_id, user_name, user_photo=None, now=None, rng=random, timestamps=None, habit=None):
+    """Create a random story with more details
+
+    Stories are posted within the last day or two and expire STORY_LIFETIME
+    after they were posted, so some of them have already expired.
+    """
+    now = now or datetime.datetime.now()
+    timestamps = timestamps or UniformTimestamps()
+    posted_at = timestamps.sample(1, now, rng, habit)  # Stories are more recent
     
     story = {
         'userId': user_id,
         'userDisplayName': user_name,
         'userPhotoURL': user_photo,
-        'photoUrl': get_random_item(sample_photo_urls),
-        'caption': get_random_item(sample_notes) if random.random() < 0.7 else None,
-        'timestamp': get_random_date(days_back=1),  # Stories are more recent
-        'expiresAt': expires_at,
+        'photoUrl': get_random_item(sample_photo_urls, rng),
+        'caption': get_random_item(sample_notes, rng) if rng.random() < 0.7 else None,
+        'timestamp': posted_at,
+        'expiresAt': posted_at + STORY_LIFETIME,
         # 50% chance to add tags to stories
-        'tags': get_random_tags() if random.random() < 0.5 else [],
+        'tags': get_random_tags(rng=rng) if rng.random() < 0.5 else [],
         # Add location (50% chance)
-        'location': get_random_item(sample_locations) if random.random() < 0.5 else None,
+        'location': get_random_item(sample_locations, rng) if rng.random() < 0.5 else None,
         # Add mood (70% chance)
-        'mood': random.randint(1, 5) if random.random() < 0.7 else None
+        'mood': rng.randint(1, 5) if rng.random() < 0.7 else None
     }
     
     return story
 
-def generate_user():
-    """Create a user and their check-ins with more detailed profile"""
-    user_data = get_random_item(sample_users)
-    
+def user_profile(user_data, now=None, rng=random, total_check_ins=0):
+    """Create the users/{id} document for a profile from synthetic_user() or sample_users"""
     # Create user avatar URL using ui-avatars.com or random profile pic
-    if random.random() < 0.7:
+    if rng.random() < 0.7:
         avatar_url = f"https://ui-avatars.com/api/?name={user_data['displayName'].replace(' ', '+')}&background=random&size=200"
     else:
         # Use a random photo from Unsplash as profile pic
-        avatar_url = f"https://images.unsplash.com/photo-{1500000000 + random.randint(1, 999999)}?auto=format&fit=crop&w=200&h=200"
-    
-    # Create user document with expanded profile data
-    user_ref = db.collection('users').document()
-    user_id = user_ref.id
+        avatar_url = f"https://images.unsplash.com/photo-{1500000000 + rng.randint(1, 999999)}?auto=format&fit=crop&w=200&h=200"
     
     # Additional user profile data
-    bio = random.choice([
+    bio = rng.choice([
         f"Fitness enthusiast | {user_data['fitnessLevel'].capitalize()} level",
         f"Working on becoming my best self through fitness",
-        f"Love {get_random_item(activities)} and {get_random_item(activities)}",
+        f"Love {get_random_item(activities, rng)} and {get_random_item(activities, rng)}",
         f"{user_data['fitnessLevel'].capitalize()} fitness journey in progress",
         f"Passionate about health and wellness",
-        f"Training for a {get_random_item(['marathon', 'triathlon', 'competition', 'race', 'tournament'])}",
+        f"Training for a {get_random_item(['marathon', 'triathlon', 'competition', 'race', 'tournament'], rng)}",
         f"Fitness is my therapy",
         None  # Some users might not have a bio
     ])
     
     # User goals
-    goals = random.sample([
+    goals = rng.sample([
         "Lose weight",
         "Build muscle",
         "Improve endurance",
@@ -424,12 +2069,13 @@ def generate_user():
         "Reduce stress",
         "Increase flexibility",
         "Improve overall fitness"
-    ], random.randint(1, 3))
+    ], rng.randint(1, 3))
     
     # User stats
-    total_workouts = random.randint(user_data['streak'], user_data['streak'] * 3)
+    total_workouts = rng.randint(user_data['streak'], user_data['streak'] * 3)
     
-    user_ref.set({
+    # Create user document with expanded profile data
+    return {
         'displayName': user_data['displayName'],
         'streak': user_data['streak'],
         'photoURL': avatar_url,
@@ -437,154 +2083,1480 @@ def generate_user():
         'bio': bio,
         'goals': goals,
         'totalWorkouts': total_workouts,
-        'achievements': get_random_achievements(min_achievements=1, max_achievements=8),
-        'favoriteActivities': random.sample(activities, random.randint(1, 5)),
-        'joined': get_random_date(days_back=180),  # User joined in the last 180 days
+        'achievements': get_random_achievements(min_achievements=1, max_achievements=8, rng=rng),
+        'favoriteActivities': rng.sample(activities, rng.randint(1, 5)),
+        'joined': get_random_date(days_back=180, now=now, rng=rng),  # User joined in the last 180 days
         'lastLogin': SERVER_TIMESTAMP,
-        'createdAt': SERVER_TIMESTAMP
-    })
+        'createdAt': SERVER_TIMESTAMP,
+        # The app reads and orders users by these nested copies (e.g. getTrendingUsers).
+        # totalWorkouts is counted from the generated check-ins by the caller, so it
+        # agrees with userStats/{id}
+        'fitnessStats': {
+            'streak': user_data['streak'],
+            'totalWorkouts': 0,
+            'totalCheckIns': total_check_ins
+        }
+    }
+
+def check_in_documents(user_id, check_in_data, rng=random):
+    """Yield the feed entry and users/{id}/checkIns copy of a check-in"""
+    # Add to feed collection
+    yield 'feed', new_doc_id(rng), check_in_data
     
-    print(f"Created user: {user_data['displayName']} (ID: {user_id})")
+    # Add to user's check-ins subcollection
+    yield f'users/{user_id}/checkIns', new_doc_id(rng), check_in_data
+
+def story_documents(user_id, user_name, user_photo, now=None, rng=random, timestamps=None, habit=None):
+    """Yield the stories of a user; about half of all users post 1-3 stories"""
+    # Create a story for some users (50% chance, increased from 40%)
+    if rng.random() >= 0.5:
+        return
     
-    # Generate 5-12 check-ins for this user (more data per user)
-    num_check_ins = random.randint(5, 12)
+    # Some users might have multiple stories
+    num_stories = rng.randint(1, 3)
     
+    for j in range(num_stories):
+        story_data = generate_story(user_id, user_name, user_photo, now, rng, timestamps, habit)
+        yield from story_post_documents(user_id, story_data, rng)
+
+def story_post_documents(user_id, story_data, rng=random):
+    """Yield the stories entry, users/{id}/stories pointer and feed copy of a story"""
+    # Add to stories collection
+    story_id = new_doc_id(rng)
+    yield 'stories', story_id, story_data
+    
+    # Add to user's stories subcollection
+    yield f'users/{user_id}/stories', new_doc_id(rng), {
+        'storyId': story_id,
+        'timestamp': SERVER_TIMESTAMP
+    }
+    
+    # Also add to feed collection as a story-type entry
+    feed_story_data = story_data.copy()
+    feed_story_data['type'] = 'story'
+    # Links the copy to its story like addStory() in socialService.js does
+    feed_story_data['storyId'] = story_id
+    feed_story_data['likes'] = rng.randint(0, 25)
+    
+    yield 'feed', new_doc_id(rng), feed_story_data
+
+def user_documents(user_id, user_data, check_ins_per_user=DEFAULT_CHECK_INS_PER_USER,
+                   days_back=DEFAULT_DAYS_BACK, now=None, rng=random, timestamps=None, distributions=None):
+    """Yield (collection_path, doc_id, data) for a user profile, their check-ins and stories
+
+    With distributions (a Distributions), check-in counts and fields are
+    drawn from the distributions of the user's fitness level.
+    """
+    now = now or datetime.datetime.now()
+    timestamps = timestamps or UniformTimestamps()
+    level = distributions.for_level(user_data['fitnessLevel']) if distributions is not None else None
+    # Generate 5-12 check-ins for this user by default (more data per user)
+    num_check_ins = level.check_ins_per_user.sample(rng) if level else rng.randint(*check_ins_per_user)
+    
+    profile = user_profile(user_data, now, rng, num_check_ins)
+    habit = timestamps.user_habit(rng)
+    
+    # The check-ins are drawn before the profile is yielded, in the same order, so
+    # its fitnessStats can count their workouts
+    check_ins = []
     for i in range(num_check_ins):
-        check_in_data = generate_check_in(user_id, user_data['displayName'], avatar_url)
-        
-        # Add to feed collection
-        feed_ref = db.collection('feed').document()
-        feed_ref.set(check_in_data)
-        
-        # Add to user's check-ins subcollection
-        user_check_in_ref = db.collection(f'users/{user_id}/checkIns').document()
-        user_check_in_ref.set(check_in_data)
-        
-        print(f"  Added check-in {i+1}/{num_check_ins} for {user_data['displayName']}")
+        check_in_data = generate_check_in(user_id, user_data['displayName'], profile['photoURL'], days_back, now, rng,
+                                          timestamps, habit, level)
+        profile['fitnessStats']['totalWorkouts'] += check_in_data['status'] == 'workout'
+        check_ins.extend(check_in_documents(user_id, check_in_data, rng))
+    yield 'users', user_id, profile
+    yield from check_ins
     
-    # Create a story for some users (50% chance, increased from 40%)
-    if random.random() < 0.5:
-        # Some users might have multiple stories
-        num_stories = random.randint(1, 3)
-        
-        for j in range(num_stories):
-            story_data = generate_story(user_id, user_data['displayName'], avatar_url)
-            
-            # Add to stories collection
-            story_ref = db.collection('stories').document()
-            story_id = story_ref.id
-            story_ref.set(story_data)
-            
-            # Add to user's stories subcollection
-            user_story_ref = db.collection(f'users/{user_id}/stories').document()
-            user_story_ref.set({
-                'storyId': story_id,
-                'timestamp': SERVER_TIMESTAMP
-            })
-            
-            # Also add to feed collection as a story-type entry
-            feed_story_data = story_data.copy()
-            feed_story_data['type'] = 'story'
-            feed_story_data['likes'] = random.randint(0, 25)
-            
-            feed_story_ref = db.collection('feed').document()
-            feed_story_ref.set(feed_story_data)
-            
-            print(f"  Added story {j+1}/{num_stories} for {user_data['displayName']}")
-    
-    # Add some followers and following relationships (social graph)
+    yield from story_documents(user_id, user_data['displayName'], profile['photoURL'], now, rng, timestamps, habit)
+
+def check_in_draws(count, distributions, max_tags, rng):
+    """Draw count rows of every random check-in column from one CheckInDistributions"""
+    import numpy as np
+
+    tag_choice = distributions.tags.distinct_array(count, max_tags, rng)
+    return {
+        'workout': rng.random(count) < distributions.workout_share,
+        'likes': distributions.likes.sample_array(count, rng),
+        'comments': distributions.comments.sample_array(count, rng),
+        'activity': distributions.activity.sample_array(count, rng),
+        'note': rng.integers(0, len(sample_notes), count),
+        'num_tags': np.minimum(distributions.tag_count.sample_array(count, rng), distributions.tags.choices),
+        'tags': tag_choice,
+        'duration': distributions.duration.sample_array(count, rng),
+        'intensity': distributions.intensity.sample_array(count, rng),
+        'has_location': rng.random(count) < distributions.location_share,
+        'location': distributions.location.sample_array(count, rng),
+        'mood': distributions.mood.sample_array(count, rng),
+        'has_photo': rng.random(count) < distributions.photo_share,
+        'photo': rng.integers(0, len(sample_photo_urls), count),
+    }
+
+def check_in_columns(count, days_back=DEFAULT_DAYS_BACK, now=None, rng=None, timestamps=None, habits=None,
+                     distributions=None, levels=None):
+    """Draw the fields of count check-ins at once as NumPy columns
+
+    Every column follows the same distribution as generate_check_in(); fields
+    that only exist on workouts are drawn for every row and ignored for busy
+    check-ins. Timestamps are int64 microseconds since the epoch, drawn by
+    the timestamp model's sample_array() with one habitual hour per row.
+    With distributions, every row is drawn from the base distributions and
+    the rows of each fitness level with its own (levels holds one level per
+    row) are then redrawn from that level's.
+    """
+    import numpy as np
+
+    rng = rng if rng is not None else np.random.default_rng()
+    now = now or datetime.datetime.now()
+    timestamps = timestamps or UniformTimestamps()
+    distributions = distributions or default_distributions
+    
+    timestamp_column = timestamps.sample_array(count, days_back, now, rng, habits)
+    max_tags = min(distributions.max_tag_count, len(distributions.base.tags.names))
+    columns = {'timestamp': timestamp_column, **check_in_draws(count, distributions.base, max_tags, rng)}
+    if distributions.levels and levels is not None:
+        levels = np.asarray(levels)
+        for level, level_distributions in distributions.levels.items():
+            rows = np.flatnonzero(levels == level)
+            if len(rows):
+                for name, column in check_in_draws(len(rows), level_distributions, max_tags, rng).items():
+                    columns[name][rows] = column
+    return columns
+
+def check_ins_from_columns(columns, users, distributions=None):
+    """Turn check_in_columns() output into check-in dicts
+
+    users holds one (user_id, user_name, user_photo) tuple per row. Columns are
+    converted to Python lists once up front so the per-row work is plain
+    indexing. Category columns index into the names of distributions.
+    """
+    names = (distributions or default_distributions).base
+    activity_names, tag_names, location_names = names.activity.names, names.tags.names, names.location.names
+    rows = {name: column.tolist() for name, column in columns.items()}
+    for i, (user_id, user_name, user_photo) in enumerate(users):
+        workout = rows['workout'][i]
+        check_in = {
+            'userId': user_id,
+            'userDisplayName': user_name,
+            'userPhotoURL': user_photo,
+            'status': 'workout' if workout else 'busy',
+            'timestamp': datetime.datetime.fromtimestamp(rows['timestamp'][i] / 1_000_000),
+            'likes': rows['likes'][i],
+            'comments': rows['comments'][i]
+        }
+        if workout:
+            check_in['activityType'] = activity_names[rows['activity'][i]]
+            check_in['notes'] = sample_notes[rows['note'][i]]
+            check_in['tags'] = [tag_names[t] for t in rows['tags'][i][:rows['num_tags'][i]]]
+            check_in['duration'] = rows['duration'][i]
+            check_in['intensity'] = rows['intensity'][i]
+            if rows['has_location'][i]:
+                check_in['location'] = location_names[rows['location'][i]]
+            check_in['mood'] = rows['mood'][i]
+            if rows['has_photo'][i]:
+                check_in['photoUrl'] = sample_photo_urls[rows['photo'][i]]
+        yield check_in
+
+def user_chunk_documents(users, check_ins_per_user=DEFAULT_CHECK_INS_PER_USER, days_back=DEFAULT_DAYS_BACK,
+                         now=None, rng=random, np_rng=None, timestamps=None, distributions=None):
+    """Yield the documents for a chunk of (user_id, user_data) pairs using the NumPy engine
+
+    Profiles and stories are still drawn per user from rng, but the check-ins
+    of the whole chunk come from a single check_in_columns() call on np_rng.
+    The profiles and stories are held back until then, so the profiles'
+    fitnessStats can count the workouts among their check-ins.
+    """
+    now = now or datetime.datetime.now()
+    timestamps = timestamps or UniformTimestamps()
+    owners = []
+    habits = []
+    levels = []
+    profiles = []
+    documents = []
+    for user_id, user_data in users:
+        if distributions is not None:
+            num_check_ins = distributions.for_level(user_data['fitnessLevel']).check_ins_per_user.sample(rng)
+        else:
+            num_check_ins = rng.randint(*check_ins_per_user)
+        profile = user_profile(user_data, now, rng, num_check_ins)
+        profiles.append((profile, len(owners), num_check_ins))
+        documents.append(('users', user_id, profile))
+        habit = timestamps.user_habit(rng)
+        owner = (user_id, user_data['displayName'], profile['photoURL'])
+        owners.extend([owner] * num_check_ins)
+        habits.extend([float('nan') if habit is None else habit] * num_check_ins)
+        levels.extend([user_data['fitnessLevel']] * num_check_ins)
+        documents.extend(story_documents(*owner, now, rng, timestamps, habit))
+    
+    columns = check_in_columns(len(owners), days_back, now, np_rng, timestamps, habits, distributions, levels)
+    for profile, start, count in profiles:
+        profile['fitnessStats']['totalWorkouts'] = int(columns['workout'][start:start + count].sum())
+    yield from documents
+    for owner, check_in_data in zip(owners, check_ins_from_columns(columns, owners, distributions)):
+        yield from check_in_documents(owner[0], check_in_data, rng)
+
+def generate_user(writer=None, user_data=None, check_ins_per_user=DEFAULT_CHECK_INS_PER_USER,
+                  days_back=DEFAULT_DAYS_BACK, user_id=None, now=None, rng=random, timestamps=None,
+                  distributions=None):
+    """Create a user and their check-ins with more detailed profile
+
+    Writes are queued on writer so they can share batches with other users;
+    when no writer is given, a private Firestore BatchWriter is created and
+    flushed on return. user_data is a profile like the entries of
+    sample_users (see synthetic_user()); a random sample user is used when it
+    is omitted. Pass user_id, now and a seeded rng to make the output
+    reproducible, a timestamp model to shape when posts happen and
+    Distributions to replace the default check-in distributions.
+    """
+    if writer is None:
+        with BatchWriter(get_db()) as writer:
+            return generate_user(writer, user_data, check_ins_per_user, days_back, user_id, now, rng, timestamps,
+                                 distributions)
+
+    if user_data is None:
+        user_data = get_random_item(sample_users, rng)
+    
+    user_id = user_id or new_doc_id(rng)
+    write_documents(writer, user_documents(user_id, user_data, check_ins_per_user, days_back, now, rng, timestamps,
+                                           distributions))
     return user_id
 
-def generate_social_graph(user_ids):
-    """Generate followers and following relationships between users"""
-    print("Generating social connections between users...")
+def follow_weights(num_users, seed=None):
+    """Build the cumulative popularity weights that followees are drawn from
+
+    Each user gets a Pareto-distributed popularity, and a few celebrity
+    accounts together attract CELEBRITY_SHARE of all follows. Drawing
+    followees in proportion to popularity gives a heavy-tailed follower
+    count. The weights are derived from the seed alone, so every shard sees
+    the same graph.
+    """
+    rng = seeded_rng(seed, 'popularity')
+    weights = [rng.paretovariate(POPULARITY_ALPHA) for _ in range(num_users)]
     
-    for user_id in user_ids:
-        # Each user follows 3-15 random other users
-        num_following = random.randint(3, 15)
-        following_users = random.sample([uid for uid in user_ids if uid != user_id], min(num_following, len(user_ids)-1))
-        
-        # Create following collection for this user
-        for following_id in following_users:
-            db.collection(f'users/{user_id}/following').document(following_id).set({
-                'userId': following_id,
-                'timestamp': SERVER_TIMESTAMP
-            })
-        
-        # Create followers collection for the users being followed
-        for following_id in following_users:
-            db.collection(f'users/{following_id}/followers').document(user_id).set({
-                'userId': user_id,
-                'timestamp': SERVER_TIMESTAMP
-            })
+    num_celebrities = min(num_users, max(1, round(num_users * CELEBRITY_FRACTION)))
+    celebrity_weight = sum(weights) * CELEBRITY_SHARE / (1 - CELEBRITY_SHARE) / num_celebrities
+    for index in rng.sample(range(num_users), num_celebrities):
+        weights[index] = celebrity_weight
     
-    print(f"Social graph generated with followers and following relationships")
+    return array('d', itertools.accumulate(weights))
 
-def generate_metadata():
-    """Generate metadata including available tags and activities"""
-    print("Creating metadata documents...")
+def following_count(rng, max_following):
+    """Draw how many users someone follows from a power law truncated to [MIN_FOLLOWING, max_following]"""
+    if max_following <= MIN_FOLLOWING:
+        return max_following
+    exponent = 1 - FOLLOWING_ALPHA
+    span = 1 - (max_following / MIN_FOLLOWING) ** exponent
+    return int(MIN_FOLLOWING * (1 - rng.random() * span) ** (1 / exponent))
+
+def social_graph_edges(num_users, seed=None, shard=(0, 1), max_following=MAX_FOLLOWING):
+    """Yield (follower, followee) index pairs for the followers in shard
+
+    Followees are drawn by binary search over follow_weights(), so no
+    per-user candidate list is built. Duplicates and self-follows are
+    rejected, and each follower's edges come out together.
+    """
+    if num_users < 2:
+        return
+    cumulative = follow_weights(num_users, seed)
+    total = cumulative[-1]
+    max_following = min(max_following, num_users - 1)
     
+    for follower in shard_indices(num_users, shard):
+        rng = seeded_rng(seed, 'graph', follower)
+        wanted = following_count(rng, max_following)
+        followees = set()
+        # Popular users are drawn over and over in small graphs, so give up
+        # on the exact count rather than spin
+        for _ in range(wanted * 20):
+            if len(followees) == wanted:
+                break
+            followee = bisect.bisect_right(cumulative, rng.random() * total)
+            if followee != follower and followee < num_users:
+                followees.add(followee)
+        for followee in sorted(followees):
+            yield follower, followee
+
+def follow_documents(user_id, following_id):
+    """Yield the two documents recording that user_id follows following_id"""
+    # Add to the follower's following collection
+    yield f'users/{user_id}/following', following_id, {
+        'userId': following_id,
+        'timestamp': SERVER_TIMESTAMP
+    }
+    
+    # Add to the followed user's followers collection
+    yield f'users/{following_id}/followers', user_id, {
+        'userId': user_id,
+        'timestamp': SERVER_TIMESTAMP
+    }
+
+def social_graph_documents(user_ids, seed=None, shard=(0, 1)):
+    """Yield the following/followers documents connecting user_ids
+
+    Only followers in shard are generated; each follower draws from its own
+    seeded stream, so shards produce disjoint, reproducible slices.
+    """
+    for follower, followee in social_graph_edges(len(user_ids), seed, shard):
+        yield from follow_documents(user_ids[follower], user_ids[followee])
+
+def generate_social_graph(user_ids, writer=None, seed=None, shard=(0, 1), skip_followers=(), timelines=None):
+    """Generate followers and following relationships between users
+
+    Each follower's edges are a unit of work (graph/<index>) for the writer's
+    journal; followers whose index is in skip_followers are left out. With a
+    TimelineBuilder, each follower's timeline is written along with its edges.
+    """
+    if writer is None:
+        with BatchWriter(get_db()) as writer:
+            return generate_social_graph(user_ids, writer, seed, shard, skip_followers, timelines)
+
+    print("Generating social connections between users...")
+    edges = social_graph_edges(len(user_ids), seed, shard)
+    for follower, follower_edges in itertools.groupby(edges, key=lambda edge: edge[0]):
+        if follower in skip_followers:
+            continue
+        followee_ids = [user_ids[followee] for _, followee in follower_edges]
+        for following_id in followee_ids:
+            write_documents(writer, follow_documents(user_ids[follower], following_id))
+        if timelines is not None:
+            write_documents(writer, timelines.timeline_documents(user_ids[follower], followee_ids))
+        writer.complete_unit(f'graph/{follower}')
+    print(f"Social graph generated with followers and following relationships")
+
+DEFAULT_TIMELINE_SIZE = 50
+
+# Low bits of a TimelineBuilder heap key that hold the post's row
+POST_INDEX_BITS = 40
+POST_INDEX_MASK = (1 << POST_INDEX_BITS) - 1
+
+class TimelineBuilder:
+    """Pre-build users/{id}/timeline documents from the generated feed (fan-out-on-write)
+
+    observe() watches the feed documents as they are written and keeps only
+    the newest max_entries posts of each author, since a timeline capped at
+    max_entries can never show an author's older posts. Once a follower's
+    followees are known, timeline_documents() merges their posts into that
+    follower's timeline. Counters track the write amplification and bytes
+    written so the fan-out cost can be compared with fan-out-on-read.
+
+    Every feed post of the run passes through here, so posts are kept in
+    columns rather than as dicts or tuples: the feed ID in a DocIdTable, the
+    type, activity and photo URL as StringTable codes in arrays. Each author's
+    heap holds one int per post, the post's timestamp in microseconds
+    shifted left by POST_INDEX_BITS plus its row in the columns. Timeline
+    documents are only turned back into dicts as they are written.
+    """
+
+    def __init__(self, max_entries=DEFAULT_TIMELINE_SIZE):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.authors = {}
+        self.posts = {}
+        self.feed_ids = DocIdTable()
+        self.strings = StringTable(['checkIn', 'story'] + activities + sample_photo_urls)
+        self.types = array('H')
+        self.activity_types = array('H')
+        self.photo_urls = array('H')
+        self.epoch = None
+        self.source_posts = 0
+        self.source_bytes = 0
+        self.timeline_entries = 0
+        self.timeline_bytes = 0
+        self.timelines = 0
+
+    def observe(self, path, doc_id, data):
+        if path != 'feed':
+            return
+        user_id = data['userId']
+        with self.lock:
+            if self.epoch is None:
+                self.epoch = datetime.datetime(1970, 1, 1, tzinfo=data['timestamp'].tzinfo)
+            row = len(self.types)
+            self.feed_ids.append(doc_id)
+            self.types.append(self.strings.code(data.get('type', 'checkIn')))
+            self.activity_types.append(self.strings.code(data.get('activityType')))
+            self.photo_urls.append(self.strings.code(data.get('photoUrl')))
+            key = (data['timestamp'] - self.epoch) // datetime.timedelta(microseconds=1) << POST_INDEX_BITS | row
+            self.authors[user_id] = (data['userDisplayName'], data['userPhotoURL'])
+            posts = self.posts.setdefault(user_id, [])
+            if len(posts) < self.max_entries:
+                heapq.heappush(posts, key)
+            else:
+                heapq.heappushpop(posts, key)
+            self.source_posts += 1
+            self.source_bytes += document_size(path, doc_id, data)
+
+    def timeline_documents(self, user_id, followee_ids):
+        """Yield the timeline of user_id: the newest max_entries posts of followee_ids"""
+        candidates = ((key, author) for author in followee_ids for key in self.posts.get(author, ()))
+        newest = heapq.nlargest(self.max_entries, candidates)
+        path = f'users/{user_id}/timeline'
+        for key, author in newest:
+            row = key & POST_INDEX_MASK
+            feed_id = self.feed_ids[row]
+            activity_type = self.strings[self.activity_types[row]]
+            photo_url = self.strings[self.photo_urls[row]]
+            name, photo = self.authors[author]
+            entry = {
+                'feedId': feed_id,
+                'userId': author,
+                'userDisplayName': name,
+                'userPhotoURL': photo,
+                'type': self.strings[self.types[row]],
+                'timestamp': self.epoch + datetime.timedelta(microseconds=key >> POST_INDEX_BITS)
+            }
+            if activity_type is not None:
+                entry['activityType'] = activity_type
+            if photo_url is not None:
+                entry['photoUrl'] = photo_url
+            with self.lock:
+                self.timeline_entries += 1
+                self.timeline_bytes += document_size(path, feed_id, entry)
+            yield path, feed_id, entry
+        with self.lock:
+            self.timelines += 1
+
+    def report(self):
+        """Print the cost of fan-out-on-write compared with the feed it was built from"""
+        amplification = self.timeline_entries / self.source_posts if self.source_posts else 0
+        print(f"Timelines: {self.timeline_entries} entries for {self.timelines} users "
+              f"from {self.source_posts} feed posts (write amplification {amplification:.1f}x)")
+        print(f"Timelines: {self.timeline_bytes / 1e6:.1f} MB written vs "
+              f"{self.source_bytes / 1e6:.1f} MB of feed posts; each timeline read is 1 query "
+              f"of up to {self.max_entries} documents instead of one per followee")
+
+# Entries per leaderboard document; top LEADERBOARD_SIZE users are spread
+# over LEADERBOARD_SIZE / LEADERBOARD_SHARD_SIZE documents
+LEADERBOARD_SIZE = 1000
+LEADERBOARD_SHARD_SIZE = 100
+
+class AggregateBuilder:
+    """Compute summary documents in the same pass that writes the check-ins
+
+    observe() folds every users/{id}/checkIns document into running per-user
+    stats plus global per-activity and per-tag counts. Once a user is done,
+    user_summary_documents() emits their userStats/{id} document and feeds
+    the user into bounded top-N heaps. aggregate_documents() then emits the
+    sharded leaderboards and the count documents. Only users still being
+    generated are held in memory (plus the bounded heaps, which carry the
+    names and photos their entries need), so dashboard and leaderboard reads
+    become single-document lookups without a full scan at seed time.
+    """
+
+    def __init__(self, now=None, leaderboard_size=LEADERBOARD_SIZE):
+        self.now = now or datetime.datetime.now()
+        self.leaderboard_size = leaderboard_size
+        self.lock = threading.Lock()
+        self.profiles = {}
+        self.users = {}
+        self.activity_counts = {}
+        self.tag_counts = {}
+        self.leaders = {'streak': [], 'workouts': []}
+
+    def observe(self, path, doc_id, data):
+        if path == 'users':
+            with self.lock:
+                self.profiles[doc_id] = (data['displayName'], data['photoURL'], data['streak'])
+            return
+        if not path.endswith('/checkIns'):
+            return
+        with self.lock:
+            stats = self.users.setdefault(data['userId'], {
+                'checkIns': 0, 'workouts': 0, 'minutes': 0, 'intensity': 0, 'mood': 0,
+                'last7Days': 0, 'last30Days': 0, 'lastCheckIn': None, 'activities': {}
+            })
+            stats['checkIns'] += 1
+            age = self.now - data['timestamp']
+            stats['last7Days'] += age <= datetime.timedelta(days=7)
+            stats['last30Days'] += age <= datetime.timedelta(days=30)
+            if stats['lastCheckIn'] is None or data['timestamp'] > stats['lastCheckIn']:
+                stats['lastCheckIn'] = data['timestamp']
+            if data['status'] != 'workout':
+                return
+            stats['workouts'] += 1
+            stats['minutes'] += data['duration']
+            stats['intensity'] += data['intensity']
+            stats['mood'] += data['mood']
+            activity = data['activityType']
+            stats['activities'][activity] = stats['activities'].get(activity, 0) + 1
+            self.activity_counts[activity] = self.activity_counts.get(activity, 0) + 1
+            for tag in data['tags']:
+                self.tag_counts[tag] = self.tag_counts.get(tag, 0) + 1
+
+    def _push_leader(self, metric, value, user_id, display_name, photo_url):
+        leaders = self.leaders[metric]
+        entry = (value, user_id, display_name, photo_url)
+        if len(leaders) < self.leaderboard_size:
+            heapq.heappush(leaders, entry)
+        else:
+            heapq.heappushpop(leaders, entry)
+
+    def user_summary_documents(self, user_id):
+        """Yield the userStats/{id} document for a finished user and rank them"""
+        with self.lock:
+            stats = self.users.pop(user_id, None)
+            display_name, photo_url, streak = self.profiles.pop(user_id, (None, None, 0))
+            workouts = stats['workouts'] if stats else 0
+            self._push_leader('streak', streak, user_id, display_name, photo_url)
+            self._push_leader('workouts', workouts, user_id, display_name, photo_url)
+        if stats is None:
+            return
+        activities_done = stats['activities']
+        yield 'userStats', user_id, {
+            'userId': user_id,
+            'displayName': display_name,
+            'streak': streak,
+            'totalCheckIns': stats['checkIns'],
+            'totalWorkouts': workouts,
+            'totalMinutes': stats['minutes'],
+            'averageIntensity': round(stats['intensity'] / workouts, 2) if workouts else None,
+            'averageMood': round(stats['mood'] / workouts, 2) if workouts else None,
+            'checkInsLast7Days': stats['last7Days'],
+            'checkInsLast30Days': stats['last30Days'],
+            'lastCheckIn': stats['lastCheckIn'],
+            'topActivity': max(activities_done, key=activities_done.get) if activities_done else None,
+            'updatedAt': SERVER_TIMESTAMP
+        }
+
+    def aggregate_documents(self):
+        """Yield the leaderboard shards and the per-activity and per-tag count documents"""
+        for metric, leaders in self.leaders.items():
+            ranked = sorted(leaders, reverse=True)
+            for shard, start in enumerate(range(0, len(ranked), LEADERBOARD_SHARD_SIZE)):
+                entries = []
+                for value, user_id, display_name, photo_url in ranked[start:start + LEADERBOARD_SHARD_SIZE]:
+                    entries.append({'userId': user_id, 'displayName': display_name,
+                                    'photoURL': photo_url, metric: value})
+                yield 'leaderboards', f'{metric}_{shard}', {
+                    'metric': metric,
+                    'shard': shard,
+                    'firstRank': start + 1,
+                    'entries': entries,
+                    'updatedAt': SERVER_TIMESTAMP
+                }
+        yield 'metadata', 'activityCounts', {'counts': dict(self.activity_counts), 'updatedAt': SERVER_TIMESTAMP}
+        yield 'metadata', 'tagCounts', {'counts': dict(self.tag_counts), 'updatedAt': SERVER_TIMESTAMP}
+
+def metadata_documents():
+    """Yield the metadata documents listing available tags, activities and achievements"""
     # Create metadata/tags document
-    tags_ref = db.collection('metadata').document('tags')
-    tags_ref.set({
+    yield 'metadata', 'tags', {
         'availableTags': sample_tags,
         'updatedAt': SERVER_TIMESTAMP
-    })
+    }
     
     # Create metadata/activities document
-    activities_ref = db.collection('metadata').document('activities')
-    activities_ref.set({
+    yield 'metadata', 'activities', {
         'availableActivities': activities,
         'updatedAt': SERVER_TIMESTAMP
-    })
+    }
     
     # Create metadata/achievements document
-    achievements_ref = db.collection('metadata').document('achievements')
-    achievements_ref.set({
+    yield 'metadata', 'achievements', {
         'availableAchievements': sample_achievements,
         'updatedAt': SERVER_TIMESTAMP
-    })
-    
+    }
+
+def generate_metadata(writer=None):
+    """Generate metadata including available tags and activities"""
+    if writer is None:
+        with BatchWriter(get_db()) as writer:
+            return generate_metadata(writer)
+
+    print("Creating metadata documents...")
+    write_documents(writer, metadata_documents())
+    writer.complete_unit('metadata')
     print(f"Added {len(sample_tags)} tags, {len(activities)} activities, and {len(sample_achievements)} achievements to metadata")
 
-def generate_all_sample_data():
-    """Generate sample data for all users"""
-    print("Starting sample data generation...")
+def generate_aggregates(summaries, writer, shard=(0, 1)):
+    """Write the leaderboards and count documents collected by an AggregateBuilder
+
+    They summarize every user, so a single shard only gets its userStats
+    documents.
+    """
+    if shard[1] > 1:
+        print("Skipping leaderboards and counts: they need every user, not one shard")
+        return
+    print("Writing leaderboards and activity/tag counts...")
+    write_documents(writer, summaries.aggregate_documents())
+    writer.complete_unit('aggregates')
+
+def submit_in_order(pool, fn, items, window):
+    """Submit fn(item) for each item to pool and yield the futures in order,
+    keeping at most window of them in flight"""
+    in_flight = deque()
+    for item in items:
+        in_flight.append(pool.submit(fn, item))
+        if len(in_flight) >= window:
+            yield in_flight.popleft()
+    while in_flight:
+        yield in_flight.popleft()
+
+def generate_all_sample_data(num_users=len(sample_users), check_ins_per_user=DEFAULT_CHECK_INS_PER_USER,
+                             days_back=DEFAULT_DAYS_BACK, workers=1, rate=DEFAULT_WRITE_RATE,
+                             batch_size=MAX_BATCH_SIZE, use_bulk_writer=False,
+                             seed=None, shard=(0, 1), now=None, journal=None, resume=False,
+                             timeline_size=None, aggregates=False, metrics=None, timestamps='uniform',
+                             distributions=None, counter_shards=None):
+    """Generate sample data for num_users synthetic users
+
+    Users are generated by a pool of `workers` threads. Each thread queues its
+    writes on its own BatchWriter (WriteBatch is not thread-safe), and all of
+    them draw from one token bucket so the combined write rate stays under
+    rate documents per second. Only a small window of users is in flight at
+    a time, so memory does not grow with num_users apart from the user ID
+    table the social graph needs (a DocIdTable, 20 bytes per user).
+
+    With a seed, every user draws from its own seeded stream and gets a
+    derived document ID, so the dataset is the same for any worker count and
+    can be split across machines with shard=(index, count). The timestamps
+    are relative to now, which must also be fixed to reproduce a run.
+
+    With a SeedJournal, committed documents and finished units are recorded
+    as they land. resume=True skips the units an earlier run with the same
+    settings finished (see resume_settings()); rewritten units reuse their
+    derived IDs, so a retried user overwrites its partial documents instead of
+    duplicating them. Journaled runs are always seeded.
+
+    timeline_size turns on the fan-out-on-write stage: every user also gets a
+    users/{id}/timeline collection holding the newest timeline_size posts of
+    the users they follow (see TimelineBuilder).
+
+    aggregates=True also writes a userStats/{id} summary per user and, on an
+    unsharded run, the leaderboards and activity/tag count documents (see
+    AggregateBuilder).
+
+    Progress goes to a single SeedMetrics line; pass metrics to keep the
+    counters for a dump after the run. timestamps names the timestamp model
+    in TIMESTAMP_MODELS that decides when check-ins and stories were posted.
+    distributions is a spec (see Distributions and load_distributions())
+    that replaces the default check-in distributions. counter_shards keeps
+    the likes and comments of every feed post in that many counter shards
+    (see CounterShardWriter).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    if shard[1] > 1 and seed is None:
+        raise ValueError("Sharded generation needs a seed so every shard derives the same user IDs")
+    if shard[1] > 1 and timeline_size:
+        raise ValueError("Timelines need every user's posts, so they cannot be built by a single shard")
+    if journal is not None and seed is None:
+        seed = random.randrange(2 ** 31)
+        print(f"Seeding journaled run with --seed {seed}")
+    now = now or datetime.datetime.now()
+    model = timestamp_model(timestamps)
+    compiled = Distributions(distributions, check_ins_per_user) if distributions else None
     
-    # First generate metadata
-    generate_metadata()
+    if journal is not None and not resume:
+        journal.start_run({
+            'num_users': num_users,
+            'check_ins_per_user': list(check_ins_per_user),
+            'days_back': days_back,
+            'seed': seed,
+            'shard': list(shard),
+            'now': now.isoformat(),
+            'timestamps': timestamps,
+            'distributions': distributions,
+            'counter_shards': counter_shards,
+            'timeline_size': timeline_size,
+            'aggregates': aggregates
+        })
+    done = journal.done_units() if resume and journal is not None else set()
     
-    # Generate all users one by one
-    user_ids = []
-    for i in range(len(sample_users)):
-        try:
-            user_id = generate_user()
-            user_ids.append(user_id)
-            print(f"Successfully generated user {i+1}/{len(sample_users)}")
-            # Small delay to avoid potential rate limiting
-            time.sleep(0.5)
-        except Exception as e:
-            print(f"Error generating user: {e}")
+    print("Resuming sample data generation..." if done else "Starting sample data generation...")
+    start = time.perf_counter()
+    metrics = metrics or SeedMetrics()
     
-    # Generate social connections between users
-    generate_social_graph(user_ids)
+    limiter = TokenBucket(rate) if rate else None
+    writers = []
+    writers_lock = threading.Lock()
+    local = threading.local()
     
+    def new_writer():
+        writer = BatchWriter(get_db(), batch_size=batch_size, use_bulk_writer=use_bulk_writer, limiter=limiter,
+                             journal=journal, metrics=metrics)
+        with writers_lock:
+            writers.append(writer)
+        return writer
+    
+    def thread_writer():
+        if not hasattr(local, 'writer'):
+            local.writer = new_writer()
+        return local.writer
+    
+    # First generate metadata (once, on the first shard)
+    if shard[0] == 0 and 'metadata' not in done:
+        metrics.stage('metadata')
+        generate_metadata(new_writer())
+    
+    timelines = TimelineBuilder(timeline_size) if timeline_size else None
+    summaries = AggregateBuilder(now) if aggregates else None
+    observers = [observer for observer in (timelines, summaries) if observer is not None]
+    
+    def user_task(index):
+        rng = seeded_rng(seed, 'user', index)
+        writer = thread_writer()
+        if counter_shards:
+            writer = CounterShardWriter(writer, counter_shards)
+        if observers:
+            writer = ObservingWriter(writer, observers)
+        user_id = generate_user(writer, synthetic_user(index, rng), check_ins_per_user, days_back,
+                                user_id_for(seed, index), now, rng, model, compiled)
+        if summaries is not None:
+            write_documents(writer, summaries.user_summary_documents(user_id))
+        writer.complete_unit(f'user/{index}')
+        return user_id
+    
+    # Users finished by an earlier run are regenerated without writing so the
+    # observers still see every document
+    if observers and done:
+        for index in shard_indices(num_users, shard):
+            if f'user/{index}' in done:
+                rng = seeded_rng(seed, 'user', index)
+                user_id = user_id_for(seed, index)
+                for document in user_documents(user_id, synthetic_user(index, rng),
+                                               check_ins_per_user, days_back, now, rng, model, compiled):
+                    for observer in observers:
+                        observer.observe(*document)
+                if summaries is not None:
+                    # Already written; drained only to rank the user
+                    for _ in summaries.user_summary_documents(user_id):
+                        pass
+    
+    def record_lost_units(error, units=()):
+        # A thread's batch holds the writes of every user it finished since
+        # its last commit, so a failed commit loses those users as well
+        lost = list(dict.fromkeys([*getattr(error, 'units', ()), *units]))
+        metrics.record_error(f"Lost the writes of {', '.join(lost) or 'queued documents'}: {error}")
+    
+    # Generate users in parallel; results are collected in submission order
+    # so user_ids keeps the same order as the serial loop
+    user_ids = DocIdTable()
+    indices = [index for index in shard_indices(num_users, shard) if f'user/{index}' not in done]
+    workers = max(1, workers)
+    metrics.stage('users', len(indices))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for index, future in zip(indices, submit_in_order(pool, user_task, indices, window=workers * 4)):
+            try:
+                user_ids.append(future.result())
+            except Exception as e:
+                record_lost_units(e, [f'user/{index}'])
+            metrics.advance()
+    
+    # Generate social connections between users. Seeded runs connect the
+    # full derived ID range, which also covers other shards and users
+    # finished by an earlier run
+    if seed is not None:
+        user_ids = DocIdTable.from_seed(seed, num_users)
+    skip_followers = {int(unit.split('/')[1]) for unit in done if unit.startswith('graph/')}
+    metrics.stage('graph')
+    generate_social_graph(user_ids, new_writer(), seed, shard, skip_followers, timelines)
+    
+    if summaries is not None and 'aggregates' not in done:
+        metrics.stage('aggregates')
+        generate_aggregates(summaries, new_writer(), shard)
+    
+    for writer in writers:
+        try:
+            writer.close()
+        except LostWritesError as e:
+            record_lost_units(e)
+    metrics.finish()
+    committed = sum(writer.committed for writer in writers)
+    batches = sum(writer.batches for writer in writers)
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {committed} documents in {batches} batches ({committed / elapsed:.0f} docs/sec)")
+    if timelines is not None:
+        timelines.report()
     print("Sample data generation complete!")
 
-def clear_sample_data():
-    """This function would delete all sample data
-    Not implemented for safety reasons as it's difficult to safely
-    identify and remove only sample data"""
-    print("Clearing sample data is not implemented for safety reasons.")
-    print("It would be difficult to safely identify and remove only sample data without affecting real user data.")
-    print("If you want to clear data, use the Firebase console or write a more specialized script.")
+def resume_settings(journal):
+    """Return the generate_all_sample_data() arguments of the run recorded in journal"""
+    settings = journal.settings()
+    if not settings:
+        raise ValueError(f"No run recorded in {journal.path} to resume")
+    return {
+        'num_users': settings['num_users'],
+        'check_ins_per_user': tuple(settings['check_ins_per_user']),
+        'days_back': settings['days_back'],
+        'seed': settings['seed'],
+        'shard': tuple(settings['shard']),
+        'now': datetime.datetime.fromisoformat(settings['now']),
+        'timestamps': settings.get('timestamps', 'uniform'),
+        'distributions': settings.get('distributions'),
+        'counter_shards': settings.get('counter_shards'),
+        'timeline_size': settings.get('timeline_size'),
+        'aggregates': settings.get('aggregates', False)
+    }
 
-if __name__ == "__main__":
-    choice = input("What would you like to do?\n1. Generate sample data\n2. Clear sample data (not implemented)\nEnter 1 or 2: ")
+def export_sample_data(output_dir, fmt='ndjson', num_users=len(sample_users),
+                       check_ins_per_user=DEFAULT_CHECK_INS_PER_USER, days_back=DEFAULT_DAYS_BACK,
+                       engine='python', chunk_size=ENGINE_CHUNK_SIZE, seed=None, shard=(0, 1), now=None,
+                       timeline_size=None, aggregates=False, metrics=None, timestamps='uniform',
+                       distributions=None, counter_shards=None):
+    """Generate the same data as generate_all_sample_data() into local files
+
+    Nothing touches Firestore, so this runs without credentials at disk speed.
+    Documents stream straight from the generators into a FileSink. With
+    engine='numpy' check-ins are drawn chunk_size users at a time by the
+    vectorized engine. seed, shard and now work as in
+    generate_all_sample_data(); each shard writes its own set of files, and a
+    seeded shard is byte-identical between runs with the same arguments.
+    timeline_size, aggregates, timestamps, distributions and counter_shards
+    work as in generate_all_sample_data().
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES}")
+    if shard[1] > 1 and seed is None:
+        raise ValueError("Sharded generation needs a seed so every shard derives the same user IDs")
+    if shard[1] > 1 and timeline_size:
+        raise ValueError("Timelines need every user's posts, so they cannot be built by a single shard")
+    now = now or datetime.datetime.now()
+    model = timestamp_model(timestamps)
+    compiled = Distributions(distributions, check_ins_per_user) if distributions else None
+    print(f"Exporting sample data to {output_dir} as {fmt}...")
+    start = time.perf_counter()
+    metrics = metrics or SeedMetrics()
     
-    if choice == "1":
-        generate_all_sample_data()
-    elif choice == "2":
-        clear_sample_data()
+    suffix = f".shard-{shard[0]}-of-{shard[1]}" if shard[1] > 1 else ''
+    timelines = TimelineBuilder(timeline_size) if timeline_size else None
+    summaries = AggregateBuilder(now) if aggregates else None
+    observers = [observer for observer in (timelines, summaries) if observer is not None]
+    with FileSink(output_dir, fmt, suffix=suffix, export_time=now, metrics=metrics) as file_sink:
+        sink = CounterShardWriter(file_sink, counter_shards) if counter_shards else file_sink
+        sink = ObservingWriter(sink, observers) if observers else sink
+        if shard[0] == 0:
+            generate_metadata(sink)
+        
+        user_ids = DocIdTable()
+        indices = shard_indices(num_users, shard)
+        metrics.stage('users', len(indices))
+        if engine == 'numpy':
+            import numpy as np
+
+            for chunk_start in range(0, len(indices), chunk_size):
+                chunk_indices = indices[chunk_start:chunk_start + chunk_size]
+                rng = seeded_rng(seed, 'chunk', chunk_indices[0])
+                np_rng = np.random.default_rng(None if seed is None else [seed, chunk_indices[0]])
+                chunk = [(user_id_for(seed, index), synthetic_user(index, rng)) for index in chunk_indices]
+                write_documents(sink, user_chunk_documents(chunk, check_ins_per_user, days_back, now, rng, np_rng,
+                                                           model, compiled))
+                for user_id, _ in chunk:
+                    user_ids.append(user_id)
+                    if summaries is not None:
+                        write_documents(sink, summaries.user_summary_documents(user_id))
+                metrics.advance(len(chunk))
+        else:
+            for index in indices:
+                rng = seeded_rng(seed, 'user', index)
+                user_id = generate_user(sink, synthetic_user(index, rng), check_ins_per_user, days_back,
+                                        user_id_for(seed, index), now, rng, model, compiled)
+                user_ids.append(user_id)
+                if summaries is not None:
+                    write_documents(sink, summaries.user_summary_documents(user_id))
+                metrics.advance()
+        
+        if shard[1] > 1:
+            user_ids = DocIdTable.from_seed(seed, num_users)
+        metrics.stage('graph')
+        generate_social_graph(user_ids, sink, seed, shard, timelines=timelines)
+        if summaries is not None:
+            metrics.stage('aggregates')
+            generate_aggregates(summaries, sink, shard)
+    metrics.finish()
+    
+    elapsed = time.perf_counter() - start
+    print(f"Exported {file_sink.written} documents ({file_sink.bytes_written / 1e6:.1f} MB) "
+          f"in {elapsed:.1f}s ({file_sink.written / elapsed:.0f} docs/sec)")
+    if timelines is not None:
+        timelines.report()
+
+def seeded_user_owner(seed, index, check_ins_per_user=DEFAULT_CHECK_INS_PER_USER, now=None, distributions=None):
+    """Rebuild (user_id, display name, photo URL) of a user written by a seeded run
+
+    Replays the start of user_documents() on the user's seeded stream, so
+    check_ins_per_user, now and distributions must match the run.
+    """
+    rng = seeded_rng(seed, 'user', index)
+    user_data = synthetic_user(index, rng)
+    if distributions is not None:
+        num_check_ins = distributions.for_level(user_data['fitnessLevel']).check_ins_per_user.sample(rng)
     else:
-        print("Invalid choice. Please run the script again and enter 1 or 2.") 
\ No newline at end of file
+        num_check_ins = rng.randint(*check_ins_per_user)
+    profile = user_profile(user_data, now, rng, num_check_ins)
+    return user_id_for(seed, index), user_data['displayName'], profile['photoURL']
+
+def append_check_ins(num_users, seed, rate=DEFAULT_APPEND_RATE, duration=None,
+                     check_ins_per_user=DEFAULT_CHECK_INS_PER_USER, now=None, batch_size=MAX_BATCH_SIZE,
+                     journal=None, metrics=None, distributions=None, counter_shards=None):
+    """Keep writing new check-ins by seeded users, stamped with the current time
+
+    Runs for duration seconds (until interrupted when None) at rate check-ins
+    per second. Each check-in goes to feed and users/{id}/checkIns like the
+    seeded ones, but every timestamp is the wall-clock time it was written.
+    That is the monotonically increasing index write pattern Firestore
+    throttles on, which a bulk seed with spread-out timestamps never shows.
+    Batches are committed when full or after APPEND_FLUSH_SECONDS, whichever
+    comes first. With a journal, the check-ins are recorded for clear.
+    distributions is the spec the users were seeded with, if any; the new
+    check-ins are drawn from its base distributions. With counter_shards the
+    new posts get counter shards like the seeded ones.
+    """
+    distributions = Distributions(distributions, check_ins_per_user) if distributions else None
+    metrics = metrics or SeedMetrics()
+    metrics.stage('append')
+    print(f"Appending {rate:g} check-ins/sec from {num_users} users"
+          + (f" for {duration:g}s" if duration else " until interrupted") + "...")
+    rng = random.Random()
+    owners = {}
+    limiter = TokenBucket(rate, capacity=1)
+    deadline = time.monotonic() + duration if duration else None
+    appended = 0
+    with BatchWriter(get_db(), batch_size=batch_size, journal=journal, metrics=metrics) as writer:
+        sink = CounterShardWriter(writer, counter_shards) if counter_shards else writer
+        last_flush = time.monotonic()
+        try:
+            while deadline is None or time.monotonic() < deadline:
+                limiter.acquire()
+                index = rng.randrange(num_users)
+                if index not in owners:
+                    owners[index] = seeded_user_owner(seed, index, check_ins_per_user, now, distributions)
+                user_id, user_name, user_photo = owners[index]
+                check_in_data = generate_check_in(user_id, user_name, user_photo, rng=rng,
+                                                  distributions=distributions.base if distributions else None)
+                check_in_data['timestamp'] = datetime.datetime.now()
+                write_documents(sink, check_in_documents(user_id, check_in_data, rng))
+                appended += 1
+                if time.monotonic() - last_flush >= APPEND_FLUSH_SECONDS:
+                    writer.flush()
+                    last_flush = time.monotonic()
+        except KeyboardInterrupt:
+            print("Stopping...")
+    metrics.finish()
+    print(f"Appended {appended} check-ins ({writer.committed} documents)")
+
+class TrafficSimulator:
+    """Emit a steady stream of app events as Firestore writes from an asyncio scheduler
+
+    Every event kind in rates runs as its own producer, ticking at its rate
+    on an absolute schedule so it does not drift. Each event becomes a few
+    write operations, mirroring what the app writes:
+    - check_in: a feed post and users/{id}/checkIns copy
+    - story: the story, its pointer and its feed copy
+    - like: a postLikes document plus an increment of the post's likes
+    - comment: a postComments document plus an increment of commentCount
+    - follow: both follow documents
+
+    Likes and comments target the newest RECENT_POSTS posts of the
+    simulation. Its stories are deleted again by a cleanup task once they
+    expire.
+
+    Producers put operations on a bounded queue that a single writer task
+    drains into batches, committed on a worker thread when full or after
+    APPEND_FLUSH_SECONDS. When Firestore falls behind, the queue fills up and
+    producers wait instead of piling up memory. Time spent waiting is
+    counted as throttling in the metrics. A producer that has fallen more
+    than a second behind skips ahead rather than bursting to catch up.
+
+    stop() (wired to SIGINT/SIGTERM by run()) ends the producers, lets the
+    writer drain and commit everything queued, and returns.
+
+    distributions (a Distributions) must be the ones the users were seeded
+    with, if any; simulated check-ins are drawn from its base distributions.
+    """
+
+    def __init__(self, writer, num_users, seed, rates=DEFAULT_SIMULATION_RATES,
+                 check_ins_per_user=DEFAULT_CHECK_INS_PER_USER, now=None, story_lifetime=STORY_LIFETIME,
+                 metrics=None, distributions=None):
+        unknown = set(rates) - set(DEFAULT_SIMULATION_RATES)
+        if unknown:
+            raise ValueError(f"Unknown events {sorted(unknown)}, expected some of {sorted(DEFAULT_SIMULATION_RATES)}")
+        self.writer = writer
+        self.num_users = num_users
+        self.seed = seed
+        self.rates = {kind: rate for kind, rate in rates.items() if rate > 0}
+        self.check_ins_per_user = check_ins_per_user
+        self.now = now
+        self.story_lifetime = story_lifetime
+        self.metrics = metrics or SeedMetrics()
+        self.distributions = distributions
+        self.rng = random.Random()
+        self.owners = {}
+        self.popularity = follow_weights(num_users, seed)
+        self.recent_posts = deque(maxlen=RECENT_POSTS)
+        self.stories = []
+        self.emitted = dict.fromkeys(self.rates, 0)
+        self.events = {'check_in': self.check_in, 'story': self.story, 'like': self.like,
+                       'comment': self.comment, 'follow': self.follow}
+        self._stopping = None
+
+    def owner(self, index):
+        if index not in self.owners:
+            self.owners[index] = seeded_user_owner(self.seed, index, self.check_ins_per_user, self.now,
+                                                   self.distributions)
+        return self.owners[index]
+
+    def random_user(self):
+        return self.owner(self.rng.randrange(self.num_users))
+
+    def check_in(self):
+        user_id, user_name, user_photo = self.random_user()
+        check_in_data = generate_check_in(user_id, user_name, user_photo, rng=self.rng,
+                                          distributions=self.distributions.base if self.distributions else None)
+        check_in_data['timestamp'] = datetime.datetime.now()
+        operations = [('set', *document) for document in check_in_documents(user_id, check_in_data, self.rng)]
+        self.recent_posts.append(operations[0][2])
+        return operations
+
+    def story(self):
+        user_id, user_name, user_photo = self.random_user()
+        story_data = generate_story(user_id, user_name, user_photo, rng=self.rng)
+        story_data['timestamp'] = datetime.datetime.now()
+        story_data['expiresAt'] = story_data['timestamp'] + self.story_lifetime
+        documents = list(story_post_documents(user_id, story_data, self.rng))
+        heapq.heappush(self.stories, (story_data['expiresAt'], [(path, doc_id) for path, doc_id, _ in documents]))
+        return [('set', *document) for document in documents]
+
+    def like(self):
+        if not self.recent_posts:
+            return []
+        post_id = self.rng.choice(self.recent_posts)
+        user_id = self.random_user()[0]
+        return [('set', 'postLikes', f'{user_id}_{post_id}',
+                 {'userId': user_id, 'postId': post_id, 'timestamp': SERVER_TIMESTAMP}),
+                ('update', 'feed', post_id, {'likes': Increment(1)})]
+
+    def comment(self):
+        if not self.recent_posts:
+            return []
+        post_id = self.rng.choice(self.recent_posts)
+        user_id = self.random_user()[0]
+        comment_id = new_doc_id(self.rng)
+        return [('set', 'postComments', comment_id, {
+                    'id': comment_id,
+                    'postId': post_id,
+                    'userId': user_id,
+                    'content': get_random_item(sample_notes, self.rng),
+                    'timestamp': SERVER_TIMESTAMP,
+                    'likes': 0
+                }),
+                ('update', 'feed', post_id, {'commentCount': Increment(1)})]
+
+    def follow(self):
+        follower = self.rng.randrange(self.num_users)
+        followee = bisect.bisect_right(self.popularity, self.rng.random() * self.popularity[-1])
+        if followee == follower or followee >= self.num_users:
+            return []
+        return [('set', *document) for document in follow_documents(self.owner(follower)[0], self.owner(followee)[0])]
+
+    def expired_stories(self):
+        """Pop the simulated stories that have expired and return the deletes removing them"""
+        now = datetime.datetime.now()
+        operations = []
+        while self.stories and self.stories[0][0] <= now:
+            _, documents = heapq.heappop(self.stories)
+            operations.extend(('delete', path, doc_id) for path, doc_id in documents)
+        return operations
+
+    def stop(self):
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def _enqueue(self, queue, operations):
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for operation in operations:
+            await queue.put(operation)
+        waited = loop.time() - start
+        if waited > 0.001:
+            self.metrics.record_throttle(waited)
+
+    async def _sleep_until(self, deadline):
+        """Sleep until the loop time deadline; return False if stop() was called first"""
+        import asyncio
+
+        delay = deadline - asyncio.get_running_loop().time()
+        if delay > 0:
+            try:
+                await asyncio.wait_for(self._stopping.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+        return not self._stopping.is_set()
+
+    async def _produce(self, kind, queue):
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        interval = 1 / self.rates[kind]
+        next_at = loop.time()
+        while True:
+            next_at += interval
+            if not await self._sleep_until(next_at):
+                return
+            if loop.time() - next_at > 1:
+                next_at = loop.time()
+            await self._enqueue(queue, self.events[kind]())
+            self.emitted[kind] += 1
+            self.metrics.advance()
+
+    async def _clean_up_stories(self, queue):
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        interval = min(STORY_CLEANUP_INTERVAL_SECONDS, self.story_lifetime.total_seconds())
+        while await self._sleep_until(loop.time() + interval):
+            await self._enqueue(queue, self.expired_stories())
+
+    def _apply(self, operations):
+        try:
+            for operation, path, doc_id, *data in operations:
+                getattr(self.writer, operation)(path, doc_id, *data)
+            self.writer.flush()
+        except Exception:
+            # Drop the failed batch so it is not retried with every later one
+            self.writer.discard()
+            raise
+
+    async def _write(self, queue, executor):
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        operations = []
+        flush_at = None
+        while True:
+            timeout = None if not operations else max(0, flush_at - loop.time())
+            try:
+                operation = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                operation = ()
+            if operation:
+                operations.append(operation)
+                if len(operations) == 1:
+                    flush_at = loop.time() + APPEND_FLUSH_SECONDS
+            if operations and (operation in ((), None) or len(operations) >= self.writer.batch_size):
+                try:
+                    await loop.run_in_executor(executor, self._apply, operations)
+                except Exception as e:
+                    self.metrics.record_error(f"Error writing simulated events: {e}")
+                operations = []
+            if operation is None:
+                return
+
+    async def run(self, duration=None):
+        """Run until duration seconds have passed or stop() is called"""
+        import asyncio
+        import signal
+        from concurrent.futures import ThreadPoolExecutor
+
+        loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, self.stop)
+            except (NotImplementedError, RuntimeError):
+                pass
+        if duration:
+            loop.call_later(duration, self.stop)
+        
+        queue = asyncio.Queue(maxsize=SIMULATION_QUEUE_SIZE)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            writer_task = asyncio.create_task(self._write(queue, executor))
+            producers = [self._produce(kind, queue) for kind in self.rates]
+            await asyncio.gather(*producers, self._clean_up_stories(queue))
+            # Producers are done; let the writer commit what is still queued
+            await queue.put(None)
+            await writer_task
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.remove_signal_handler(signum)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+    def report(self, elapsed):
+        for kind, rate in self.rates.items():
+            print(f"  {kind:>8}: {self.emitted[kind]} events ({self.emitted[kind] / elapsed:.2f}/sec, target {rate:g}/sec)")
+
+def simulate_traffic(num_users, seed, rates=DEFAULT_SIMULATION_RATES, duration=None,
+                     check_ins_per_user=DEFAULT_CHECK_INS_PER_USER, now=None, story_lifetime=STORY_LIFETIME,
+                     batch_size=MAX_BATCH_SIZE, journal=None, metrics=None, distributions=None,
+                     counter_shards=None):
+    """Run a TrafficSimulator against Firestore for duration seconds, or until interrupted
+
+    distributions is the spec the users were seeded with, if any. With
+    counter_shards, likes and comments increment a random counter shard of
+    the post instead of the post itself.
+    """
+    import asyncio
+
+    distributions = Distributions(distributions, check_ins_per_user) if distributions else None
+    metrics = metrics or SeedMetrics()
+    metrics.stage('simulate')
+    print(f"Simulating {', '.join(f'{kind}={rate:g}/sec' for kind, rate in rates.items() if rate > 0)} "
+          f"from {num_users} users" + (f" for {duration:g}s" if duration else " until interrupted") + "...")
+    start = time.perf_counter()
+    with BatchWriter(get_db(), batch_size=batch_size, journal=journal, metrics=metrics) as writer:
+        sink = CounterShardWriter(writer, counter_shards) if counter_shards else writer
+        simulator = TrafficSimulator(sink, num_users, seed, rates, check_ins_per_user, now, story_lifetime,
+                                     metrics, distributions)
+        asyncio.run(simulator.run(duration))
+    metrics.finish()
+    elapsed = time.perf_counter() - start
+    print(f"Simulated {elapsed:.0f}s of traffic ({writer.committed} writes):")
+    simulator.report(elapsed)
+    if simulator.stories:
+        print(f"{len(simulator.stories)} simulated stories have not expired yet and were left in place")
+
+def load_exported_data(input_dir, rate=DEFAULT_WRITE_RATE, batch_size=MAX_BATCH_SIZE, journal=None,
+                       metrics=None):
+    """Write a directory produced by export_sample_data() into Firestore"""
+    print(f"Loading exported data from {input_dir}...")
+    metrics = metrics or SeedMetrics()
+    metrics.stage('load')
+    limiter = TokenBucket(rate) if rate else None
+    with BatchWriter(get_db(), batch_size=batch_size, limiter=limiter, journal=journal, metrics=metrics) as writer:
+        write_documents(writer, read_exported_documents(input_dir))
+    metrics.finish()
+    print(f"Loaded {writer.committed} documents in {writer.batches} batches")
+
+# Batches of journaled documents deleted concurrently by the clear command
+DEFAULT_CLEAR_WORKERS = 4
+
+def clear_sample_data(journal, workers=DEFAULT_CLEAR_WORKERS, rate=DEFAULT_WRITE_RATE, batch_size=MAX_BATCH_SIZE, metrics=None):
+    """Delete every document recorded in the journal
+
+    Only paths the seeder committed are touched, so real user data is safe and
+    no collection is scanned. Paths are deleted in batches by a pool of
+    workers and dropped from the journal as each batch commits, so an
+    interrupted clear can simply be run again.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    total = journal.document_count()
+    if not total:
+        print(f"No sample data recorded in {journal.path}")
+        return
+    print(f"Deleting {total} sample documents recorded in {journal.path}...")
+    start = time.perf_counter()
+    metrics = metrics or SeedMetrics()
+    metrics.stage('delete', total)
+    limiter = TokenBucket(rate) if rate else None
+    
+    def delete_chunk(paths):
+        with BatchWriter(get_db(), batch_size=batch_size, limiter=limiter, metrics=metrics) as writer:
+            for path in paths:
+                collection_path, _, doc_id = path.rpartition('/')
+                writer.delete(collection_path, doc_id)
+        journal.forget(paths)
+        return len(paths)
+    
+    deleted = 0
+    workers = max(1, workers)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        chunks = journal.iter_document_chunks(batch_size)
+        for future in submit_in_order(pool, delete_chunk, chunks, window=workers * 2):
+            try:
+                count = future.result()
+                deleted += count
+                metrics.advance(count)
+            except Exception as e:
+                metrics.record_error(f"Error deleting batch: {e}")
+    metrics.finish()
+    
+    if deleted == total:
+        journal.reset()
+    elapsed = time.perf_counter() - start
+    print(f"Deleted {deleted}/{total} documents in {elapsed:.1f}s ({deleted / elapsed:.0f} docs/sec)")
+
+def parse_range(value):
+    """Parse a count range such as '5..200' (or a single number) into a (min, max) tuple"""
+    import argparse
+
+    low, _, high = value.partition('..')
+    try:
+        low, high = int(low), int(high or low)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a number or a range like 5..200, got {value!r}")
+    if low < 0 or high < low:
+        raise argparse.ArgumentTypeError(f"invalid range {value!r}")
+    return low, high
+
+def parse_shard(value):
+    """Parse a shard such as '2/8' into an (index, count) tuple"""
+    import argparse
+
+    index, _, count = value.partition('/')
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a shard like 2/8, got {value!r}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"invalid shard {value!r}")
+    return index, count
+
+def parse_event_rates(value):
+    """Parse simulated event rates such as 'check_in=5,like=20'; kinds left out are not emitted"""
+    import argparse
+
+    rates = dict.fromkeys(DEFAULT_SIMULATION_RATES, 0)
+    for part in value.split(','):
+        kind, _, rate = part.partition('=')
+        if kind not in rates:
+            raise argparse.ArgumentTypeError(f"unknown event {kind!r}, expected one of {', '.join(rates)}")
+        try:
+            rates[kind] = float(rate)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"expected a rate like {kind}=5, got {part!r}")
+    if not any(rate > 0 for rate in rates.values()):
+        raise argparse.ArgumentTypeError("at least one event needs a positive rate")
+    return rates
+
+def parse_args(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate sample data for FitCheck")
+    parser.add_argument('command', choices=['generate', 'export', 'load', 'clear', 'append', 'simulate'],
+                        help="what to do")
+    parser.add_argument('--target', choices=DB_TARGETS,
+                        help="where generate, load, append, simulate and clear write: the project in "
+                             "serviceAccountKey.json, the emulator (FIRESTORE_EMULATOR_HOST, default "
+                             f"{DEFAULT_EMULATOR_HOST}) or an in-memory client for dry runs, which skips the journal "
+                             "(default: emulator when FIRESTORE_EMULATOR_HOST is set, else firestore)")
+    parser.add_argument('--output', default='sample_data_export',
+                        help="directory written by the export command (default: sample_data_export)")
+    parser.add_argument('--input', default='sample_data_export',
+                        help="directory read by the load command (default: sample_data_export)")
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='ndjson',
+                        help="file format written by the export command (default: ndjson)")
+    parser.add_argument('--engine', choices=ENGINES, default='python',
+                        help="generation engine used by the export command; numpy draws check-ins in bulk (default: python)")
+    parser.add_argument('--users', type=int, default=len(sample_users),
+                        help=f"number of synthetic users to create (default: {len(sample_users)})")
+    parser.add_argument('--checkins-per-user', type=parse_range, default=DEFAULT_CHECK_INS_PER_USER,
+                        metavar='MIN..MAX', help="check-ins created for each user (default: 5..12)")
+    parser.add_argument('--days-back', type=int, default=DEFAULT_DAYS_BACK,
+                        help=f"spread check-in timestamps over this many days (default: {DEFAULT_DAYS_BACK})")
+    parser.add_argument('--seed', type=int,
+                        help="seed the generator and derive document IDs so runs are reproducible")
+    parser.add_argument('--shard', type=parse_shard, default=(0, 1), metavar='I/N',
+                        help="only generate shard I of N (0-based); needs --seed")
+    parser.add_argument('--reference-time', type=datetime.datetime.fromisoformat,
+                        help="ISO time that generated timestamps are relative to (default: now)")
+    parser.add_argument('--timestamps', choices=TIMESTAMP_MODELS, default='uniform',
+                        help="how post times are spread: evenly, or with daily peaks, weekend dips and per-user habits (default: uniform)")
+    parser.add_argument('--distributions', metavar='PATH',
+                        help="JSON or YAML file of check-in distributions, overall and per fitness level "
+                             "(see DEFAULT_DISTRIBUTIONS and fit_distributions.py)")
+    parser.add_argument('--duration', type=float,
+                        help="seconds the append and simulate commands run for (default: until interrupted)")
+    parser.add_argument('--events', type=parse_event_rates, default=DEFAULT_SIMULATION_RATES, metavar='KIND=RATE,...',
+                        help="events per second emitted by simulate (default: "
+                             + ','.join(f'{kind}={rate:g}' for kind, rate in DEFAULT_SIMULATION_RATES.items()) + ")")
+    parser.add_argument('--story-lifetime', type=float, default=STORY_LIFETIME.total_seconds(), metavar='SECONDS',
+                        help="seconds before a simulated story expires and is cleaned up (default: 24 hours)")
+    parser.add_argument('--timelines', type=int, nargs='?', const=DEFAULT_TIMELINE_SIZE, metavar='K',
+                        help=f"also pre-build users/{{id}}/timeline with the newest K posts of followed users (default K: {DEFAULT_TIMELINE_SIZE})")
+    parser.add_argument('--aggregates', action='store_true',
+                        help="also write userStats/{id} summaries, sharded leaderboards and activity/tag counts")
+    parser.add_argument('--counter-shards', type=int, metavar='N',
+                        help="keep the likes and comments of every feed post in N counter shards, "
+                             "rolled up by sharded_counters.py (default: plain fields on the post)")
+    parser.add_argument('--journal', default=DEFAULT_JOURNAL_PATH,
+                        help=f"SQLite journal of seeded documents used by --resume and clear (default: {DEFAULT_JOURNAL_PATH})")
+    parser.add_argument('--no-journal', action='store_true',
+                        help="do not record seeded documents; they cannot be resumed or cleared later")
+    parser.add_argument('--resume', action='store_true',
+                        help="continue the run recorded in the journal, skipping finished work")
+    parser.add_argument('--workers', type=int,
+                        help="number of users generated concurrently (default: 1), "
+                             f"or batches deleted concurrently by clear (default: {DEFAULT_CLEAR_WORKERS})")
+    parser.add_argument('--rate', type=float,
+                        help=f"maximum writes per second across all workers, 0 to disable (default: {DEFAULT_WRITE_RATE}); "
+                             f"check-ins per second for append (default: {DEFAULT_APPEND_RATE})")
+    parser.add_argument('--batch-size', type=int, default=MAX_BATCH_SIZE,
+                        help=f"writes per committed batch (max {MAX_BATCH_SIZE})")
+    parser.add_argument('--bulk-writer', action='store_true',
+                        help="use Firestore's BulkWriter instead of WriteBatch commits")
+    parser.add_argument('--metrics-out', metavar='PATH',
+                        help="write run metrics to PATH at exit: JSON for a .json path, Prometheus text otherwise")
+    args = parser.parse_args(argv)
+    if args.rate is None:
+        args.rate = DEFAULT_APPEND_RATE if args.command == 'append' else DEFAULT_WRITE_RATE
+    if args.workers is None:
+        args.workers = DEFAULT_CLEAR_WORKERS if args.command == 'clear' else 1
+    return args
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.shard[1] > 1 and args.seed is None:
+        raise SystemExit("--shard needs --seed so every shard derives the same user IDs")
+    if args.resume and args.no_journal:
+        raise SystemExit("--resume needs the journal")
+    if args.counter_shards is not None and args.counter_shards < 1:
+        raise SystemExit("--counter-shards needs at least 1 shard")
+    reference_time = args.reference_time or datetime.datetime.now()
+    if args.seed is not None and args.reference_time is None and not args.resume and args.command in ('generate', 'export'):
+        print(f"Timestamps are relative to {reference_time.isoformat()}; "
+              f"pass --reference-time {reference_time.isoformat()} with the same seed to rebuild this dataset")
+    choice = args.command
+    if args.target:
+        use_db(args.target)
+    # Documents written to memory are gone at exit, so they must not replace the journaled run
+    journal = None if args.no_journal or args.target == 'memory' else SeedJournal(args.journal)
+    distributions = load_distributions(args.distributions) if args.distributions else None
+
+    def run(metrics):
+        if choice == "generate":
+            if args.resume:
+                settings = resume_settings(journal)
+                if (args.timelines, args.aggregates) not in ((None, False),
+                                                             (settings['timeline_size'], settings['aggregates'])):
+                    print("Resuming with the --timelines and --aggregates of the recorded run")
+            else:
+                settings = dict(num_users=args.users, check_ins_per_user=args.checkins_per_user,
+                                days_back=args.days_back, seed=args.seed, shard=args.shard, now=reference_time,
+                                timestamps=args.timestamps, distributions=distributions,
+                                counter_shards=args.counter_shards, timeline_size=args.timelines,
+                                aggregates=args.aggregates)
+            generate_all_sample_data(**settings, workers=args.workers, rate=args.rate,
+                                     batch_size=args.batch_size, use_bulk_writer=args.bulk_writer,
+                                     journal=journal, resume=args.resume, metrics=metrics)
+        elif choice == "export":
+            export_sample_data(args.output, args.format, num_users=args.users,
+                               check_ins_per_user=args.checkins_per_user, days_back=args.days_back,
+                               engine=args.engine, seed=args.seed, shard=args.shard, now=reference_time,
+                               timeline_size=args.timelines, aggregates=args.aggregates, metrics=metrics,
+                               timestamps=args.timestamps, distributions=distributions,
+                               counter_shards=args.counter_shards)
+        elif choice == "load":
+            load_exported_data(args.input, rate=args.rate, batch_size=args.batch_size, journal=journal,
+                               metrics=metrics)
+        elif choice in ("append", "simulate"):
+            # Post as the users of the recorded run, or of --seed/--users without one
+            settings = journal.settings() if journal is not None else None
+            if settings:
+                settings = resume_settings(journal)
+            elif args.seed is not None:
+                settings = dict(num_users=args.users, seed=args.seed, check_ins_per_user=args.checkins_per_user,
+                                now=reference_time, distributions=distributions,
+                                counter_shards=args.counter_shards)
+            else:
+                raise SystemExit(f"{choice} needs a seeded run in the journal, or --seed and --users of the dataset")
+            if choice == "append":
+                append_check_ins(settings['num_users'], settings['seed'], rate=args.rate, duration=args.duration,
+                                 check_ins_per_user=settings['check_ins_per_user'], now=settings['now'],
+                                 batch_size=args.batch_size, journal=journal, metrics=metrics,
+                                 distributions=settings['distributions'], counter_shards=settings['counter_shards'])
+            else:
+                simulate_traffic(settings['num_users'], settings['seed'], args.events, duration=args.duration,
+                                 check_ins_per_user=settings['check_ins_per_user'], now=settings['now'],
+                                 story_lifetime=datetime.timedelta(seconds=args.story_lifetime),
+                                 batch_size=args.batch_size, journal=journal, metrics=metrics,
+                                 distributions=settings['distributions'], counter_shards=settings['counter_shards'])
+        elif choice == "clear":
+            if journal is None:
+                raise SystemExit("clear needs the journal to know which documents were seeded")
+            clear_sample_data(journal, workers=args.workers, rate=args.rate, batch_size=args.batch_size,
+                              metrics=metrics)
+
+    run_with_metrics(args, run)
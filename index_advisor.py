@@ -0,0 +1,411 @@
+"""Check the app's queries against firestore.indexes.json and propose the missing indexes
+
+CATALOG declares every query the web app and the maintenance tools run on
+a hot path: its collection, filters, order and limit, and the function it
+comes from. The emulator runs any query without an index, so the indexes
+are derived from each query's shape the way Firestore plans it:
+
+- equality filters (==, in, array-contains) come first, in any order
+- then the order-bys with their directions, followed by any inequality
+  field that is not ordered explicitly, ascending
+- a query on a single field, or with only equality filters and no order,
+  is served by the automatic single-field indexes; any other needs a
+  composite index with exactly those fields
+- collection-group queries need COLLECTION_GROUP scope, which single-field
+  indexes only get through a field override
+
+Unless --static is given, each query then runs a few times against the
+seeded emulator with users, posts and stories of the dataset, recording the
+documents it returns and the reads it is billed. The report lists what
+every query needs and whether firestore.indexes.json has it, and the
+proposed file is printed as a unified diff, or written with --write.
+
+    python index_advisor.py --static
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python index_advisor.py --samples 10 --output index_report.json
+    python index_advisor.py --static --check
+"""
+import argparse
+import copy
+import datetime
+import difflib
+import json
+import os
+import random
+import sys
+import time
+
+import generate_sample_data as seeder
+
+DEFAULT_INDEX_PATH = 'firestore.indexes.json'
+DEFAULT_SAMPLES = 5
+
+# Posts and stories read from the dataset to fill in query parameters
+SAMPLE_POOL_SIZE = 100
+
+EQUALITY_OPERATORS = ('==', 'in', 'array-contains', 'array-contains-any')
+ARRAY_OPERATORS = ('array-contains', 'array-contains-any')
+INEQUALITY_OPERATORS = ('<', '<=', '>', '>=', '!=', 'not-in')
+ASCENDING = 'ASCENDING'
+DESCENDING = 'DESCENDING'
+
+# Ordering by document ID is free: every index entry already ends with it
+DOCUMENT_ID = '__name__'
+
+# Single-field indexes Firestore keeps for a field without an override
+DEFAULT_FIELD_INDEXES = [
+    {'order': ASCENDING, 'queryScope': 'COLLECTION'},
+    {'order': DESCENDING, 'queryScope': 'COLLECTION'},
+    {'arrayConfig': 'CONTAINS', 'queryScope': 'COLLECTION'}
+]
+
+class CatalogQuery:
+    """One query shape: where it comes from, its filters, order and limit
+
+    collection may name parameters, as in users/{user_id}/checkIns, and a
+    filter value may be a function of the parameters a run draws (user_id,
+    post_id, story_id, now, since). With collection_group the query runs
+    over every collection named collection.
+    """
+
+    def __init__(self, name, source, collection, filters=(), orders=(), limit=None, collection_group=False):
+        self.name = name
+        self.source = source
+        self.collection = collection
+        self.filters = list(filters)
+        self.orders = list(orders)
+        self.limit = limit
+        self.collection_group = collection_group
+
+    @property
+    def group(self):
+        return self.collection.rsplit('/', 1)[-1]
+
+    @property
+    def scope(self):
+        return 'COLLECTION_GROUP' if self.collection_group else 'COLLECTION'
+
+    def build(self, db, params):
+        """Return the Firestore query for one set of parameters"""
+        from google.cloud.firestore import Query
+        from google.cloud.firestore_v1.base_query import FieldFilter
+
+        if self.collection_group:
+            query = db.collection_group(self.collection)
+        else:
+            query = db.collection(self.collection.format(**params))
+        for field, op, value in self.filters:
+            query = query.where(filter=FieldFilter(field, op, value(params) if callable(value) else value))
+        for field, direction in self.orders:
+            query = query.order_by(field, direction=Query.DESCENDING if direction == DESCENDING else Query.ASCENDING)
+        return query.limit(self.limit) if self.limit else query
+
+def _user(params):
+    return params['user_id']
+
+def _post(params):
+    return params['post_id']
+
+def _now(params):
+    return params['now']
+
+CATALOG = [
+    CatalogQuery('feed', 'fitnessService.getFeedItems', 'feed',
+                 orders=[('timestamp', DESCENDING)], limit=20),
+    CatalogQuery('global_check_ins', 'fitnessService.getGlobalFeed', 'checkIns',
+                 orders=[('timestamp', DESCENDING)], limit=20),
+    CatalogQuery('user_check_ins', 'fitnessService.getUserCheckIns', 'checkIns',
+                 filters=[('userId', '==', _user)], orders=[('timestamp', DESCENDING)], limit=20),
+    CatalogQuery('streak_check_ins', 'fitnessService.recalculateUserStreak', 'checkIns',
+                 filters=[('userId', '==', _user), ('visibility', '==', 'public'),
+                          ('activityType', 'in', ['Currently working out', 'Worked out earlier'])],
+                 orders=[('timestamp', DESCENDING)]),
+    CatalogQuery('check_in_history', 'query_workload.user_check_ins_query', 'users/{user_id}/checkIns',
+                 orders=[('timestamp', DESCENDING)], limit=20),
+    CatalogQuery('check_in_likes', 'fitnessService.likeCheckIn', 'likes',
+                 filters=[('userId', '==', _user), ('checkInId', '==', _post)]),
+    CatalogQuery('user_stories', 'socialService.getUserStories', 'stories',
+                 filters=[('userId', '==', _user), ('expiresAt', '>', _now)],
+                 orders=[('expiresAt', ASCENDING), ('timestamp', DESCENDING)]),
+    CatalogQuery('active_stories', 'socialService.getRecentStories', 'stories',
+                 filters=[('expiresAt', '>', _now)],
+                 orders=[('expiresAt', ASCENDING), ('timestamp', DESCENDING)], limit=20),
+    CatalogQuery('recent_stories', 'Feed.fetchFeedData', 'stories',
+                 orders=[('timestamp', DESCENDING)], limit=15),
+    CatalogQuery('story_feed_copies', 'socialService.deleteStory', 'feed',
+                 filters=[('storyId', '==', lambda params: params['story_id'])]),
+    CatalogQuery('unread_notifications', 'notificationService.getUnreadNotifications', 'notifications',
+                 filters=[('userId', '==', _user), ('read', '==', False)],
+                 orders=[('timestamp', DESCENDING)], limit=10),
+    CatalogQuery('all_notifications', 'notificationService.getAllNotifications', 'notifications',
+                 filters=[('userId', '==', _user)], orders=[('timestamp', DESCENDING)], limit=30),
+    CatalogQuery('post_likes', 'socialService.getPostLikes', 'postLikes',
+                 filters=[('postId', '==', _post)], orders=[('timestamp', DESCENDING)], limit=10),
+    CatalogQuery('post_comments', 'socialService.getPostComments', 'postComments',
+                 filters=[('postId', '==', _post)], limit=10),
+    CatalogQuery('trending_users', 'fitnessService.getTrendingUsers', 'users',
+                 orders=[('fitnessStats.streak', DESCENDING)], limit=10),
+    *[CatalogQuery(f'{group}_profile_copies', 'sync_profile_copies.copy_pages', group,
+                   filters=[('userId', '==', _user)], orders=[(DOCUMENT_ID, ASCENDING)], limit=1000,
+                   collection_group=True)
+      for group in ('feed', 'checkIns', 'stories', 'timeline')],
+    CatalogQuery('expired_stories', 'sweep_expired_stories.expired_story_pages', 'stories',
+                 filters=[('expiresAt', '<=', _now)], orders=[('expiresAt', ASCENDING)], limit=500),
+    CatalogQuery('story_pointers', 'sweep_expired_stories.linked_documents', 'stories',
+                 filters=[('storyId', 'in', lambda params: [params['story_id']])], collection_group=True),
+    CatalogQuery('changed_counter_shards', 'sharded_counters.changed_post_pages', 'counterShards',
+                 filters=[('updatedAt', '>', lambda params: params['since'])],
+                 orders=[('updatedAt', ASCENDING)], limit=500, collection_group=True)
+]
+
+def required_indexes(query):
+    """Return (composite, equality_count, single_fields) for query
+
+    composite is the composite index definition the query needs, starting
+    with its equality_count equality fields, or None when single-field
+    indexes serve it; single_fields then lists the (field, index entry)
+    pairs it reads.
+    """
+    equality = []
+    for field, op, _ in query.filters:
+        if op in EQUALITY_OPERATORS and field not in [name for name, _ in equality]:
+            equality.append((field, {'arrayConfig': 'CONTAINS'} if op in ARRAY_OPERATORS else {'order': ASCENDING}))
+    orders = [(field, direction) for field, direction in query.orders]
+    for field, op, _ in query.filters:
+        if op in INEQUALITY_OPERATORS and field not in [name for name, _ in orders]:
+            orders.append((field, ASCENDING))
+    if orders and orders[-1] == (DOCUMENT_ID, ASCENDING):
+        orders.pop()
+    ordered = [field for field, _ in orders]
+    equality = [(field, mode) for field, mode in equality if field not in ordered]
+
+    fields = [(field, mode) for field, mode in equality] + [(field, {'order': direction}) for field, direction in orders]
+    if len({field for field, _ in fields}) <= 1 or not orders:
+        return None, 0, [(field, dict(mode, queryScope=query.scope)) for field, mode in fields]
+    return {
+        'collectionGroup': query.group,
+        'queryScope': query.scope,
+        'fields': [dict(fieldPath=field, **mode) for field, mode in fields]
+    }, len(equality), []
+
+def _entry_serves(entry, needed, equality):
+    if entry.get('queryScope', 'COLLECTION') != needed['queryScope']:
+        return False
+    if 'arrayConfig' in needed:
+        return entry.get('arrayConfig') == needed['arrayConfig']
+    # Equality filters can use either direction
+    return 'order' in entry and (equality or entry['order'] == needed['order'])
+
+def has_single_field_index(config, group, field, needed, equality=False):
+    """Whether the field overrides of config (or the defaults) keep the single-field index needed"""
+    for override in config.get('fieldOverrides', []):
+        if override['collectionGroup'] == group and override['fieldPath'] == field:
+            return any(_entry_serves(entry, needed, equality) for entry in override['indexes'])
+    return any(_entry_serves(entry, needed, equality) for entry in DEFAULT_FIELD_INDEXES)
+
+def _field_key(field):
+    return field['fieldPath'], field.get('order'), field.get('arrayConfig')
+
+def has_composite_index(config, needed, equality_count):
+    """Whether config defines a composite index serving needed
+
+    The first equality_count fields are equality filters and may appear in
+    any order and direction; the rest must match exactly.
+    """
+    for index in config.get('indexes', []):
+        if index['collectionGroup'] != needed['collectionGroup'] or index['queryScope'] != needed['queryScope']:
+            continue
+        fields = [field for field in index['fields'] if field['fieldPath'] != DOCUMENT_ID]
+        if len(fields) != len(needed['fields']):
+            continue
+        head, tail = fields[:equality_count], fields[equality_count:]
+        wanted_head, wanted_tail = needed['fields'][:equality_count], needed['fields'][equality_count:]
+        if ({(field['fieldPath'], field.get('arrayConfig')) for field in head}
+                == {(field['fieldPath'], field.get('arrayConfig')) for field in wanted_head}
+                and [_field_key(field) for field in tail] == [_field_key(field) for field in wanted_tail]):
+            return True
+    return False
+
+def advise(config, queries=CATALOG):
+    """Check queries against config; return the proposed config and a finding per query"""
+    proposed = copy.deepcopy(config)
+    proposed.setdefault('indexes', [])
+    proposed.setdefault('fieldOverrides', [])
+    findings = {}
+    for query in queries:
+        composite, equality_count, single_fields = required_indexes(query)
+        equality_fields = {field for field, op, _ in query.filters if op in EQUALITY_OPERATORS}
+        missing = []
+        if composite is not None:
+            if not has_composite_index(config, composite, equality_count):
+                missing.append(composite)
+                if not has_composite_index(proposed, composite, equality_count):
+                    proposed['indexes'].append(composite)
+        for field, needed in single_fields:
+            equality = field in equality_fields
+            if has_single_field_index(config, query.group, field, needed, equality):
+                continue
+            missing.append({'collectionGroup': query.group, 'fieldPath': field, 'index': needed})
+            if not has_single_field_index(proposed, query.group, field, needed, equality):
+                _add_field_index(proposed, query.group, field, needed)
+        findings[query.name] = {
+            'source': query.source,
+            'collection': query.collection,
+            'query_scope': query.scope,
+            'composite_index': composite,
+            'single_field_indexes': [{'fieldPath': field, **needed} for field, needed in single_fields],
+            'missing': missing
+        }
+    if not proposed['fieldOverrides'] and 'fieldOverrides' not in config:
+        del proposed['fieldOverrides']
+    return proposed, findings
+
+def _add_field_index(config, group, field, needed):
+    for override in config['fieldOverrides']:
+        if override['collectionGroup'] == group and override['fieldPath'] == field:
+            override['indexes'].append(needed)
+            return
+    # A new override replaces the defaults, so they are kept alongside the new index
+    config['fieldOverrides'].append({'collectionGroup': group, 'fieldPath': field,
+                                     'indexes': copy.deepcopy(DEFAULT_FIELD_INDEXES) + [needed]})
+
+def sample_params(db, user_ids, now, samples, rng=random):
+    """Draw samples parameter sets from the seeded dataset: a user, a post and a story each"""
+    post_ids = [snapshot.id for snapshot in db.collection('feed').select([]).limit(SAMPLE_POOL_SIZE).stream()]
+    story_ids = [snapshot.id for snapshot in db.collection('stories').select([]).limit(SAMPLE_POOL_SIZE).stream()]
+    return [{
+        'user_id': rng.choice(user_ids),
+        'post_id': rng.choice(post_ids) if post_ids else 'missing',
+        'story_id': rng.choice(story_ids) if story_ids else 'missing',
+        'now': now,
+        # Counter shards are stamped with the server time, not the dataset's
+        'since': datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=1)
+    } for _ in range(samples)]
+
+def measure_query(db, query, params_list):
+    """Run query once per parameter set and return its documents, billed reads and latency"""
+    latencies = []
+    documents = 0
+    billed_reads = 0
+    errors = []
+    for params in params_list:
+        start = time.perf_counter()
+        try:
+            count = sum(1 for _ in query.build(db, params).stream())
+        except Exception as e:
+            errors.append(str(e))
+            continue
+        latencies.append(time.perf_counter() - start)
+        documents += count
+        # Firestore bills a query that matches nothing as one read
+        billed_reads += max(1, count)
+    runs = len(latencies)
+    return {
+        'runs': runs,
+        'documents_per_query': round(documents / runs, 2) if runs else None,
+        'billed_reads_per_query': round(billed_reads / runs, 2) if runs else None,
+        'p50_ms': round(seeder.percentile(latencies, 50) * 1000, 2) if runs else None,
+        'max_ms': round(max(latencies) * 1000, 2) if runs else None,
+        'errors': errors[:1]
+    }
+
+def describe_index(index):
+    """Render an index definition as group(field order, ...) for the report"""
+    if 'fields' in index:
+        fields = ', '.join(f"{field['fieldPath']} {(field.get('order') or field.get('arrayConfig')).lower()}"
+                           for field in index['fields'])
+        return f"{index['collectionGroup']}({fields})" + (' [group]' if index['queryScope'] == 'COLLECTION_GROUP' else '')
+    needed = index['index']
+    return (f"{index['collectionGroup']}.{index['fieldPath']} {(needed.get('order') or needed.get('arrayConfig')).lower()}"
+            + (' [group]' if needed['queryScope'] == 'COLLECTION_GROUP' else ''))
+
+def print_report(findings, costs=None):
+    """Print a line per query; read costs are left out when the queries were not run"""
+    print(f"{'query':<26}{'index':<14}" + (f"{'docs/q':>8}{'reads/q':>9}{'p50 ms':>9}" if costs else "") + "  source")
+    for name, finding in findings.items():
+        status = 'MISSING' if finding['missing'] else 'composite' if finding['composite_index'] else 'single-field'
+        cost = (costs or {}).get(name) or {}
+        columns = (f"{cost.get('documents_per_query') or 0:>8.1f}{cost.get('billed_reads_per_query') or 0:>9.1f}"
+                   f"{cost.get('p50_ms') or 0:>9.1f}" if costs else "")
+        print(f"{name:<26}{status:<14}{columns}  {finding['source']}")
+        for index in finding['missing']:
+            print(f"{'':<26}needs {describe_index(index)}")
+        for error in cost.get('errors', []):
+            print(f"{'':<26}error: {error}")
+
+def index_diff(path, current_text, proposed):
+    """Return the unified diff from current_text to the proposed config, formatted like the file"""
+    proposed_text = json.dumps(proposed, indent=2) + '\n'
+    return ''.join(difflib.unified_diff(current_text.splitlines(keepends=True), proposed_text.splitlines(keepends=True),
+                                        f'a/{path}', f'b/{path}'))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Check FitCheck's query catalog against firestore.indexes.json")
+    parser.add_argument('--indexes', default=DEFAULT_INDEX_PATH,
+                        help=f"index definitions to check (default: {DEFAULT_INDEX_PATH})")
+    parser.add_argument('--static', action='store_true',
+                        help="only derive the indexes from the catalog, without running the queries")
+    parser.add_argument('--samples', type=int, default=DEFAULT_SAMPLES,
+                        help=f"runs of every query against the emulator, each with other parameters (default: {DEFAULT_SAMPLES})")
+    parser.add_argument('--journal', default=seeder.DEFAULT_JOURNAL_PATH,
+                        help="seed journal the user IDs and reference time are read from "
+                             f"(default: {seeder.DEFAULT_JOURNAL_PATH})")
+    parser.add_argument('--seed', type=int,
+                        help="seed of the generated dataset, instead of reading it from the journal")
+    parser.add_argument('--users', type=int,
+                        help="number of users in the generated dataset, instead of reading it from the journal")
+    parser.add_argument('--reference-time', type=datetime.datetime.fromisoformat,
+                        help="time used as 'now' by the story queries (default: the seeded run's reference time)")
+    parser.add_argument('--write', action='store_true',
+                        help="write the proposed index definitions instead of printing the diff")
+    parser.add_argument('--check', action='store_true',
+                        help="exit with status 1 when any query is missing an index")
+    parser.add_argument('--output', metavar='PATH',
+                        help="also write the findings and read costs to PATH as JSON")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    with open(args.indexes) as f:
+        current_text = f.read()
+    proposed, findings = advise(json.loads(current_text))
+
+    costs = None
+    if not args.static:
+        if not os.environ.get('FIRESTORE_EMULATOR_HOST'):
+            raise SystemExit("index_advisor.py runs the catalog against the emulator; set FIRESTORE_EMULATOR_HOST, "
+                             "e.g. localhost:8080, or pass --static")
+        seed, num_users, reference_time = args.seed, args.users, args.reference_time
+        if seed is None or num_users is None:
+            if not os.path.exists(args.journal):
+                raise SystemExit(f"No journal at {args.journal}; pass --seed and --users of the generated dataset")
+            journal = seeder.SeedJournal(args.journal)
+            settings = seeder.resume_settings(journal)
+            journal.close()
+            seed = settings['seed'] if seed is None else seed
+            num_users = settings['num_users'] if num_users is None else num_users
+            reference_time = reference_time or settings['now']
+        db = seeder.get_db('emulator')
+        user_ids = [seeder.user_id_for(seed, index) for index in range(num_users)]
+        params_list = sample_params(db, user_ids, reference_time or datetime.datetime.now(), max(1, args.samples))
+        print(f"Running {len(CATALOG)} catalog queries {len(params_list)} times each against {num_users} users...")
+        costs = {query.name: measure_query(db, query, params_list) for query in CATALOG}
+
+    print_report(findings, costs)
+    missing = sum(len(finding['missing']) for finding in findings.values())
+    diff = index_diff(args.indexes, current_text, proposed)
+    if not diff:
+        print(f"{args.indexes} covers every query in the catalog")
+    elif args.write:
+        with open(args.indexes, 'w') as f:
+            f.write(json.dumps(proposed, indent=2) + '\n')
+        print(f"Added {missing} missing indexes to {args.indexes}")
+    else:
+        print(f"\n{missing} missing indexes; proposed changes to {args.indexes}:\n")
+        sys.stdout.write(diff)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'queries': {name: dict(finding, cost=(costs or {}).get(name)) for name, finding in findings.items()},
+                       'missing': missing}, f, indent=2)
+        print(f"Wrote findings to {args.output}")
+    if args.check and missing:
+        sys.exit(1)
@@ -0,0 +1,221 @@
+"""Replay the app's read queries against a seeded Firestore emulator
+
+The query catalog mirrors what the web app reads on its hot paths:
+
+    feed                  feed ordered by timestamp desc (fitnessService.getFeedItems)
+    user_check_ins        one user's check-in history, newest first (fitnessService.getUserCheckIns)
+    active_stories        stories with expiresAt > now (socialService.getRecentStories)
+    unread_notifications  a user's unread notifications (notificationService.getUnreadNotifications)
+
+Per-user queries pick users out of the same derived ID range the seeder
+wrote, taken from the seed journal or from --seed/--users. A pool of
+workers runs a weighted mix of the queries for a fixed duration, and the
+report gives per-query latency percentiles and documents read.
+
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python query_workload.py --duration 30 --concurrency 16
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python query_workload.py --mix feed=1,user_check_ins=3
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import generate_sample_data as seeder
+
+DEFAULT_MIX = {'feed': 40, 'user_check_ins': 30, 'active_stories': 20, 'unread_notifications': 10}
+DEFAULT_LIMIT = 20
+DEFAULT_CONCURRENCY = 8
+DEFAULT_DURATION_SECONDS = 10
+
+def feed_query(db, user_id, now, limit):
+    from google.cloud.firestore import Query
+
+    return db.collection('feed').order_by('timestamp', direction=Query.DESCENDING).limit(limit)
+
+def user_check_ins_query(db, user_id, now, limit):
+    # The seeder keeps each user's history under users/{id}/checkIns
+    from google.cloud.firestore import Query
+
+    return (db.collection(f'users/{user_id}/checkIns')
+            .order_by('timestamp', direction=Query.DESCENDING).limit(limit))
+
+def active_stories_query(db, user_id, now, limit):
+    from google.cloud.firestore import Query
+    from google.cloud.firestore_v1.base_query import FieldFilter
+
+    return (db.collection('stories').where(filter=FieldFilter('expiresAt', '>', now))
+            .order_by('expiresAt').order_by('timestamp', direction=Query.DESCENDING).limit(limit))
+
+def unread_notifications_query(db, user_id, now, limit):
+    from google.cloud.firestore import Query
+    from google.cloud.firestore_v1.base_query import FieldFilter
+
+    return (db.collection('notifications')
+            .where(filter=FieldFilter('userId', '==', user_id))
+            .where(filter=FieldFilter('read', '==', False))
+            .order_by('timestamp', direction=Query.DESCENDING).limit(limit))
+
+QUERIES = {
+    'feed': feed_query,
+    'user_check_ins': user_check_ins_query,
+    'active_stories': active_stories_query,
+    'unread_notifications': unread_notifications_query
+}
+
+class QueryStats:
+    """Latencies, documents read and errors of one query in the catalog"""
+
+    def __init__(self):
+        self.latencies = []
+        self.documents = 0
+        self.billed_reads = 0
+        self.errors = 0
+
+    def report(self, elapsed):
+        count = len(self.latencies)
+        latency = {f'p{q}_ms': round(seeder.percentile(self.latencies, q) * 1000, 2) if count else None
+                   for q in (50, 95, 99)}
+        return {
+            'queries': count,
+            'queries_per_sec': round(count / elapsed, 1) if elapsed else None,
+            **latency,
+            'max_ms': round(max(self.latencies) * 1000, 2) if count else None,
+            'documents_read': self.documents,
+            'documents_per_query': round(self.documents / count, 2) if count else None,
+            'billed_reads': self.billed_reads,
+            'errors': self.errors
+        }
+
+def run_workload(db, user_ids, mix=DEFAULT_MIX, duration=DEFAULT_DURATION_SECONDS, concurrency=DEFAULT_CONCURRENCY,
+                 limit=DEFAULT_LIMIT, rate=None, now=None, seed=None):
+    """Run the weighted query mix from concurrency workers for duration seconds
+
+    Each worker picks a query by weight and, for per-user queries, a random
+    user, then times the query until every result document has been read.
+    rate caps the combined queries per second.
+    """
+    unknown = set(mix) - set(QUERIES)
+    if unknown:
+        raise ValueError(f"Unknown queries {sorted(unknown)}, expected some of {sorted(QUERIES)}")
+    names = [name for name, weight in mix.items() if weight > 0]
+    weights = [mix[name] for name in names]
+    now = now or datetime.datetime.now()
+    stats = {name: QueryStats() for name in names}
+    lock = threading.Lock()
+    limiter = seeder.TokenBucket(rate, capacity=max(1, concurrency)) if rate else None
+    deadline = time.monotonic() + duration
+
+    def worker(index):
+        rng = random.Random(None if seed is None else f"{seed}/{index}")
+        while time.monotonic() < deadline:
+            if limiter is not None:
+                limiter.acquire()
+            name = rng.choices(names, weights)[0]
+            query = QUERIES[name](db, rng.choice(user_ids), now, limit)
+            start = time.perf_counter()
+            try:
+                documents = sum(1 for _ in query.stream())
+            except Exception as e:
+                with lock:
+                    stats[name].errors += 1
+                    if stats[name].errors == 1:
+                        print(f"Error running {name}: {e}")
+                continue
+            latency = time.perf_counter() - start
+            with lock:
+                stats[name].latencies.append(latency)
+                stats[name].documents += documents
+                # Firestore bills a query that matches nothing as one read
+                stats[name].billed_reads += max(1, documents)
+
+    print(f"Running {', '.join(f'{name}={mix[name]}' for name in names)} from {concurrency} workers "
+          f"for {duration}s against {len(user_ids)} users...")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(worker, index) for index in range(concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - start
+    return {
+        'duration_seconds': round(elapsed, 3),
+        'concurrency': concurrency,
+        'limit': limit,
+        'users': len(user_ids),
+        'mix': {name: mix[name] for name in names},
+        'queries': {name: stats[name].report(elapsed) for name in names}
+    }
+
+def print_report(results):
+    print(f"{'query':<22}{'count':>8}{'qps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'docs/q':>8}{'reads':>9}{'errors':>8}")
+    for name, stats in results['queries'].items():
+        print(f"{name:<22}{stats['queries']:>8}{stats['queries_per_sec'] or 0:>9.1f}"
+              f"{stats['p50_ms'] or 0:>9.1f}{stats['p95_ms'] or 0:>9.1f}{stats['p99_ms'] or 0:>9.1f}"
+              f"{stats['documents_per_query'] or 0:>8.1f}{stats['billed_reads']:>9}{stats['errors']:>8}")
+
+def parse_mix(value):
+    """Parse a query mix such as 'feed=40,user_check_ins=30' into a {name: weight} dict"""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in QUERIES:
+            raise argparse.ArgumentTypeError(f"unknown query {name!r}, expected one of {', '.join(QUERIES)}")
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"expected a weight like {name}=10, got {part!r}")
+    if not any(weight > 0 for weight in mix.values()):
+        raise argparse.ArgumentTypeError("the mix needs at least one query with a positive weight")
+    return mix
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Replay FitCheck read queries against the Firestore emulator")
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX, metavar='NAME=WEIGHT,...',
+                        help="weighted query mix (default: " + ','.join(f'{k}={v}' for k, v in DEFAULT_MIX.items()) + ")")
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION_SECONDS,
+                        help=f"seconds to run the workload (default: {DEFAULT_DURATION_SECONDS})")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"queries in flight at once (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument('--rate', type=float,
+                        help="maximum queries per second across all workers (default: unlimited)")
+    parser.add_argument('--limit', type=int, default=DEFAULT_LIMIT,
+                        help=f"limit applied to every query (default: {DEFAULT_LIMIT})")
+    parser.add_argument('--journal', default=seeder.DEFAULT_JOURNAL_PATH,
+                        help="seed journal the user IDs and reference time are read from "
+                             f"(default: {seeder.DEFAULT_JOURNAL_PATH})")
+    parser.add_argument('--seed', type=int,
+                        help="seed of the generated dataset, instead of reading it from the journal")
+    parser.add_argument('--users', type=int,
+                        help="number of users in the generated dataset, instead of reading it from the journal")
+    parser.add_argument('--reference-time', type=datetime.datetime.fromisoformat,
+                        help="time used as 'now' by the story query (default: the seeded run's reference time)")
+    parser.add_argument('--output', metavar='PATH',
+                        help="also write the results to PATH as JSON")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not os.environ.get('FIRESTORE_EMULATOR_HOST'):
+        raise SystemExit("query_workload.py runs against the emulator; set FIRESTORE_EMULATOR_HOST, e.g. localhost:8080")
+    seed, num_users, reference_time = args.seed, args.users, args.reference_time
+    if seed is None or num_users is None:
+        if not os.path.exists(args.journal):
+            raise SystemExit(f"No journal at {args.journal}; pass --seed and --users of the generated dataset")
+        journal = seeder.SeedJournal(args.journal)
+        settings = seeder.resume_settings(journal)
+        journal.close()
+        seed = settings['seed'] if seed is None else seed
+        num_users = settings['num_users'] if num_users is None else num_users
+        reference_time = reference_time or settings['now']
+    user_ids = [seeder.user_id_for(seed, index) for index in range(num_users)]
+
+    results = run_workload(seeder.get_db(), user_ids, args.mix, args.duration, max(1, args.concurrency),
+                           args.limit, args.rate, reference_time, seed)
+    print_report(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote results to {args.output}")
@@ -0,0 +1,413 @@
+"""Read, roll up and benchmark the sharded like and comment counters of feed posts
+
+A single Firestore document sustains about one write per second, so every
+like of a popular post queues behind the last one. Seeded with
+`generate_sample_data.py --counter-shards N`, each feed post keeps its
+counts in N documents under feed/{id}/counterShards and every increment
+goes to one shard picked at random (see CounterShardWriter in the seeder).
+This module holds the rest of the scheme:
+
+- increment_counter() adds to one random shard, the write a sharded like makes
+- read_counters() adds up the counts of many posts in two batched reads
+- rollup_counters() adds what the shards of every post gained since the
+  last rollup onto the post, so feed queries keep reading plain
+  likes/comments fields; `rollup --interval` repeats it
+- benchmark_hot_post() hammers one post through the emulator, once with
+  its counts on the post and once with them sharded
+
+The app's toggleLike, likeFeedItem and addComment still write likes and
+commentCount on the post itself. A post records the shard totals its counts
+already include in counterRollup, and the rollup only adds the difference,
+so those direct writes are kept rather than overwritten. It reads and
+writes each post in a transaction, so overlapping rollups add it once.
+
+The rollup finds changed posts with a collection-group query on the shards'
+updatedAt, which needs the COLLECTION_GROUP counterShards override in
+firestore.indexes.json; the emulator runs it without.
+
+    python sharded_counters.py read POST_ID [POST_ID ...]
+    python sharded_counters.py rollup --interval 60
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python sharded_counters.py benchmark --writers 32 --duration 10
+"""
+import argparse
+import datetime
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import generate_sample_data as seeder
+
+DEFAULT_COUNTER_SHARDS = 10
+DEFAULT_PAGE_SIZE = 500
+DEFAULT_WORKERS = 4
+
+# Each rollup also looks at shards written this long before the previous one
+# started, so a shard stamped by a server clock slightly behind ours is not missed
+ROLLUP_OVERLAP = datetime.timedelta(seconds=10)
+
+# Read-modify-write transactions are what the app's toggleLike amounts to;
+# blind Increment updates are what the simulator and likeCheckIn send
+BENCHMARK_MODES = ('transaction', 'increment')
+DEFAULT_BENCHMARK_WRITERS = 32
+DEFAULT_BENCHMARK_SECONDS = 10.0
+
+def shard_collection(post_id):
+    return f"feed/{post_id}/{seeder.COUNTER_SHARD_COLLECTION}"
+
+def increment_counter(db, post_id, field, num_shards=DEFAULT_COUNTER_SHARDS, amount=1, rng=random):
+    """Add amount to field of post_id in one of its num_shards counter shards, picked at random"""
+    from google.cloud.firestore import SERVER_TIMESTAMP, Increment
+
+    shard = db.collection(shard_collection(post_id)).document(str(rng.randrange(num_shards)))
+    shard.update({field: Increment(amount), 'updatedAt': SERVER_TIMESTAMP})
+
+def counter_totals(db, post_ids):
+    """Return {post_id: (post counters, shard totals)} for the posts of post_ids with counter shards
+
+    The post counters hold the counter fields on the post and its
+    counterRollup. The posts are read in one get_all() to learn their shard
+    counts, then every shard of every post in a second one.
+    """
+    posts = [db.collection('feed').document(post_id) for post_id in post_ids]
+    counts = {}
+    field_paths = [*seeder.COUNTER_FIELDS, seeder.COUNTER_ROLLUP_FIELD, 'counterShards']
+    for snapshot in db.get_all(posts, field_paths=field_paths):
+        if snapshot.exists and snapshot.to_dict().get('counterShards'):
+            counts[snapshot.id] = snapshot.to_dict()
+    shards = [db.collection(shard_collection(post_id)).document(str(index))
+              for post_id, post in counts.items() for index in range(post.pop('counterShards'))]
+    totals = {post_id: {} for post_id in counts}
+    for snapshot in db.get_all(shards, field_paths=list(seeder.COUNTER_FIELDS)):
+        if not snapshot.exists:
+            continue
+        post_totals = totals[snapshot.reference.path.split('/')[1]]
+        for field, value in snapshot.to_dict().items():
+            post_totals[field] = post_totals.get(field, 0) + value
+    return {post_id: (counts[post_id], totals[post_id]) for post_id in counts}
+
+def rollup_changes(post, totals):
+    """Return the update that brings post up to date with its shard totals, or None if it is
+
+    The counts gain what the shards gained since the totals recorded in
+    counterRollup, so likes the app wrote to the post itself are kept, and
+    counterRollup becomes totals. Both are written as plain values: the
+    caller must have read post in the transaction that writes the update
+    (see rollup_post()), or a rollup overlapping it would add the same gain
+    twice. Totals older than the recorded ones take the gain back out, so
+    the post stays its direct likes plus whichever totals it records. Posts
+    without counterRollup, seeded before it was recorded, held the shard
+    totals and are set to them.
+    """
+    rolled = post.get(seeder.COUNTER_ROLLUP_FIELD)
+    if rolled is None:
+        changes = {field: total for field, total in totals.items() if post.get(field) != total}
+    else:
+        changes = {field: post.get(field, 0) + total - rolled.get(field, 0) for field, total in totals.items()
+                   if total != rolled.get(field, 0)}
+    if not changes and rolled is not None:
+        return None
+    return dict(changes, **{seeder.COUNTER_ROLLUP_FIELD: totals})
+
+def rollup_post(db, post_id, totals):
+    """Apply rollup_changes() to post_id in a transaction; return whether the post was updated
+
+    Only the post is read in the transaction, so the likes landing on its
+    shards meanwhile never contend with it; a like the app writes to the
+    post does, and the transaction retries with the new count.
+    """
+    from google.cloud import firestore
+
+    ref = db.collection('feed').document(post_id)
+    field_paths = [*seeder.COUNTER_FIELDS, seeder.COUNTER_ROLLUP_FIELD]
+
+    @firestore.transactional
+    def roll_up(transaction):
+        snapshot = ref.get(field_paths=field_paths, transaction=transaction)
+        changes = rollup_changes(snapshot.to_dict(), totals) if snapshot.exists else None
+        if changes:
+            transaction.update(ref, changes)
+        return bool(changes)
+
+    return roll_up(db.transaction())
+
+def read_counters(db, post_ids):
+    """Return {post_id: {field: count}} of post_ids: their shard totals plus the increments made on the post
+
+    A post's own counts include the shard totals recorded in counterRollup,
+    so those are taken off before the current shard totals are added.
+    """
+    counters = {}
+    for post_id, (post, totals) in counter_totals(db, post_ids).items():
+        rolled = post.get(seeder.COUNTER_ROLLUP_FIELD)
+        if rolled is None:
+            counters[post_id] = totals
+            continue
+        fields = {field for field in seeder.COUNTER_FIELDS if field in totals or field in post}
+        counters[post_id] = {field: post.get(field, 0) - rolled.get(field, 0) + totals.get(field, 0)
+                             for field in fields}
+    return counters
+
+def changed_post_pages(db, since=None, page_size=DEFAULT_PAGE_SIZE):
+    """Yield pages of the IDs of posts whose counter shards were written after since, or of all of them
+
+    Shards are scanned in updatedAt order, so a shard written again while
+    the scan runs shows up a second time further on; each post is only
+    yielded once.
+    """
+    from google.cloud.firestore_v1.base_query import FieldFilter
+
+    query = db.collection_group(seeder.COUNTER_SHARD_COLLECTION)
+    if since is not None:
+        query = query.where(filter=FieldFilter('updatedAt', '>', since))
+    query = query.order_by('updatedAt').select(['updatedAt']).limit(page_size)
+    seen = set()
+    cursor = None
+    while True:
+        page = list((query if cursor is None else query.start_after(cursor)).stream())
+        post_ids = []
+        for snapshot in page:
+            post_id = snapshot.reference.path.split('/')[1]
+            if post_id not in seen:
+                seen.add(post_id)
+                post_ids.append(post_id)
+        if post_ids:
+            yield post_ids
+        if len(page) < page_size:
+            return
+        cursor = page[-1]
+
+def rollup_counters(since=None, workers=DEFAULT_WORKERS, rate=seeder.DEFAULT_WRITE_RATE,
+                    page_size=DEFAULT_PAGE_SIZE, metrics=None):
+    """Add what the shards of every post changed after since gained onto the post (see rollup_changes())
+
+    Posts whose counts are up to date are left alone, so a post is rewritten
+    at most once per rollup however many likes it took. Each rewrite is its
+    own transaction (see rollup_post()), which keeps rollups that overlap,
+    as ROLLUP_OVERLAP makes them, from applying a gain twice. Returns the number
+    of posts checked and updated, and the time the next rollup should pass
+    as since.
+    """
+    db = seeder.get_db()
+    metrics = metrics or seeder.SeedMetrics()
+    started = datetime.datetime.now(datetime.timezone.utc)
+    print(f"Rolling up counters changed since {since.isoformat() if since else 'the beginning'}...")
+    metrics.stage('rollup')
+    start = time.perf_counter()
+    limiter = seeder.TokenBucket(rate) if rate else None
+
+    def rollup_page(post_ids):
+        updated = 0
+        for post_id, (post, totals) in counter_totals(db, post_ids).items():
+            # The batched read skips the posts already up to date without a transaction
+            if rollup_changes(post, totals) is None:
+                continue
+            if limiter:
+                limiter.acquire(1)
+            write_start = time.perf_counter()
+            if rollup_post(db, post_id, totals):
+                metrics.record_writes({'feed': 1}, time.perf_counter() - write_start)
+                updated += 1
+        return len(post_ids), updated
+
+    checked = 0
+    updated = 0
+    failed = 0
+    workers = max(1, workers)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pages = changed_post_pages(db, since, page_size)
+        for future in seeder.submit_in_order(pool, rollup_page, pages, window=workers * 2):
+            try:
+                page_checked, page_updated = future.result()
+                checked += page_checked
+                updated += page_updated
+                metrics.advance(page_checked)
+            except Exception as e:
+                failed += 1
+                metrics.record_error(f"Error rolling up page: {e}")
+    metrics.finish()
+
+    elapsed = time.perf_counter() - start
+    print(f"Updated {updated} of {checked} posts with changed counters in {elapsed:.1f}s")
+    if failed:
+        print(f"{failed} pages failed; the next rollup retries them")
+        # Keep the old watermark so the failed posts are picked up again
+        return checked, updated, since
+    return checked, updated, started - ROLLUP_OVERLAP
+
+def run_rollups(interval, since=None, **options):
+    """Roll up counters every interval seconds until interrupted, each run picking up where the last left off"""
+    try:
+        while True:
+            next_at = time.monotonic() + interval
+            _, _, since = rollup_counters(since, **options)
+            time.sleep(max(0.0, next_at - time.monotonic()))
+    except KeyboardInterrupt:
+        print("Stopping...")
+
+def _like(db, ref, field, mode):
+    from google.cloud import firestore
+
+    if mode == 'increment':
+        ref.update({field: firestore.Increment(1), 'updatedAt': firestore.SERVER_TIMESTAMP})
+        return
+
+    @firestore.transactional
+    def add_like(transaction):
+        count = (ref.get(transaction=transaction).to_dict() or {}).get(field, 0)
+        transaction.update(ref, {field: count + 1, 'updatedAt': firestore.SERVER_TIMESTAMP})
+
+    add_like(db.transaction())
+
+def hammer_post(db, post_id, num_shards, writers, duration, mode):
+    """Like post_id from writers threads for duration seconds and measure every like
+
+    Without num_shards the likes go to the post itself, otherwise to one of
+    its counter shards at random.
+    """
+    if num_shards:
+        shards = [db.collection(shard_collection(post_id)).document(str(index)) for index in range(num_shards)]
+    else:
+        shards = [db.collection('feed').document(post_id)]
+    latencies = []
+    failures = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def like_until_deadline(_):
+        rng = random.Random()
+        mine = []
+        failed = 0
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                _like(db, rng.choice(shards), 'likes', mode)
+                mine.append(time.perf_counter() - start)
+            except Exception:
+                # Transactions that keep losing the race give up after their retries
+                failed += 1
+        with lock:
+            latencies.extend(mine)
+            failures[0] += failed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=writers) as pool:
+        list(pool.map(like_until_deadline, range(writers)))
+    elapsed = time.perf_counter() - start
+    return {
+        'likes': len(latencies),
+        'failed': failures[0],
+        'likes_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(seeder.percentile(latencies, 50) * 1000, 2) if latencies else None,
+        'p99_ms': round(seeder.percentile(latencies, 99) * 1000, 2) if latencies else None
+    }
+
+def benchmark_hot_post(writers=DEFAULT_BENCHMARK_WRITERS, duration=DEFAULT_BENCHMARK_SECONDS,
+                       num_shards=DEFAULT_COUNTER_SHARDS, mode='transaction'):
+    """Compare likes/sec on one hot post with its count on the post and in num_shards counter shards
+
+    Runs against the emulator only. Each scheme gets a fresh post, which is
+    checked afterwards to hold exactly the likes that succeeded and then
+    deleted with its shards.
+    """
+    if mode not in BENCHMARK_MODES:
+        raise ValueError(f"Unknown mode {mode!r}, expected one of {', '.join(BENCHMARK_MODES)}")
+    db = seeder.get_db('emulator')
+    results = {}
+    for scheme, shards in (('single', None), ('sharded', num_shards)):
+        post_id = seeder.new_doc_id()
+        post = {'userId': 'benchmark', 'likes': 0, 'comments': 0, 'timestamp': seeder.SERVER_TIMESTAMP}
+        with seeder.BatchWriter(db) as writer:
+            sink = seeder.CounterShardWriter(writer, shards) if shards else writer
+            sink.set('feed', post_id, post)
+        print(f"Liking one post from {writers} writers for {duration:g}s, "
+              + (f"{shards} counter shards" if shards else "counts on the post") + f" ({mode})...")
+        run = hammer_post(db, post_id, shards, writers, duration, mode)
+        if shards:
+            stored = read_counters(db, [post_id])[post_id].get('likes', 0)
+        else:
+            stored = db.collection('feed').document(post_id).get().to_dict()['likes']
+        run['consistent'] = stored == run['likes']
+        check = "count matches" if run['consistent'] else f"stored count {stored} does not match"
+        print(f"  {scheme:>8}: {run['likes_per_sec']:>8.1f} likes/sec  p50 {run['p50_ms'] or 0:.1f} ms  "
+              f"p99 {run['p99_ms'] or 0:.1f} ms  {run['failed']} failed  {check}")
+        with seeder.BatchWriter(db) as writer:
+            for index in range(shards or 0):
+                writer.delete(shard_collection(post_id), str(index))
+            writer.delete('feed', post_id)
+        results[scheme] = run
+    speedup = results['sharded']['likes_per_sec'] / results['single']['likes_per_sec'] \
+        if results['single']['likes_per_sec'] else None
+    if speedup:
+        print(f"Sharded counters took {speedup:.1f}x the likes/sec of a single counter")
+    return {
+        'mode': mode,
+        'writers': writers,
+        'seconds': duration,
+        'counter_shards': num_shards,
+        'runs': results,
+        'speedup': round(speedup, 2) if speedup else None
+    }
+
+def parse_time(value):
+    """Parse an ISO time, taking times without an offset as UTC"""
+    parsed = datetime.datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=datetime.timezone.utc)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Read, roll up and benchmark FitCheck's sharded post counters")
+    parser.add_argument('command', choices=['read', 'rollup', 'benchmark'],
+                        help="sum the shards of posts, copy changed totals onto their posts, or benchmark a hot post")
+    parser.add_argument('post_ids', nargs='*', metavar='POST_ID',
+                        help="feed posts whose counters read prints")
+    parser.add_argument('--since', type=parse_time,
+                        help="roll up only shards written after this ISO time, UTC unless it has an offset "
+                             "(default: every shard)")
+    parser.add_argument('--interval', type=float, metavar='SECONDS',
+                        help="keep rolling up every SECONDS until interrupted (default: once)")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f"pages of posts rolled up concurrently (default: {DEFAULT_WORKERS})")
+    parser.add_argument('--rate', type=float, default=seeder.DEFAULT_WRITE_RATE,
+                        help=f"maximum post updates per second, 0 to disable (default: {seeder.DEFAULT_WRITE_RATE})")
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE,
+                        help=f"counter shards read per query page (default: {DEFAULT_PAGE_SIZE})")
+    parser.add_argument('--writers', type=int, default=DEFAULT_BENCHMARK_WRITERS,
+                        help=f"threads liking the benchmark post (default: {DEFAULT_BENCHMARK_WRITERS})")
+    parser.add_argument('--duration', type=float, default=DEFAULT_BENCHMARK_SECONDS,
+                        help=f"seconds each benchmark scheme runs for (default: {DEFAULT_BENCHMARK_SECONDS:g})")
+    parser.add_argument('--shards', type=int, default=DEFAULT_COUNTER_SHARDS,
+                        help=f"counter shards of the benchmark post (default: {DEFAULT_COUNTER_SHARDS})")
+    parser.add_argument('--mode', choices=BENCHMARK_MODES, default='transaction',
+                        help="benchmark likes as read-modify-write transactions or blind increments (default: transaction)")
+    parser.add_argument('--output', metavar='PATH',
+                        help="also write the benchmark results to PATH as JSON")
+    parser.add_argument('--metrics-out', metavar='PATH',
+                        help="write rollup metrics to PATH at exit: JSON for a .json path, Prometheus text otherwise")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == 'read':
+        if not args.post_ids:
+            raise SystemExit("read needs the IDs of the posts to read")
+        counters = read_counters(seeder.get_db(), args.post_ids)
+        for post_id in args.post_ids:
+            totals = counters.get(post_id)
+            print(f"{post_id}: " + (', '.join(f"{field}={total}" for field, total in sorted(totals.items()))
+                                    if totals is not None else "no counter shards"))
+    elif args.command == 'benchmark':
+        results = benchmark_hot_post(args.writers, args.duration, args.shards, args.mode)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=2)
+            print(f"Wrote results to {args.output}")
+    else:
+        def rollup(metrics):
+            options = dict(workers=args.workers, rate=args.rate, page_size=args.page_size, metrics=metrics)
+            if args.interval:
+                run_rollups(args.interval, args.since, **options)
+            else:
+                rollup_counters(args.since, **options)
+
+        seeder.run_with_metrics(args, rollup)
@@ -0,0 +1,158 @@
+"""Delete expired stories together with their feed copies and users/{id}/stories pointers
+
+Stories are filtered out by expiresAt when read but never removed, so dead
+documents pile up behind every story query. The sweeper pages through
+stories with expiresAt <= now in expiresAt order (the single-field index
+every collection gets), fetching only the fields the cursor needs. For each
+page a worker looks up the linked documents with storyId 'in' queries, up to
+STORY_ID_QUERY_LIMIT stories at a time: the feed copies and, through the
+stories collection group, the users/{id}/stories pointers. It then deletes
+them in batches under a shared rate limit, along with the counter shards of
+feed copies seeded with --counter-shards. Linked documents are queued
+before their stories, so if a batch fails the story is still there and the
+next sweep finds its links again.
+
+The pointer lookup needs the COLLECTION_GROUP storyId override in
+firestore.indexes.json; the emulator runs it without.
+
+    python sweep_expired_stories.py --dry-run
+    python sweep_expired_stories.py --rate 200 --workers 4
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python sweep_expired_stories.py --now 2025-01-02T00:00:00
+"""
+import argparse
+import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import generate_sample_data as seeder
+
+DEFAULT_PAGE_SIZE = 500
+DEFAULT_WORKERS = 4
+
+# Most values Firestore accepts in an 'in' filter
+STORY_ID_QUERY_LIMIT = 30
+
+def expired_story_pages(db, now, page_size=DEFAULT_PAGE_SIZE):
+    """Yield pages of the stories that expired at or before now, oldest first
+
+    Each page starts after the last story of the one before, so deleting a
+    page while the next is read does not shift the scan.
+    """
+    from google.cloud.firestore_v1.base_query import FieldFilter
+
+    query = (db.collection('stories')
+             .where(filter=FieldFilter('expiresAt', '<=', now))
+             .order_by('expiresAt')
+             .select(['expiresAt'])
+             .limit(page_size))
+    cursor = None
+    while True:
+        page = list((query if cursor is None else query.start_after(cursor)).stream())
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        cursor = page[-1]
+
+def linked_documents(db, story_ids):
+    """Yield (collection_path, doc_id, shards) of the feed copies and users/{id}/stories pointers of story_ids
+
+    shards is the counterShards of a feed copy with sharded counters, and 0
+    for everything else.
+    """
+    from google.cloud.firestore_v1.base_query import FieldFilter
+
+    for start in range(0, len(story_ids), STORY_ID_QUERY_LIMIT):
+        chunk = story_ids[start:start + STORY_ID_QUERY_LIMIT]
+        story_filter = FieldFilter('storyId', 'in', chunk)
+        # Top-level stories never carry storyId, so the group only matches pointers
+        for query in (db.collection('feed').where(filter=story_filter),
+                      db.collection_group('stories').where(filter=story_filter)):
+            for snapshot in query.select(['counterShards']).stream():
+                shards = snapshot.to_dict().get('counterShards') or 0
+                yield snapshot.reference.path.rpartition('/')[0], snapshot.id, shards
+
+def sweep_expired_stories(now=None, workers=DEFAULT_WORKERS, rate=seeder.DEFAULT_WRITE_RATE,
+                          batch_size=seeder.MAX_BATCH_SIZE, page_size=DEFAULT_PAGE_SIZE, dry_run=False, metrics=None):
+    """Delete every story that expired at or before now, plus its linked documents
+
+    With dry_run the stories and their links are looked up and counted but
+    nothing is deleted. Returns the number of stories and linked documents
+    found.
+    """
+    db = seeder.get_db()
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    metrics = metrics or seeder.SeedMetrics()
+    print(f"{'Finding' if dry_run else 'Sweeping'} stories that expired by {now.isoformat()}...")
+    metrics.stage('sweep')
+    start = time.perf_counter()
+    limiter = seeder.TokenBucket(rate) if rate else None
+
+    def sweep_page(story_ids):
+        links = []
+        for path, doc_id, shards in linked_documents(db, story_ids):
+            # Shards go first, so a failed batch leaves the copy that leads the next sweep to them
+            links.extend(seeder.counter_shard_paths(path, doc_id, shards))
+            links.append((path, doc_id))
+        if not dry_run:
+            with seeder.BatchWriter(db, batch_size=batch_size, limiter=limiter, metrics=metrics) as writer:
+                for path, doc_id in links:
+                    writer.delete(path, doc_id)
+                for story_id in story_ids:
+                    writer.delete('stories', story_id)
+        return len(story_ids), len(links)
+
+    stories = 0
+    links = 0
+    failed = 0
+    workers = max(1, workers)
+    pages = ([snapshot.id for snapshot in page] for page in expired_story_pages(db, now, page_size))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for future in seeder.submit_in_order(pool, sweep_page, pages, window=workers * 2):
+            try:
+                page_stories, page_links = future.result()
+                stories += page_stories
+                links += page_links
+                metrics.advance(page_stories)
+            except Exception as e:
+                failed += 1
+                metrics.record_error(f"Error sweeping page: {e}")
+    metrics.finish()
+
+    elapsed = time.perf_counter() - start
+    if dry_run:
+        print(f"Found {stories} expired stories with {links} feed copies, counter shards and pointers in {elapsed:.1f}s")
+    else:
+        print(f"Deleted {stories} expired stories and {links} feed copies, counter shards and pointers in {elapsed:.1f}s "
+              f"({(stories + links) / elapsed:.0f} docs/sec)")
+    if failed:
+        print(f"{failed} pages failed; run again to sweep them")
+    return stories, links
+
+def parse_time(value):
+    """Parse an ISO time, taking times without an offset as UTC"""
+    parsed = datetime.datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=datetime.timezone.utc)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Delete expired FitCheck stories and their feed copies and pointers")
+    parser.add_argument('--now', type=parse_time,
+                        help="ISO time stories must have expired by, UTC unless it has an offset (default: now)")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="count expired stories and their linked documents without deleting them")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f"pages swept concurrently (default: {DEFAULT_WORKERS})")
+    parser.add_argument('--rate', type=float, default=seeder.DEFAULT_WRITE_RATE,
+                        help=f"maximum deletes per second across all workers, 0 to disable (default: {seeder.DEFAULT_WRITE_RATE})")
+    parser.add_argument('--batch-size', type=int, default=seeder.MAX_BATCH_SIZE,
+                        help=f"deletes per committed batch (max {seeder.MAX_BATCH_SIZE})")
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE,
+                        help=f"expired stories read per query page (default: {DEFAULT_PAGE_SIZE})")
+    parser.add_argument('--metrics-out', metavar='PATH',
+                        help="write run metrics to PATH at exit: JSON for a .json path, Prometheus text otherwise")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    seeder.run_with_metrics(args, lambda metrics: sweep_expired_stories(
+        args.now, args.workers, args.rate, args.batch_size, args.page_size, args.dry_run, metrics))
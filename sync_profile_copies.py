@@ -0,0 +1,272 @@
+"""Rewrite the denormalized profile copies of users after a profile change
+
+Check-ins and stories copy the author's displayName and photoURL into the
+userDisplayName and userPhotoURL of every feed, checkIns, stories and
+timeline document they produce, so a new profile photo (uploadProfileImage
+in functions/index.js) leaves thousands of documents stale. For each user
+the current profile is read from users/{id}, then every collection group is
+walked with a userId == id query ordered by document name and paged with
+start_after cursors. Only the two copied fields are fetched, and copies
+that already match are skipped. Profiles are read in chunks of
+PROFILE_CHUNK_SIZE, the (user, collection group) scans run concurrently and
+stale documents are rewritten with batched update()s, all on one pool of
+workers sharing one write rate limit.
+
+Collection-group queries on userId need the COLLECTION_GROUP field
+overrides in firestore.indexes.json; the emulator runs them without.
+
+    python sync_profile_copies.py USER_ID [USER_ID ...]
+    python sync_profile_copies.py --users-file changed_users.txt --workers 16
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python sync_profile_copies.py --seeded --dry-run
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import generate_sample_data as seeder
+
+# Collection groups holding userDisplayName/userPhotoURL copies: the feed, the
+# users/{id}/checkIns histories, stories and the pre-built users/{id}/timeline
+COPY_COLLECTION_GROUPS = ('feed', 'checkIns', 'stories', 'timeline')
+
+# Profile field on users/{id} -> field it is copied into
+COPIED_FIELDS = {'displayName': 'userDisplayName', 'photoURL': 'userPhotoURL'}
+
+DEFAULT_PAGE_SIZE = 1000
+DEFAULT_WORKERS = 8
+
+# users/{id} documents fetched per get_all() call
+PROFILE_CHUNK_SIZE = 300
+
+def current_profiles(db, user_ids, chunk_size=PROFILE_CHUNK_SIZE):
+    """Yield (user_id, {copy field: value}) read from users/{id}, with None for users that do not exist
+
+    The profiles are fetched with one get_all() per chunk_size users as the
+    caller consumes them, so a --seeded run never sends every user in a
+    single request or holds every profile at once.
+    """
+    for chunk in chunked(user_ids, chunk_size):
+        refs = [db.collection('users').document(user_id) for user_id in chunk]
+        profiles = {}
+        for snapshot in db.get_all(refs, field_paths=list(COPIED_FIELDS)):
+            if snapshot.exists:
+                data = snapshot.to_dict()
+                profiles[snapshot.id] = {copy: data.get(field) for field, copy in COPIED_FIELDS.items()}
+        for user_id in chunk:
+            yield user_id, profiles.get(user_id)
+
+def copy_pages(db, collection_group, user_id, page_size=DEFAULT_PAGE_SIZE):
+    """Yield pages of the copied fields of user_id's documents in collection_group
+
+    Pages are ordered by document name and each one starts after the last
+    document of the previous page, so the scan never re-reads what it has
+    seen and does not skip documents as they are rewritten.
+    """
+    from google.cloud.firestore import FieldPath
+    from google.cloud.firestore_v1.base_query import FieldFilter
+
+    query = (db.collection_group(collection_group)
+             .where(filter=FieldFilter('userId', '==', user_id))
+             .order_by(FieldPath.document_id())
+             .select(list(COPIED_FIELDS.values()))
+             .limit(page_size))
+    cursor = None
+    while True:
+        page = list((query if cursor is None else query.start_after(cursor)).stream())
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        cursor = page[-1]
+
+def scan_copies(db, collection_group, user_id, profile, page_size=DEFAULT_PAGE_SIZE):
+    """Return (documents scanned, [(collection_path, doc_id, profile)] of the stale ones) for
+    user_id's documents in collection_group"""
+    scanned = 0
+    stale = []
+    for page in copy_pages(db, collection_group, user_id, page_size):
+        scanned += len(page)
+        for snapshot in page:
+            data = snapshot.to_dict()
+            if any(data.get(field) != value for field, value in profile.items()):
+                stale.append((snapshot.reference.path.rpartition('/')[0], snapshot.id, profile))
+    return scanned, stale
+
+def stale_copies(db, profiles, collection_groups=COPY_COLLECTION_GROUPS, page_size=DEFAULT_PAGE_SIZE,
+                 stats=None, pool=None, window=DEFAULT_WORKERS * 2):
+    """Yield (collection_path, doc_id, fields) for every copy that differs from its user's profile
+
+    profiles yields (user_id, profile) pairs. With a pool, the scan of each
+    (user, collection group) pair runs on it with at most window scans in
+    flight; without one they run in the calling thread. stats, if given,
+    counts the documents scanned and found stale per collection group.
+    """
+    scans = ((collection_group, user_id, profile)
+             for user_id, profile in profiles for collection_group in collection_groups)
+
+    def scan(item):
+        collection_group, user_id, profile = item
+        return (collection_group, *scan_copies(db, collection_group, user_id, profile, page_size))
+
+    if pool is None:
+        results = map(scan, scans)
+    else:
+        results = (future.result() for future in seeder.submit_in_order(pool, scan, scans, window))
+    for collection_group, scanned, stale in results:
+        if stats is not None:
+            group = stats.setdefault(collection_group, {'scanned': 0, 'stale': 0})
+            group['scanned'] += scanned
+            group['stale'] += len(stale)
+        yield from stale
+
+def chunked(items, size):
+    """Group items into lists of up to size"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def sync_profile_copies(user_ids, collection_groups=COPY_COLLECTION_GROUPS, workers=DEFAULT_WORKERS,
+                        rate=seeder.DEFAULT_WRITE_RATE, batch_size=seeder.MAX_BATCH_SIZE,
+                        page_size=DEFAULT_PAGE_SIZE, dry_run=False, metrics=None):
+    """Rewrite every stale userDisplayName/userPhotoURL copy of user_ids and return the counts
+
+    The (user, collection group) scans and the batched updates share one
+    pool of workers. The calling thread keeps at most two scans and two
+    batches per worker in flight and hands full batches of stale documents
+    to the pool, so reads and writes overlap without holding every stale
+    document in memory. With dry_run the copies are counted, not written.
+    """
+    db = seeder.get_db()
+    metrics = metrics or seeder.SeedMetrics()
+    start = time.perf_counter()
+    found = 0
+
+    def existing_profiles():
+        nonlocal found
+        for user_id, profile in current_profiles(db, user_ids):
+            if profile is None:
+                metrics.log(f"Skipping {user_id}: no users/{user_id} document")
+                continue
+            found += 1
+            yield user_id, profile
+
+    print(f"{'Checking' if dry_run else 'Syncing'} profile copies of {len(user_ids)} users "
+          f"in {', '.join(collection_groups)}...")
+    metrics.stage('sync')
+    stats = {}
+    limiter = seeder.TokenBucket(rate) if rate else None
+
+    def update_chunk(chunk):
+        with seeder.BatchWriter(db, batch_size=batch_size, limiter=limiter, metrics=metrics) as writer:
+            for path, doc_id, fields in chunk:
+                writer.update(path, doc_id, fields)
+        return len(chunk)
+
+    updated = 0
+    failed = 0
+    workers = max(1, workers)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        copies = stale_copies(db, existing_profiles(), collection_groups, page_size, stats,
+                              pool=pool, window=workers * 2)
+        if dry_run:
+            for chunk in chunked(copies, batch_size):
+                metrics.advance(len(chunk))
+        else:
+            for future in seeder.submit_in_order(pool, update_chunk, chunked(copies, batch_size), window=workers * 2):
+                try:
+                    count = future.result()
+                    updated += count
+                    metrics.advance(count)
+                except Exception as e:
+                    # A copy deleted since the scan fails its whole batch; rerunning picks up the rest
+                    failed += 1
+                    metrics.record_error(f"Error updating batch: {e}")
+    metrics.finish()
+
+    elapsed = time.perf_counter() - start
+    scanned = sum(group['scanned'] for group in stats.values())
+    stale = sum(group['stale'] for group in stats.values())
+    for name, group in stats.items():
+        print(f"  {name:>10}: {group['stale']} stale of {group['scanned']} copies")
+    if dry_run:
+        print(f"Found {stale} stale of {scanned} copies in {elapsed:.1f}s ({scanned / elapsed:.0f} docs/sec scanned)")
+    else:
+        print(f"Updated {updated}/{stale} stale of {scanned} copies in {elapsed:.1f}s "
+              f"({updated / elapsed:.0f} docs/sec written, {scanned / elapsed:.0f} docs/sec scanned)")
+        if failed:
+            print(f"{failed} batches failed; run again to retry them")
+    return {
+        'users': found,
+        'scanned': scanned,
+        'stale': stale,
+        'updated': updated,
+        'failed_batches': failed,
+        'seconds': round(elapsed, 3),
+        'collection_groups': stats
+    }
+
+def read_user_ids(path):
+    """Read user IDs from path, one per line, ignoring blank lines and # comments"""
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+def parse_collection_groups(value):
+    """Parse a comma-separated list of collection groups such as 'feed,checkIns'"""
+    groups = [group for group in value.split(',') if group]
+    unknown = set(groups) - set(COPY_COLLECTION_GROUPS)
+    if unknown or not groups:
+        raise argparse.ArgumentTypeError(f"expected some of {', '.join(COPY_COLLECTION_GROUPS)}, got {value!r}")
+    return groups
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Rewrite denormalized FitCheck profile copies after a profile change")
+    parser.add_argument('user_ids', nargs='*', metavar='USER_ID',
+                        help="users whose profile changed")
+    parser.add_argument('--users-file', metavar='PATH',
+                        help="also read user IDs from PATH, one per line")
+    parser.add_argument('--seeded', action='store_true',
+                        help="sync every user of the seeded run recorded in the journal")
+    parser.add_argument('--journal', default=seeder.DEFAULT_JOURNAL_PATH,
+                        help=f"seed journal read by --seeded (default: {seeder.DEFAULT_JOURNAL_PATH})")
+    parser.add_argument('--collections', type=parse_collection_groups, default=list(COPY_COLLECTION_GROUPS),
+                        metavar='GROUP,...', help="collection groups to sync (default: " + ','.join(COPY_COLLECTION_GROUPS) + ")")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="count stale copies without rewriting them")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f"batches committed concurrently (default: {DEFAULT_WORKERS})")
+    parser.add_argument('--rate', type=float, default=seeder.DEFAULT_WRITE_RATE,
+                        help=f"maximum updates per second across all workers, 0 to disable (default: {seeder.DEFAULT_WRITE_RATE})")
+    parser.add_argument('--batch-size', type=int, default=seeder.MAX_BATCH_SIZE,
+                        help=f"updates per committed batch (max {seeder.MAX_BATCH_SIZE})")
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE,
+                        help=f"documents read per query page (default: {DEFAULT_PAGE_SIZE})")
+    parser.add_argument('--metrics-out', metavar='PATH',
+                        help="write run metrics to PATH at exit: JSON for a .json path, Prometheus text otherwise")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    user_ids = list(args.user_ids)
+    if args.users_file:
+        user_ids += read_user_ids(args.users_file)
+    if args.seeded:
+        if not os.path.exists(args.journal):
+            raise SystemExit(f"No journal at {args.journal}; pass the user IDs to sync instead")
+        journal = seeder.SeedJournal(args.journal)
+        settings = seeder.resume_settings(journal)
+        journal.close()
+        if settings['seed'] is None:
+            raise SystemExit(f"The run in {args.journal} was not seeded, so its user IDs cannot be derived")
+        user_ids += [seeder.user_id_for(settings['seed'], index) for index in range(settings['num_users'])]
+    if not user_ids:
+        raise SystemExit("No users to sync; pass user IDs, --users-file or --seeded")
+
+    seeder.run_with_metrics(args, lambda metrics: sync_profile_copies(
+        list(dict.fromkeys(user_ids)), args.collections, args.workers, args.rate, args.batch_size,
+        args.page_size, args.dry_run, metrics))
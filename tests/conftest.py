@@ -0,0 +1,70 @@
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generate_sample_data as seeder
+
+class FailingClient(seeder.MemoryClient):
+    """MemoryClient whose commits fail while should_fail(batch writes, commit number) says so"""
+
+    def __init__(self, should_fail):
+        super().__init__()
+        self.should_fail = should_fail
+        self.commits = 0
+
+    def batch(self):
+        batch = seeder.MemoryBatch(self)
+        commit = batch.commit
+
+        def failing_commit():
+            self.commits += 1
+            if self.should_fail(batch.writes, self.commits):
+                raise RuntimeError('commit rejected')
+            return commit()
+        batch.commit = failing_commit
+        return batch
+
+class ReadingClient(seeder.MemoryClient):
+    """MemoryClient that also serves get_all(), recording how many documents each call asks for"""
+
+    def __init__(self):
+        super().__init__()
+        self.get_all_sizes = []
+
+    def get_all(self, refs, field_paths=None):
+        self.get_all_sizes.append(len(refs))
+        for ref in refs:
+            data = self.documents.get(ref)
+            if data is not None and field_paths is not None:
+                data = {key: value for key, value in data.items() if key in field_paths}
+            yield types.SimpleNamespace(id=ref.rpartition('/')[2], exists=data is not None,
+                                        reference=types.SimpleNamespace(path=ref),
+                                        to_dict=lambda data=data: dict(data))
+
+@pytest.fixture
+def use_client(monkeypatch):
+    """Return a function that points get_db() at the client it is given"""
+    def use(client):
+        monkeypatch.setattr(seeder, '_clients', {'memory': client})
+        monkeypatch.setattr(seeder, '_db_target', 'memory')
+        return client
+    return use
+
+@pytest.fixture
+def memory_db(use_client):
+    """Point get_db() at a fresh MemoryClient for the test"""
+    return use_client(seeder.MemoryClient())
+
+@pytest.fixture
+def reading_db(use_client):
+    """Point get_db() at a fresh ReadingClient for the test"""
+    return use_client(ReadingClient())
+
+@pytest.fixture
+def failing_db(use_client):
+    """Return a function that points get_db() at a FailingClient with the given should_fail"""
+    return lambda should_fail: use_client(FailingClient(should_fail))
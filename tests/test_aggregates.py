@@ -0,0 +1,70 @@
+import contextlib
+import datetime
+import io
+from collections import Counter, defaultdict
+
+import pytest
+
+import generate_sample_data as seeder
+
+NOW = datetime.datetime(2025, 3, 1, 12)
+
+@pytest.fixture(scope='module')
+def documents(tmp_path_factory):
+    output_dir = tmp_path_factory.mktemp('export')
+    with contextlib.redirect_stdout(io.StringIO()):
+        seeder.export_sample_data(output_dir, num_users=150, seed=6, now=NOW, aggregates=True)
+    return {(path, doc_id): data for path, doc_id, data in seeder.read_exported_documents(output_dir)}
+
+def check_ins_by_user(documents):
+    check_ins = defaultdict(list)
+    for (path, _), data in documents.items():
+        if path.endswith('/checkIns'):
+            check_ins[data['userId']].append(data)
+    return check_ins
+
+@pytest.mark.parametrize('engine', ['python', 'numpy'])
+def test_profiles_count_the_generated_workouts(engine, tmp_path):
+    if engine == 'numpy':
+        pytest.importorskip('numpy')
+    with contextlib.redirect_stdout(io.StringIO()):
+        seeder.export_sample_data(tmp_path, num_users=40, seed=7, now=NOW, engine=engine, aggregates=True)
+    documents = {(path, doc_id): data for path, doc_id, data in seeder.read_exported_documents(tmp_path)}
+    stats = {doc_id: data for (path, doc_id), data in documents.items() if path == 'userStats'}
+    assert len(stats) == 40
+    for user_id, summary in stats.items():
+        fitness_stats = documents['users', user_id]['fitnessStats']
+        assert fitness_stats['totalWorkouts'] == summary['totalWorkouts']
+        assert fitness_stats['totalCheckIns'] == summary['totalCheckIns']
+
+def test_user_stats_match_the_check_ins(documents):
+    check_ins = check_ins_by_user(documents)
+    stats = {doc_id: data for (path, doc_id), data in documents.items() if path == 'userStats'}
+    assert stats.keys() == check_ins.keys()
+    for user_id, user_check_ins in check_ins.items():
+        workouts = [c for c in user_check_ins if c['status'] == 'workout']
+        summary = stats[user_id]
+        assert summary['totalCheckIns'] == len(user_check_ins)
+        assert summary['totalWorkouts'] == len(workouts)
+        assert summary['totalMinutes'] == sum(c['duration'] for c in workouts)
+        assert summary['lastCheckIn'] == max(c['timestamp'] for c in user_check_ins)
+        assert summary['checkInsLast7Days'] == sum(NOW - c['timestamp'] <= datetime.timedelta(days=7)
+                                                   for c in user_check_ins)
+        assert summary['streak'] == documents['users', user_id]['streak']
+
+def test_counts_cover_every_workout(documents):
+    workouts = [c for check_ins in check_ins_by_user(documents).values() for c in check_ins
+                if c['status'] == 'workout']
+    assert documents['metadata', 'activityCounts']['counts'] == Counter(c['activityType'] for c in workouts)
+    assert documents['metadata', 'tagCounts']['counts'] == Counter(tag for c in workouts for tag in c['tags'])
+
+def test_leaderboards_rank_every_user(documents):
+    stats = {doc_id: data for (path, doc_id), data in documents.items() if path == 'userStats'}
+    for metric, field in (('streak', 'streak'), ('workouts', 'totalWorkouts')):
+        shards = sorted((data['shard'], data) for (path, _), data in documents.items()
+                        if path == 'leaderboards' and data['metric'] == metric)
+        entries = [entry for _, shard in shards for entry in shard['entries']]
+        assert len(entries) == len(stats)
+        values = [entry[metric] for entry in entries]
+        assert values == sorted(values, reverse=True)
+        assert all(stats[entry['userId']][field] == entry[metric] for entry in entries)
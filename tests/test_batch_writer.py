@@ -0,0 +1,106 @@
+import datetime
+import io
+import types
+
+import pytest
+
+import generate_sample_data as seeder
+
+def test_writes_are_committed_in_full_batches(memory_db):
+    writer = seeder.BatchWriter(memory_db)
+    for index in range(1200):
+        writer.set('feed', f'post{index}', {'index': index})
+    assert writer.batches == 2
+    assert writer.pending == 200
+    writer.close()
+    assert writer.batches == 3
+    assert writer.committed == 1200
+    assert len(memory_db.documents) == 1200
+
+def test_batch_size_is_capped_at_the_firestore_limit(memory_db):
+    assert seeder.BatchWriter(memory_db, batch_size=10_000).batch_size == seeder.MAX_BATCH_SIZE
+
+def test_context_manager_commits_only_on_a_clean_exit(memory_db):
+    with seeder.BatchWriter(memory_db) as writer:
+        writer.set('users', 'a', {'name': 'A'})
+    assert 'users/a' in memory_db.documents
+
+    try:
+        with seeder.BatchWriter(memory_db) as writer:
+            writer.set('users', 'b', {'name': 'B'})
+            raise RuntimeError('user failed')
+    except RuntimeError:
+        pass
+    assert 'users/b' not in memory_db.documents
+
+def test_update_and_delete_resolve_placeholders(memory_db):
+    with seeder.BatchWriter(memory_db) as writer:
+        writer.set('feed', 'post', {'likes': 2})
+        writer.set('feed', 'gone', {'likes': 0})
+    with seeder.BatchWriter(memory_db) as writer:
+        writer.update('feed', 'post', {'likes': seeder.Increment(3), 'updatedAt': seeder.SERVER_TIMESTAMP})
+        writer.delete('feed', 'gone')
+    post = memory_db.documents['feed/post']
+    assert post['likes'] == 5
+    assert isinstance(post['updatedAt'], datetime.datetime)
+    assert 'feed/gone' not in memory_db.documents
+
+def test_generate_user_shares_the_writer_batches(memory_db):
+    writer = seeder.BatchWriter(memory_db)
+    for index in range(20):
+        seeder.generate_user(writer, seeder.synthetic_user(index), user_id=seeder.user_id_for(1, index))
+    writer.close()
+    assert writer.batches < 20
+    assert sum(path.startswith('users/') and path.count('/') == 1 for path in memory_db.documents) == 20
+
+class MemoryBulkWriter:
+    """BulkWriter over a MemoryClient whose writes to failing paths keep failing"""
+
+    def __init__(self, client, failing):
+        self.batch = seeder.MemoryBatch(client)
+        self.failing = failing
+        self.on_error = None
+
+    def on_write_error(self, callback):
+        self.on_error = callback
+
+    def set(self, ref, data):
+        self.batch.set(ref, data)
+
+    def flush(self):
+        writes, self.batch.writes = self.batch.writes, []
+        for ref, data in writes:
+            attempts = 1
+            while ref in self.failing:
+                error = types.SimpleNamespace(operation=types.SimpleNamespace(reference=types.SimpleNamespace(path=ref)),
+                                              attempts=attempts, message='unavailable')
+                if not self.on_error(error, self):
+                    break
+                attempts += 1
+            else:
+                self.batch.writes.append((ref, data))
+        self.batch.commit()
+        self.batch.writes = []
+
+    def close(self):
+        self.flush()
+
+def test_bulk_writes_given_up_on_are_not_journaled(memory_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(memory_db, 'bulk_writer', lambda: MemoryBulkWriter(memory_db, {'users/b'}), raising=False)
+    journal = seeder.SeedJournal(str(tmp_path / 'journal.db'))
+    metrics = seeder.SeedMetrics(io.StringIO())
+    writer = seeder.BatchWriter(memory_db, use_bulk_writer=True, journal=journal, metrics=metrics)
+    writer.set('users', 'a', {})
+    writer.complete_unit('user/0')
+    writer.set('users', 'b', {})
+    writer.complete_unit('user/1')
+    with pytest.raises(seeder.LostWritesError) as lost:
+        writer.flush()
+    assert lost.value.units == ['user/0', 'user/1']
+    assert 'users/b' in str(lost.value)
+    assert metrics.retries == seeder.BULK_WRITER_MAX_ATTEMPTS - 1
+    assert 'users/a' in memory_db.documents
+    assert journal.done_units() == set()
+    assert journal.document_count() == 0
+    writer.close()
+    journal.close()
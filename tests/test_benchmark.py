@@ -0,0 +1,35 @@
+import benchmark_sample_data as benchmark
+
+def test_run_scale_measures_every_stage_on_the_memory_client():
+    run = benchmark.run_scale('memory', 20, batch_size=50)
+    assert run['users'] == 20
+    assert set(run['stages']) == {'metadata', 'users', 'social_graph'}
+    for stage in run['stages'].values():
+        assert stage['documents'] > 0
+        assert stage['batches'] >= stage['documents'] / 50
+        assert stage['commit_p50_ms'] <= stage['commit_p99_ms']
+
+def test_run_scale_is_reproducible():
+    first, second = benchmark.run_scale('memory', 20), benchmark.run_scale('memory', 20)
+    for name, stage in first['stages'].items():
+        assert stage['documents'] == second['stages'][name]['documents']
+
+def stage(documents, docs_per_sec):
+    return {'documents': documents, 'docs_per_sec': docs_per_sec}
+
+def results(peak_rss_mb, users_rate, metadata_rate=100.0):
+    return {'runs': {'100': {'peak_rss_mb': peak_rss_mb, 'stages': {
+        'users': stage(5000, users_rate), 'metadata': stage(3, metadata_rate)}}}}
+
+def test_find_regressions_flags_slow_stages_and_memory_growth():
+    baseline = results(100.0, 10000.0)
+    assert benchmark.find_regressions(results(110.0, 9000.0), baseline) == []
+    regressions = benchmark.find_regressions(results(130.0, 7000.0), baseline)
+    assert len(regressions) == 2
+    assert any('peak RSS' in regression for regression in regressions)
+    assert any('users' in regression and 'docs/sec' in regression for regression in regressions)
+
+def test_find_regressions_skips_tiny_stages_and_new_scales():
+    baseline = results(100.0, 10000.0, metadata_rate=1000.0)
+    assert benchmark.find_regressions(results(100.0, 10000.0, metadata_rate=1.0), baseline) == []
+    assert benchmark.find_regressions({'runs': {'999': results(500.0, 1.0)['runs']['100']}}, baseline) == []
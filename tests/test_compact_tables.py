@@ -0,0 +1,29 @@
+import pytest
+
+import generate_sample_data as seeder
+
+def test_doc_id_table_behaves_like_a_list():
+    ids = [seeder.derived_id(1, index) for index in range(100)]
+    table = seeder.DocIdTable(ids)
+    assert len(table) == 100
+    assert list(table) == ids
+    assert table[0] == ids[0]
+    assert table[-1] == ids[-1]
+    assert len(table.data) == 100 * seeder.DOC_ID_LENGTH
+    with pytest.raises(IndexError):
+        table[100]
+
+def test_doc_id_table_rejects_ids_of_another_length():
+    with pytest.raises(ValueError):
+        seeder.DocIdTable(['short'])
+
+def test_from_seed_matches_the_derived_user_ids():
+    assert list(seeder.DocIdTable.from_seed(3, 10)) == [seeder.user_id_for(3, index) for index in range(10)]
+
+def test_string_table_interns_values_and_keeps_none_at_zero():
+    table = seeder.StringTable(['a', 'b'])
+    assert table.code(None) == 0
+    assert table.code('a') == 1
+    assert table.code('c') == 3
+    assert table.code('c') == 3
+    assert [table[code] for code in range(4)] == [None, 'a', 'b', 'c']
@@ -0,0 +1,41 @@
+import argparse
+import json
+
+import pytest
+
+import generate_sample_data as seeder
+
+def test_use_db_picks_the_memory_client(monkeypatch):
+    monkeypatch.setattr(seeder, '_clients', {})
+    monkeypatch.setattr(seeder, '_db_target', None)
+    seeder.use_db('memory')
+    client = seeder.get_db()
+    assert isinstance(client, seeder.MemoryClient)
+    assert seeder.get_db() is client
+    with pytest.raises(ValueError):
+        seeder.use_db('cloud')
+
+def test_memory_client_resolves_placeholders():
+    client = seeder.MemoryClient()
+    batch = client.batch()
+    batch.set(client.collection('feed').document('p'), {'likes': 1, 'at': seeder.SERVER_TIMESTAMP})
+    batch.update(client.collection('feed').document('p'), {'likes': seeder.Increment(2)})
+    batch.commit()
+    assert client.documents['feed/p']['likes'] == 3
+    assert client.documents['feed/p']['at'] is not seeder.SERVER_TIMESTAMP
+    batch = client.batch()
+    batch.delete('feed/p')
+    batch.commit()
+    assert client.documents == {}
+
+def test_run_with_metrics_dumps_even_when_the_run_fails(tmp_path):
+    path = str(tmp_path / 'metrics.json')
+
+    def fail(metrics):
+        metrics.record_writes({'feed': 2}, 0.01)
+        raise RuntimeError('interrupted')
+
+    with pytest.raises(RuntimeError):
+        seeder.run_with_metrics(argparse.Namespace(metrics_out=path), fail)
+    assert json.loads(open(path).read())['documents'] == {'feed': 2}
+    assert seeder.run_with_metrics(argparse.Namespace(metrics_out=None), lambda metrics: 'done') == 'done'
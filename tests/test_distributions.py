@@ -0,0 +1,66 @@
+import datetime
+import random
+from collections import Counter
+
+import pytest
+
+import generate_sample_data as seeder
+import fit_distributions
+
+NOW = datetime.datetime(2025, 3, 1, 12)
+
+def test_alias_table_draws_in_proportion_to_the_weights():
+    table = seeder.AliasTable([1, 0, 3, 6])
+    rng = random.Random(1)
+    counts = Counter(table.sample(rng) for _ in range(50000))
+    assert counts[1] == 0
+    for index, share in ((0, 0.1), (2, 0.3), (3, 0.6)):
+        assert counts[index] / 50000 == pytest.approx(share, abs=0.01)
+
+def test_alias_table_numpy_draws_match():
+    np = pytest.importorskip('numpy')
+    table = seeder.AliasTable([1, 0, 3, 6])
+    counts = np.bincount(table.sample_array(50000, np.random.default_rng(1)), minlength=4) / 50000
+    assert counts.tolist() == pytest.approx([0.1, 0.0, 0.3, 0.6], abs=0.01)
+
+@pytest.mark.parametrize('weights', [[], [0, 0], [1, -1]])
+def test_alias_table_rejects_bad_weights(weights):
+    with pytest.raises(ValueError):
+        seeder.AliasTable(weights)
+
+def test_histograms_draw_inside_their_bins():
+    distribution = seeder.IntegerDistribution({'histogram': {'edges': [0, 10, 100], 'counts': [0, 1]}})
+    rng = random.Random(2)
+    assert all(10 <= distribution.sample(rng) < 100 for _ in range(1000))
+    assert distribution.maximum == 99
+    with pytest.raises(ValueError):
+        seeder.IntegerDistribution({'histogram': {'edges': [0, 10], 'counts': [1, 1]}})
+
+def test_fitness_levels_override_the_base_distributions():
+    distributions = seeder.Distributions({'tagCount': [1, 2], 'fitnessLevels': {
+        'Advanced': {'activityType': {'weights': {'Rowing': 1}}, 'tagCount': [6, 6]}}})
+    rng = random.Random(3)
+    advanced = distributions.for_level('Advanced')
+    assert {advanced.activity.sample(rng) for _ in range(100)} == {'Rowing'}
+    assert 'Rowing' in distributions.for_level('Beginner').activity.names
+    assert distributions.for_level('Beginner').tag_count.maximum == 2
+    assert distributions.max_tag_count == 6
+    with pytest.raises(ValueError):
+        seeder.Distributions({'heartRate': [60, 180]})
+
+def test_fit_integer_keeps_exact_weights_or_bins_wide_ranges():
+    assert fit_distributions.fit_integer(Counter({1: 2, 3: 1})) == {'weights': {'1': 2, '3': 1}}
+    histogram = fit_distributions.fit_integer(Counter(range(1000)))['histogram']
+    assert histogram['edges'][0] == 0 and histogram['edges'][-1] == 1000
+    assert len(histogram['counts']) <= fit_distributions.HISTOGRAM_BINS
+    assert sum(histogram['counts']) == 1000
+
+def test_fitted_spec_reproduces_the_seeded_shares(tmp_path):
+    spec = {'workoutShare': 0.4, 'photoShare': 0.2, 'likes': {'weights': {'0': 1, '7': 3}}}
+    seeder.export_sample_data(tmp_path, num_users=200, seed=5, now=NOW, distributions=spec)
+    fitted = fit_distributions.fit_distributions(tmp_path, min_level_check_ins=10 ** 9)
+    assert fitted['workoutShare'] == pytest.approx(0.4, abs=0.05)
+    assert fitted['photoShare'] == pytest.approx(0.2, abs=0.05)
+    assert set(fitted['likes']['weights']) == {'0', '7'}
+    assert 'fitnessLevels' not in fitted
+    seeder.Distributions(fitted)
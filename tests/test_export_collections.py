@@ -0,0 +1,50 @@
+import types
+
+import generate_sample_data as seeder
+import export_collections
+
+USERS = {
+    'u1': {'displayName': 'Ada Lovelace', 'email': 'ada@example.org', 'photoURL': 'https://photos/ada.jpg'},
+    'u2': {'displayName': 'Alan Turing', 'email': None, 'avatar': b'\x89PNG\x00'},
+}
+
+def snapshot(path, data):
+    doc_id = path.rpartition('/')[2]
+    return types.SimpleNamespace(id=doc_id, reference=types.SimpleNamespace(path=path), to_dict=lambda: dict(data))
+
+def test_anonymized_copies_of_a_user_agree():
+    anonymizer = export_collections.Anonymizer(salt='fixed')
+    profile = anonymizer.anonymize('users', 'u1', USERS['u1'])
+    post = anonymizer.anonymize('feed', 'p1', {'userId': 'u1', 'userDisplayName': 'Ada Lovelace',
+                                               'userPhotoURL': 'https://photos/ada.jpg', 'likes': 3})
+    assert profile['displayName'] == post['userDisplayName'] != 'Ada Lovelace'
+    assert profile['photoURL'] == post['userPhotoURL']
+    assert profile['email'].endswith('@example.com')
+    assert post['likes'] == 3
+    assert export_collections.Anonymizer(salt='other').pseudonym('u1') != anonymizer.pseudonym('u1')
+
+def test_anonymize_keeps_missing_personal_fields_and_unowned_documents():
+    anonymizer = export_collections.Anonymizer()
+    assert anonymizer.anonymize('users', 'u2', USERS['u2'])['email'] is None
+    assert anonymizer.anonymize('stats', 'daily', {'displayName': 'x'}) == {'displayName': 'x'}
+
+def test_plain_value_flattens_geo_points_and_references():
+    point = types.SimpleNamespace(latitude=1.5, longitude=-2.0)
+    reference = types.SimpleNamespace(path='users/u1', parent=None)
+    value = {'where': point, 'refs': [reference], 'blob': b'\x00'}
+    assert export_collections.plain_value(value) == {
+        'where': {'latitude': 1.5, 'longitude': -2.0}, 'refs': ['users/u1'], 'blob': b'\x00'}
+
+def test_export_writes_every_partition(memory_db, monkeypatch, tmp_path):
+    partitions = {'users': [[f'users/{user_id}' for user_id in USERS]],
+                  'feed': [['feed/p1'], ['feed/p2', 'feed/p3']]}
+    documents = {f'users/{user_id}': data for user_id, data in USERS.items()}
+    documents.update({f'feed/p{index}': {'userId': 'u1', 'likes': index} for index in range(1, 4)})
+    monkeypatch.setattr(export_collections, 'partition_queries', lambda db, group, count: partitions[group])
+    monkeypatch.setattr(export_collections, 'query_pages',
+                        lambda paths, page_size: [snapshot(path, documents[path]) for path in paths])
+    written = export_collections.export_collections(tmp_path, ['users', 'feed'], workers=2)
+    assert written == 5
+    assert len(list(tmp_path.glob('feed-p*.ndjson.gz'))) == 2
+    assert {f'{path}/{doc_id}': data
+            for path, doc_id, data in seeder.read_exported_documents(tmp_path)} == documents
@@ -0,0 +1,47 @@
+import datetime
+
+import pytest
+
+import generate_sample_data as seeder
+
+NOW = datetime.datetime(2025, 3, 1, 12)
+
+def exported(input_dir):
+    """Documents of an export keyed by path, with server timestamps resolved to the export time"""
+    return {f"{path}/{doc_id}": {key: NOW if value is seeder.SERVER_TIMESTAMP else value
+                                 for key, value in data.items()}
+            for path, doc_id, data in seeder.read_exported_documents(input_dir)}
+
+def test_ndjson_round_trip(tmp_path):
+    documents = {
+        'users/a': {'name': 'A', 'joined': NOW, 'updatedAt': seeder.SERVER_TIMESTAMP, 'tags': ['x']},
+        'users/b': {'name': None, 'avatar': b'\x89PNG', 'thumbs': [b'', b'\xff']},
+    }
+    with seeder.FileSink(tmp_path) as sink:
+        for path, data in documents.items():
+            sink.set(*path.split('/'), data)
+    assert {f"{path}/{doc_id}": data for path, doc_id, data in seeder.read_exported_documents(tmp_path)} == documents
+
+def test_parquet_export_matches_ndjson(tmp_path):
+    pytest.importorskip('pyarrow')
+    for fmt in seeder.EXPORT_FORMATS:
+        seeder.export_sample_data(tmp_path / fmt, fmt, num_users=30, seed=3, now=NOW, timeline_size=10,
+                                  aggregates=True)
+    ndjson, parquet = exported(tmp_path / 'ndjson'), exported(tmp_path / 'parquet')
+    assert parquet.keys() == ndjson.keys()
+    for path, data in ndjson.items():
+        assert parquet[path] == data, path
+
+def test_parquet_keeps_fields_missing_from_earlier_rows_and_row_groups(tmp_path):
+    pytest.importorskip('pyarrow')
+    documents = {
+        'feed/a': {'type': 'checkIn', 'likes': 1},
+        'feed/b': {'type': 'story', 'storyId': 's1', 'caption': None},
+        'feed/c': {'type': 'checkIn', 'likes': 2, 'location': {'lat': 1.5}},
+        'feed/d': {'type': 'story', 'storyId': 's2', 'likes': 'many', 'blob': b'\x01'},
+        'feed/e': {'type': 'checkIn'},
+    }
+    with seeder.FileSink(tmp_path, 'parquet', row_group_size=2) as sink:
+        for path, data in documents.items():
+            sink.set(*path.split('/'), data)
+    assert exported(tmp_path) == documents
@@ -0,0 +1,70 @@
+import datetime
+import re
+import time
+
+import pytest
+
+import generate_sample_data as seeder
+
+SEED = 11
+NOW = datetime.datetime(2025, 3, 1, 12)
+
+def user_paths(index):
+    rng = seeder.seeded_rng(SEED, 'user', index)
+    user_id = seeder.user_id_for(SEED, index)
+    return {f"{path}/{doc_id}" for path, doc_id, _ in
+            seeder.user_documents(user_id, seeder.synthetic_user(index, rng), now=NOW, rng=rng)}
+
+def lost_users(output):
+    lost = set()
+    for line in output.splitlines():
+        if line.startswith('Lost the writes of '):
+            lost.update(int(index) for index in re.findall(r'user/(\d+)', line))
+    return lost
+
+def generate(num_users=40, workers=1):
+    seeder.generate_all_sample_data(num_users, workers=workers, rate=0, batch_size=50, seed=SEED, now=NOW)
+
+def assert_lost_users_reported(client, output, num_users=40):
+    lost = lost_users(output)
+    assert lost
+    for index in range(num_users):
+        complete = user_paths(index) <= client.documents.keys()
+        assert complete != (index in lost), f"user {index} {'is' if complete else 'is not'} complete"
+
+def test_users_are_written_with_a_worker_pool(memory_db):
+    seeder.generate_all_sample_data(40, workers=4, rate=0, batch_size=50, seed=SEED, now=NOW)
+    for index in range(40):
+        assert user_paths(index) <= memory_db.documents.keys()
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_a_rejected_batch_loses_only_the_users_in_it(failing_db, capsys, workers):
+    poisoned = f"users/{seeder.user_id_for(SEED, 7)}"
+    client = failing_db(lambda writes, _: any(ref == poisoned for ref, _ in writes))
+    generate(workers=workers)
+    assert_lost_users_reported(client, capsys.readouterr().out)
+
+def test_a_transient_failure_does_not_commit_the_lost_users_later(failing_db, capsys):
+    client = failing_db(lambda _, commit: commit == 3)
+    generate()
+    assert_lost_users_reported(client, capsys.readouterr().out)
+
+def test_failed_commit_discards_the_batch_and_names_its_units(failing_db):
+    writer = seeder.BatchWriter(failing_db(lambda _, commit: commit == 1))
+    writer.set('users', 'a', {})
+    writer.complete_unit('user/0')
+    writer.set('users', 'b', {})
+    with pytest.raises(seeder.LostWritesError) as raised:
+        writer.flush()
+    assert raised.value.units == ['user/0']
+    assert writer.pending == 0
+    writer.set('users', 'c', {})
+    writer.close()
+    assert list(writer.client.documents) == ['users/c']
+
+def test_token_bucket_limits_the_write_rate():
+    bucket = seeder.TokenBucket(rate=1000, capacity=10)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire(10)
+    assert time.monotonic() - start >= 0.045
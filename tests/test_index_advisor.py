@@ -0,0 +1,53 @@
+import json
+import os
+
+import index_advisor
+from index_advisor import ASCENDING, DESCENDING, CatalogQuery
+
+INDEX_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), index_advisor.DEFAULT_INDEX_PATH)
+
+def test_equality_fields_come_before_the_order():
+    query = CatalogQuery('q', 'test', 'notifications', filters=[('userId', '==', 'u'), ('read', '==', False)],
+                         orders=[('timestamp', DESCENDING)])
+    composite, equality_count, single_fields = index_advisor.required_indexes(query)
+    assert equality_count == 2
+    assert [(field['fieldPath'], field['order']) for field in composite['fields']] == [
+        ('userId', ASCENDING), ('read', ASCENDING), ('timestamp', DESCENDING)]
+    assert single_fields == []
+
+def test_inequalities_are_ordered_after_the_explicit_order():
+    query = CatalogQuery('q', 'test', 'stories', filters=[('userId', '==', 'u'), ('expiresAt', '>', 0)],
+                         orders=[('timestamp', DESCENDING)])
+    composite, _, _ = index_advisor.required_indexes(query)
+    assert [field['fieldPath'] for field in composite['fields']] == ['userId', 'timestamp', 'expiresAt']
+
+def test_single_field_and_document_id_queries_need_no_composite():
+    query = CatalogQuery('q', 'test', 'feed', filters=[('userId', '==', 'u')],
+                         orders=[(index_advisor.DOCUMENT_ID, ASCENDING)], collection_group=True)
+    composite, _, single_fields = index_advisor.required_indexes(query)
+    assert composite is None
+    assert single_fields == [('userId', {'order': ASCENDING, 'queryScope': 'COLLECTION_GROUP'})]
+
+def test_advise_proposes_missing_indexes_once():
+    queries = [
+        CatalogQuery('a', 'test', 'posts', filters=[('tags', 'array-contains', 'x')], orders=[('at', DESCENDING)]),
+        CatalogQuery('b', 'test', 'posts', filters=[('tags', 'array-contains', 'y')], orders=[('at', DESCENDING)]),
+        CatalogQuery('c', 'test', 'posts', filters=[('ownerId', '==', 'u')], collection_group=True),
+    ]
+    proposed, findings = index_advisor.advise({'indexes': []}, queries)
+    assert len(proposed['indexes']) == 1
+    assert proposed['indexes'][0]['fields'][0] == {'fieldPath': 'tags', 'arrayConfig': 'CONTAINS'}
+    assert all(findings[name]['missing'] for name in 'abc')
+    override, = proposed['fieldOverrides']
+    assert override['fieldPath'] == 'ownerId'
+    # The override keeps the default single-field indexes next to the group one
+    assert index_advisor.DEFAULT_FIELD_INDEXES[0] in override['indexes']
+    _, findings = index_advisor.advise(proposed, queries)
+    assert not any(finding['missing'] for finding in findings.values())
+
+def test_the_checked_in_indexes_cover_the_catalog():
+    with open(INDEX_PATH) as f:
+        current_text = f.read()
+    proposed, findings = index_advisor.advise(json.loads(current_text))
+    assert {name: finding['missing'] for name, finding in findings.items() if finding['missing']} == {}
+    assert index_advisor.index_diff(INDEX_PATH, current_text, proposed) == ''
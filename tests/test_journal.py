@@ -0,0 +1,56 @@
+import datetime
+
+import pytest
+
+import generate_sample_data as seeder
+
+NOW = datetime.datetime(2025, 3, 1, 12)
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = seeder.SeedJournal(str(tmp_path / 'journal.db'))
+    yield journal
+    journal.close()
+
+def generate(**kwargs):
+    seeder.generate_all_sample_data(**{'num_users': 30, 'rate': 0, 'batch_size': 40, 'seed': 5, 'now': NOW, **kwargs})
+
+def test_resume_finishes_an_interrupted_run(use_client, failing_db, journal):
+    expected = use_client(seeder.MemoryClient())
+    generate()
+    interrupted = True
+    client = failing_db(lambda _, commit: interrupted and commit in (3, 4, 5))
+    generate(journal=journal)
+    assert client.documents.keys() < expected.documents.keys()
+    assert 0 < len(journal.done_units('user/')) < 30
+
+    interrupted = False
+    generate(journal=journal, resume=True, **seeder.resume_settings(journal))
+    assert client.documents.keys() == expected.documents.keys()
+    assert len(journal.done_units('user/')) == 30
+
+def test_resume_settings_round_trip(journal, memory_db):
+    generate(journal=journal, num_users=3, check_ins_per_user=(1, 2), counter_shards=2, timeline_size=5,
+             aggregates=True)
+    settings = seeder.resume_settings(journal)
+    assert settings['num_users'] == 3
+    assert settings['check_ins_per_user'] == (1, 2)
+    assert settings['seed'] == 5
+    assert settings['now'] == NOW
+    assert settings['counter_shards'] == 2
+    assert settings['timeline_size'] == 5
+    assert settings['aggregates'] is True
+
+def test_clear_keeps_an_explicit_worker_count():
+    assert seeder.parse_args(['clear']).workers == seeder.DEFAULT_CLEAR_WORKERS
+    assert seeder.parse_args(['clear', '--workers', '1']).workers == 1
+    assert seeder.parse_args(['generate']).workers == 1
+
+def test_clear_deletes_only_journaled_documents(journal, memory_db):
+    memory_db.documents['users/real'] = {'displayName': 'Real User'}
+    generate(journal=journal)
+    assert journal.document_count() == len(memory_db.documents) - 1
+    seeder.clear_sample_data(journal, rate=0)
+    assert list(memory_db.documents) == ['users/real']
+    assert journal.document_count() == 0
+    assert journal.settings() == {}
@@ -0,0 +1,50 @@
+import io
+import json
+
+import generate_sample_data as seeder
+
+def test_batch_writer_reports_its_commits(memory_db):
+    metrics = seeder.SeedMetrics(io.StringIO())
+    with seeder.BatchWriter(memory_db, batch_size=10, metrics=metrics) as writer:
+        for index in range(25):
+            writer.set(f'users/u{index % 2}/checkIns', f'c{index}', {})
+        writer.set('feed', 'post', {})
+    assert metrics.documents == {'users.checkIns': 25, 'feed': 1}
+    assert metrics.total_documents == 26
+    assert metrics.commits == 3
+    assert sum(metrics.latency_counts) == 3
+
+def test_quantiles_come_from_the_latency_histogram():
+    metrics = seeder.SeedMetrics(io.StringIO())
+    assert metrics.latency_quantile(0.5) is None
+    for seconds in [0.001] * 98 + [5.0] * 2:
+        metrics.record_writes({'feed': 1}, seconds)
+    assert metrics.latency_quantile(0.5) == seeder.COMMIT_LATENCY_BUCKETS[0]
+    assert metrics.latency_quantile(0.99) >= 5.0
+
+def test_progress_goes_to_one_line_per_interval_in_logs():
+    stream = io.StringIO()
+    metrics = seeder.SeedMetrics(stream)
+    metrics.stage('users', 10)
+    for _ in range(10):
+        metrics.advance()
+        metrics.record_writes({'users': 1}, 0.01)
+    metrics.record_error('boom')
+    metrics.finish()
+    lines = stream.getvalue().splitlines()
+    assert len(lines) <= 2
+    assert lines[-1].startswith('users 10/10 | 10 docs')
+    assert '1 errors' in lines[-1]
+
+def test_dump_writes_json_or_prometheus_text(tmp_path):
+    metrics = seeder.SeedMetrics(io.StringIO())
+    metrics.record_writes({'feed': 3}, 0.02)
+    metrics.record_retry()
+    metrics.dump(str(tmp_path / 'metrics.json'))
+    dumped = json.loads((tmp_path / 'metrics.json').read_text())
+    assert dumped['documents'] == {'feed': 3}
+    assert dumped['retries'] == 1
+    metrics.dump(str(tmp_path / 'metrics.prom'))
+    text = (tmp_path / 'metrics.prom').read_text()
+    assert 'seed_documents_written_total{collection="feed"} 3' in text
+    assert 'seed_commit_latency_seconds_count 1' in text
@@ -0,0 +1,53 @@
+import datetime
+import random
+from collections import Counter
+from statistics import mean
+
+import pytest
+
+import generate_sample_data as seeder
+
+np = pytest.importorskip('numpy')
+
+NOW = datetime.datetime(2025, 3, 1, 12)
+SAMPLES = 20000
+
+@pytest.fixture(scope='module')
+def engines():
+    rng = random.Random(1)
+    python = [seeder.generate_check_in('u', 'U', now=NOW, rng=rng) for _ in range(SAMPLES)]
+    columns = seeder.check_in_columns(SAMPLES, now=NOW, rng=np.random.default_rng(1))
+    numpy = list(seeder.check_ins_from_columns(columns, [('u', 'U', None)] * SAMPLES))
+    return python, numpy
+
+def share(check_ins, predicate):
+    return sum(map(predicate, check_ins)) / len(check_ins)
+
+def field_names(check_ins, status):
+    return {key for check_in in check_ins if check_in['status'] == status for key in check_in}
+
+def test_engines_produce_the_same_fields(engines):
+    python, numpy = engines
+    for status in ('workout', 'busy'):
+        assert field_names(python, status) == field_names(numpy, status)
+
+def test_engines_draw_from_the_same_distributions(engines):
+    python, numpy = engines
+    assert share(python, lambda c: c['status'] == 'workout') == pytest.approx(
+        share(numpy, lambda c: c['status'] == 'workout'), abs=0.02)
+    workouts = [[c for c in check_ins if c['status'] == 'workout'] for check_ins in engines]
+    for field in ('duration', 'intensity', 'mood'):
+        assert mean(c[field] for c in workouts[0]) == pytest.approx(mean(c[field] for c in workouts[1]), rel=0.03)
+    assert share(workouts[0], lambda c: 'location' in c) == pytest.approx(
+        share(workouts[1], lambda c: 'location' in c), abs=0.02)
+    activities = [Counter(c['activityType'] for c in check_ins) for check_ins in workouts]
+    assert activities[0].keys() == activities[1].keys()
+    for activity, count in activities[0].items():
+        assert count / len(workouts[0]) == pytest.approx(activities[1][activity] / len(workouts[1]), abs=0.01)
+
+def test_numpy_tags_are_distinct_and_timestamps_in_range(engines):
+    _, numpy = engines
+    for check_in in numpy:
+        assert NOW - datetime.timedelta(days=seeder.DEFAULT_DAYS_BACK + 1) <= check_in['timestamp'] <= NOW
+        if check_in['status'] == 'workout':
+            assert 1 <= len(check_in['tags']) == len(set(check_in['tags'])) <= 5
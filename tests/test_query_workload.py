@@ -0,0 +1,51 @@
+import argparse
+
+import pytest
+
+import query_workload
+
+class StaticQuery:
+    """Query that streams a fixed number of documents, or raises error"""
+
+    def __init__(self, documents, error=None):
+        self.documents = documents
+        self.error = error
+
+    def stream(self):
+        if self.error is not None:
+            raise self.error
+        return iter(range(self.documents))
+
+def test_workload_runs_the_mix_and_counts_reads(monkeypatch, capsys):
+    picked_users = []
+
+    def user_query(db, user_id, now, limit):
+        picked_users.append(user_id)
+        return StaticQuery(3)
+
+    monkeypatch.setattr(query_workload, 'QUERIES', {
+        'user_check_ins': user_query,
+        'feed': lambda *args: StaticQuery(0),
+        'active_stories': lambda *args: StaticQuery(0, RuntimeError('missing index'))
+    })
+    results = query_workload.run_workload(None, ['a', 'b'], {'user_check_ins': 2, 'feed': 1, 'active_stories': 1},
+                                          duration=0.05, concurrency=2, seed=1)
+    queries = results['queries']
+    assert queries['user_check_ins']['queries'] > 0
+    assert queries['user_check_ins']['documents_per_query'] == 3
+    # A query that matches nothing is still billed one read
+    assert queries['feed']['billed_reads'] == queries['feed']['queries']
+    assert queries['active_stories']['queries'] == 0
+    assert queries['active_stories']['errors'] > 0
+    assert set(picked_users) <= {'a', 'b'}
+    assert 'Error running active_stories: missing index' in capsys.readouterr().out
+
+def test_unknown_queries_are_rejected():
+    with pytest.raises(ValueError):
+        query_workload.run_workload(None, ['a'], {'nope': 1}, duration=0)
+
+def test_parse_mix():
+    assert query_workload.parse_mix('feed=3,user_check_ins') == {'feed': 3.0, 'user_check_ins': 1.0}
+    for value in ('nope=1', 'feed=x', 'feed=0'):
+        with pytest.raises(argparse.ArgumentTypeError):
+            query_workload.parse_mix(value)
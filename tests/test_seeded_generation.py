@@ -0,0 +1,43 @@
+import contextlib
+import datetime
+import io
+
+import pytest
+
+import generate_sample_data as seeder
+
+NOW = datetime.datetime(2025, 3, 1, 12)
+
+def export(output_dir, engine='python', **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        seeder.export_sample_data(output_dir, num_users=40, engine=engine, seed=7, now=NOW, **kwargs)
+    return {f"{path}/{doc_id}": data for path, doc_id, data in seeder.read_exported_documents(output_dir)}
+
+def file_bytes(directory):
+    return {path.name: path.read_bytes() for path in sorted(directory.iterdir())}
+
+@pytest.mark.parametrize('engine', ['python', 'numpy'])
+def test_a_seed_reproduces_the_export_byte_for_byte(tmp_path, engine):
+    if engine == 'numpy':
+        pytest.importorskip('numpy')
+    export(tmp_path / 'first', engine)
+    export(tmp_path / 'second', engine)
+    assert file_bytes(tmp_path / 'first') == file_bytes(tmp_path / 'second')
+
+def test_shards_add_up_to_the_unsharded_export(tmp_path):
+    whole = export(tmp_path / 'whole')
+    shards = {}
+    for index in range(3):
+        shards.update(export(tmp_path / 'shards', shard=(index, 3)))
+    assert shards == whole
+
+def test_shard_indices_partition_the_range():
+    parts = [list(seeder.shard_indices(10, (index, 3))) for index in range(3)]
+    assert sorted(sum(parts, [])) == list(range(10))
+
+def test_derived_ids_are_stable_and_distinct():
+    ids = [seeder.derived_id(7, 'user', index) for index in range(1000)]
+    assert ids == [seeder.derived_id(7, 'user', index) for index in range(1000)]
+    assert len(set(ids)) == 1000
+    assert all(len(doc_id) == seeder.DOC_ID_LENGTH for doc_id in ids)
+    assert seeder.derived_id(8, 'user', 0) != ids[0]
@@ -0,0 +1,98 @@
+import random
+
+import pytest
+
+import generate_sample_data as seeder
+import sharded_counters
+
+def test_shards_split_the_post_counts():
+    shards = list(seeder.counter_shard_documents('feed', 'p', {'likes': 7, 'comments': 2, 'caption': 'x'}, 3))
+    assert [(path, doc_id) for path, doc_id, _ in shards] == [('feed/p/counterShards', str(index)) for index in range(3)]
+    assert [data['likes'] for _, _, data in shards] == [3, 2, 2]
+    assert sum(data['comments'] for _, _, data in shards) == 2
+    assert all('caption' not in data for _, _, data in shards)
+
+def test_counter_shard_writer_sends_increments_to_one_shard(memory_db):
+    with seeder.BatchWriter(memory_db) as writer:
+        sink = seeder.CounterShardWriter(writer, 4, rng=random.Random(1))
+        sink.set('feed', 'p', {'userId': 'u', 'likes': 5})
+        sink.set('users/u/checkIns', 'c', {'likes': 5})
+    with seeder.BatchWriter(memory_db) as writer:
+        sink = seeder.CounterShardWriter(writer, 4, rng=random.Random(1))
+        for _ in range(10):
+            sink.update('feed', 'p', {'likes': seeder.Increment(1), 'caption': 'edited'})
+    post = memory_db.documents['feed/p']
+    assert post['likes'] == 5
+    assert post['caption'] == 'edited'
+    assert post['counterShards'] == 4
+    assert post[seeder.COUNTER_ROLLUP_FIELD] == {'likes': 5}
+    assert sum(memory_db.documents[f'feed/p/counterShards/{index}']['likes'] for index in range(4)) == 15
+    assert 'users/u/checkIns/c/counterShards/0' not in memory_db.documents
+    with pytest.raises(ValueError):
+        seeder.CounterShardWriter(writer, 0)
+
+def seed_post(client, post_id, likes, shards=3):
+    with seeder.BatchWriter(client) as writer:
+        seeder.CounterShardWriter(writer, shards).set('feed', post_id, {'likes': likes, 'commentCount': 0})
+
+def add_to_shard(client, post_id, index, **counts):
+    shard = client.documents[f'feed/{post_id}/counterShards/{index}']
+    for field, count in counts.items():
+        shard[field] = shard.get(field, 0) + count
+
+def memory_rollup_post(db, post_id, totals):
+    """rollup_post() over a MemoryClient, its lock standing in for the transaction"""
+    with db.lock:
+        post = db.documents.get(f'feed/{post_id}')
+        changes = sharded_counters.rollup_changes(post, totals) if post is not None else None
+        if changes:
+            post.update(changes)
+        return bool(changes)
+
+def rollup(monkeypatch, post_ids):
+    monkeypatch.setattr(sharded_counters, 'changed_post_pages', lambda db, since, page_size: iter([post_ids]))
+    monkeypatch.setattr(sharded_counters, 'rollup_post', memory_rollup_post)
+    return sharded_counters.rollup_counters(rate=0)
+
+def test_rollup_keeps_likes_written_to_the_post(reading_db, monkeypatch):
+    seed_post(reading_db, 'p', 4)
+    add_to_shard(reading_db, 'p', 0, likes=3)
+    add_to_shard(reading_db, 'p', 2, commentCount=1)
+    # The app's toggleLike writes the post directly
+    reading_db.documents['feed/p']['likes'] += 2
+    assert sharded_counters.read_counters(reading_db, ['p']) == {'p': {'likes': 9, 'commentCount': 1}}
+    checked, updated, _ = rollup(monkeypatch, ['p'])
+    assert (checked, updated) == (1, 1)
+    post = reading_db.documents['feed/p']
+    assert (post['likes'], post['commentCount']) == (9, 1)
+    assert sharded_counters.read_counters(reading_db, ['p']) == {'p': {'likes': 9, 'commentCount': 1}}
+    # Nothing changed since, so the next rollup leaves the post alone
+    assert rollup(monkeypatch, ['p'])[1] == 0
+    add_to_shard(reading_db, 'p', 1, likes=-1)
+    rollup(monkeypatch, ['p'])
+    assert reading_db.documents['feed/p']['likes'] == 8
+
+def test_rollup_sets_posts_without_a_rollup_record_to_the_shard_totals(reading_db, monkeypatch):
+    seed_post(reading_db, 'p', 4)
+    del reading_db.documents['feed/p'][seeder.COUNTER_ROLLUP_FIELD]
+    add_to_shard(reading_db, 'p', 0, likes=1)
+    assert rollup(monkeypatch, ['p', 'missing'])[:2] == (2, 1)
+    post = reading_db.documents['feed/p']
+    assert post['likes'] == 5
+    assert post[seeder.COUNTER_ROLLUP_FIELD] == {'likes': 5, 'commentCount': 0}
+
+def test_overlapping_rollups_apply_a_gain_once(reading_db):
+    seed_post(reading_db, 'p', 4)
+    add_to_shard(reading_db, 'p', 0, likes=3)
+    # Two rollups read the same shard totals before either wrote the post
+    (_, totals), = sharded_counters.counter_totals(reading_db, ['p']).values()
+    add_to_shard(reading_db, 'p', 1, likes=2)
+    (_, newer), = sharded_counters.counter_totals(reading_db, ['p']).values()
+    assert memory_rollup_post(reading_db, 'p', totals)
+    assert not memory_rollup_post(reading_db, 'p', totals)
+    assert reading_db.documents['feed/p']['likes'] == 7
+    # Totals read after ones written later still leave the post consistent
+    assert memory_rollup_post(reading_db, 'p', newer)
+    assert memory_rollup_post(reading_db, 'p', totals)
+    assert reading_db.documents['feed/p']['likes'] == 7
+    assert sharded_counters.read_counters(reading_db, ['p']) == {'p': {'likes': 9, 'commentCount': 0}}
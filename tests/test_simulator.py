@@ -0,0 +1,62 @@
+import asyncio
+import datetime
+import io
+
+import pytest
+
+import generate_sample_data as seeder
+
+@pytest.fixture(scope='module')
+def simulated():
+    """Run a second of simulated traffic with short-lived stories against a MemoryClient"""
+    client = seeder.MemoryClient()
+    metrics = seeder.SeedMetrics(io.StringIO())
+    writer = seeder.BatchWriter(client, metrics=metrics)
+    rates = {'check_in': 40, 'story': 20, 'like': 60, 'comment': 30, 'follow': 10}
+    simulator = seeder.TrafficSimulator(writer, 50, seed=1, rates=rates, metrics=metrics,
+                                        story_lifetime=datetime.timedelta(seconds=0.2))
+    asyncio.run(simulator.run(duration=1.0))
+    writer.close()
+    return simulator, client.documents
+
+def documents_in(documents, collection):
+    return {path: data for path, data in documents.items() if path.startswith(f'{collection}/')}
+
+def test_events_arrive_at_their_rates(simulated):
+    simulator, _ = simulated
+    for kind, rate in simulator.rates.items():
+        assert simulator.emitted[kind] == pytest.approx(rate, rel=0.25)
+
+def test_comment_counts_match_the_comments(simulated):
+    _, documents = simulated
+    comments = documents_in(documents, 'postComments')
+    assert comments
+    assert sum(data.get('commentCount', 0) for data in documents_in(documents, 'feed').values()) == len(comments)
+    assert all(f"feed/{data['postId']}" in documents for data in comments.values())
+
+def test_expired_stories_are_deleted_with_their_copies(simulated):
+    simulator, documents = simulated
+    left = {f'{path}/{doc_id}' for _, copies in simulator.stories for path, doc_id in copies}
+    stories = set(documents_in(documents, 'stories'))
+    feed_stories = {path for path, data in documents_in(documents, 'feed').items() if data.get('type') == 'story'}
+    assert simulator.emitted['story'] > len(stories)
+    assert stories | feed_stories <= left
+
+def test_follows_use_seeded_users(simulated):
+    _, documents = simulated
+    users = {seeder.user_id_for(1, index) for index in range(50)}
+    follows = [path.split('/') for path in documents if '/following/' in path]
+    assert follows
+    assert all(follower in users and followee in users for _, follower, _, followee in follows)
+
+def test_expired_story_copies_take_their_counter_shards_along():
+    client = seeder.MemoryClient()
+    with seeder.BatchWriter(client) as writer:
+        sink = seeder.CounterShardWriter(writer, 2)
+        simulator = seeder.TrafficSimulator(sink, 20, seed=2, rates={'story': 40, 'like': 20},
+                                            story_lifetime=datetime.timedelta(seconds=0.1))
+        asyncio.run(simulator.run(duration=0.6))
+    shards = [path for path in client.documents if '/counterShards/' in path]
+    assert shards
+    assert simulator.emitted['story'] > len(documents_in(client.documents, 'stories'))
+    assert all(path.split('/counterShards/')[0] in client.documents for path in shards)
@@ -0,0 +1,30 @@
+from collections import Counter
+
+import generate_sample_data as seeder
+
+def test_edges_have_no_self_follows_or_duplicates():
+    edges = list(seeder.social_graph_edges(2000, seed=1))
+    assert len(edges) == len(set(edges))
+    assert all(follower != followee for follower, followee in edges)
+    assert all(0 <= index < 2000 for edge in edges for index in edge)
+
+def test_following_counts_stay_within_bounds():
+    following = Counter(follower for follower, _ in seeder.social_graph_edges(2000, seed=1, max_following=50))
+    assert len(following) == 2000
+    assert max(following.values()) <= 50
+    assert min(following.values()) >= 1
+
+def test_follower_counts_are_heavy_tailed():
+    followers = Counter(followee for _, followee in seeder.social_graph_edges(5000, seed=2))
+    counts = sorted(followers.values(), reverse=True)
+    # The most followed 1% of users draw far more than 1% of all follows
+    assert sum(counts[:50]) > 0.2 * sum(counts)
+
+def test_shards_split_the_edges_by_follower():
+    whole = list(seeder.social_graph_edges(500, seed=3))
+    shards = [edge for index in range(4) for edge in seeder.social_graph_edges(500, seed=3, shard=(index, 4))]
+    assert sorted(shards) == sorted(whole)
+
+def test_every_follow_writes_both_directions():
+    documents = list(seeder.follow_documents('a', 'b'))
+    assert [(path, doc_id) for path, doc_id, _ in documents] == [('users/a/following', 'b'), ('users/b/followers', 'a')]
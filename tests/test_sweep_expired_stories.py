@@ -0,0 +1,67 @@
+import datetime
+import types
+
+import generate_sample_data as seeder
+import sweep_expired_stories
+
+NOW = datetime.datetime(2025, 3, 1, 12, tzinfo=datetime.timezone.utc)
+
+def memory_story_pages(db, now, page_size):
+    """expired_story_pages() over a MemoryClient"""
+    expired = sorted((data['expiresAt'], path) for path, data in db.documents.items()
+                     if path.startswith('stories/') and path.count('/') == 1 and data['expiresAt'] <= now)
+    for start in range(0, len(expired), page_size):
+        yield [types.SimpleNamespace(id=path.rpartition('/')[2]) for _, path in expired[start:start + page_size]]
+
+def memory_linked_documents(db, story_ids):
+    """linked_documents() over a MemoryClient"""
+    for path, data in list(db.documents.items()):
+        if data.get('storyId') in story_ids:
+            collection, _, doc_id = path.rpartition('/')
+            yield collection, doc_id, data.get('counterShards') or 0
+
+def seed_stories(client, count):
+    for index in range(count):
+        story_id = f's{index:02}'
+        expires_at = NOW + datetime.timedelta(hours=index - count // 2)
+        client.documents[f'stories/{story_id}'] = {'expiresAt': expires_at}
+        client.documents[f'feed/f{story_id}'] = {'storyId': story_id}
+        client.documents[f'users/u{index % 3}/stories/{story_id}'] = {'storyId': story_id}
+
+def use_memory_queries(monkeypatch):
+    monkeypatch.setattr(sweep_expired_stories, 'expired_story_pages', memory_story_pages)
+    monkeypatch.setattr(sweep_expired_stories, 'linked_documents', memory_linked_documents)
+
+def test_sweep_deletes_expired_stories_and_their_links(memory_db, monkeypatch):
+    use_memory_queries(monkeypatch)
+    seed_stories(memory_db, 20)
+    assert sweep_expired_stories.sweep_expired_stories(NOW, workers=3, rate=0, page_size=4) == (11, 22)
+    assert sorted(path for path in memory_db.documents if path.startswith('stories/')) == [
+        f'stories/s{index:02}' for index in range(11, 20)]
+    assert len(memory_db.documents) == 9 * 3
+
+def test_dry_run_deletes_nothing(memory_db, monkeypatch):
+    use_memory_queries(monkeypatch)
+    seed_stories(memory_db, 6)
+    assert sweep_expired_stories.sweep_expired_stories(NOW, rate=0, dry_run=True) == (4, 8)
+    assert len(memory_db.documents) == 18
+
+def test_failed_pages_keep_their_stories_for_the_next_sweep(failing_db, monkeypatch):
+    use_memory_queries(monkeypatch)
+    client = failing_db(lambda writes, commit: commit == 1)
+    seed_stories(client, 6)
+    assert sweep_expired_stories.sweep_expired_stories(NOW, workers=1, rate=0, batch_size=2, page_size=2) == (2, 4)
+    # The failed commit held links only, so the page's stories survive and the next sweep finds their links again
+    assert {'stories/s00', 'stories/s01'} <= set(client.documents)
+    assert sweep_expired_stories.sweep_expired_stories(NOW, rate=0) == (2, 4)
+    assert len(client.documents) == 2 * 3
+
+def test_sweep_deletes_the_counter_shards_of_feed_copies(memory_db, monkeypatch):
+    use_memory_queries(monkeypatch)
+    with seeder.BatchWriter(memory_db) as writer:
+        sink = seeder.CounterShardWriter(writer, 3)
+        sink.set('stories', 's1', {'expiresAt': NOW})
+        sink.set('feed', 'fs1', {'storyId': 's1', 'likes': 4})
+        sink.set('feed', 'post', {'likes': 1})
+    assert sweep_expired_stories.sweep_expired_stories(NOW, rate=0) == (1, 4)
+    assert sorted(memory_db.documents) == ['feed/post', *(f'feed/post/counterShards/{index}' for index in range(3))]
@@ -0,0 +1,55 @@
+import types
+
+import sync_profile_copies
+
+def memory_copy_pages(db, collection_group, user_id, page_size):
+    """copy_pages() over a MemoryClient, paged by document path"""
+    paths = sorted(path for path, data in db.documents.items()
+                   if path.split('/')[-2] == collection_group and data.get('userId') == user_id)
+    for start in range(0, len(paths), page_size):
+        yield [types.SimpleNamespace(id=path.rpartition('/')[2], reference=types.SimpleNamespace(path=path),
+                                     to_dict=lambda path=path: dict(db.documents[path]))
+               for path in paths[start:start + page_size]]
+
+def seed_copies(client, users, copies):
+    for index in range(users):
+        user_id = f'u{index}'
+        client.documents[f'users/{user_id}'] = {'displayName': f'New {index}', 'photoURL': f'p{index}'}
+        for copy in range(copies):
+            name = f'New {index}' if copy % 3 == 0 else 'Old'
+            for path in ('feed', f'users/{user_id}/checkIns'):
+                client.documents[f'{path}/{user_id}c{copy:03}'] = {
+                    'userId': user_id, 'userDisplayName': name, 'userPhotoURL': f'p{index}'}
+
+def test_sync_rewrites_only_stale_copies(reading_db, monkeypatch):
+    client = reading_db
+    monkeypatch.setattr(sync_profile_copies, 'copy_pages', memory_copy_pages)
+    seed_copies(client, 5, 30)
+    result = sync_profile_copies.sync_profile_copies(['u0', 'u1', 'u2', 'missing'], workers=4, rate=0,
+                                                     batch_size=7, page_size=8)
+    assert result['users'] == 3
+    assert result['scanned'] == 3 * 60
+    assert result['stale'] == result['updated'] == 3 * 40
+    assert result['collection_groups']['checkIns'] == {'scanned': 90, 'stale': 60}
+    stale_users = {data['userId'] for data in client.documents.values() if data.get('userDisplayName') == 'Old'}
+    assert stale_users == {'u3', 'u4'}
+    assert sync_profile_copies.sync_profile_copies(['u0', 'u1', 'u2'], rate=0)['stale'] == 0
+
+def test_profiles_are_read_in_chunks(reading_db):
+    client = reading_db
+    seed_copies(client, 5, 0)
+    profiles = list(sync_profile_copies.current_profiles(client, ['u0', 'u1', 'nope', 'u3', 'u4'], chunk_size=2))
+    assert client.get_all_sizes == [2, 2, 1]
+    assert [user_id for user_id, _ in profiles] == ['u0', 'u1', 'nope', 'u3', 'u4']
+    assert profiles[2][1] is None
+    assert profiles[0][1] == {'userDisplayName': 'New 0', 'userPhotoURL': 'p0'}
+
+def test_dry_run_counts_without_writing(reading_db, monkeypatch):
+    client = reading_db
+    monkeypatch.setattr(sync_profile_copies, 'copy_pages', memory_copy_pages)
+    seed_copies(client, 2, 9)
+    before = {path: dict(data) for path, data in client.documents.items()}
+    result = sync_profile_copies.sync_profile_copies(['u0', 'u1'], ['feed'], dry_run=True, rate=0)
+    assert result['stale'] == 2 * 6
+    assert result['updated'] == 0
+    assert client.documents == before
@@ -0,0 +1,24 @@
+import random
+
+import generate_sample_data as seeder
+
+def test_display_names_stay_unique_past_the_name_pairs():
+    count = len(seeder.first_names) * len(seeder.last_names) * 2 + 10
+    names = [seeder.synthetic_user(index, random.Random(index))['displayName'] for index in range(count)]
+    assert len(set(names)) == count
+
+def test_streak_stays_in_the_range_of_the_fitness_level():
+    rng = random.Random(3)
+    levels = {user['fitnessLevel'] for user in seeder.sample_users}
+    for index in range(500):
+        user = seeder.synthetic_user(index, rng)
+        assert user['fitnessLevel'] in levels
+        low, high = seeder.streak_ranges[user['fitnessLevel']]
+        assert low <= user['streak'] <= high
+
+def test_check_ins_per_user_follows_the_requested_range():
+    rng = random.Random(5)
+    for index in range(50):
+        documents = list(seeder.user_documents(f'user{index}', seeder.synthetic_user(index, rng), (2, 4), rng=rng))
+        check_ins = [doc for path, _, doc in documents if path == f'users/user{index}/checkIns']
+        assert 2 <= len(check_ins) <= 4
@@ -0,0 +1,44 @@
+import contextlib
+import datetime
+import io
+from collections import defaultdict
+
+import pytest
+
+import generate_sample_data as seeder
+
+NOW = datetime.datetime(2025, 3, 1, 12)
+TIMELINE_SIZE = 15
+
+@pytest.fixture(scope='module')
+def documents(tmp_path_factory):
+    output_dir = tmp_path_factory.mktemp('export')
+    with contextlib.redirect_stdout(io.StringIO()):
+        seeder.export_sample_data(output_dir, num_users=60, seed=4, now=NOW, timeline_size=TIMELINE_SIZE)
+    return list(seeder.read_exported_documents(output_dir))
+
+def test_timelines_hold_the_newest_posts_of_followees(documents):
+    posts = defaultdict(list)
+    following = defaultdict(set)
+    timelines = defaultdict(list)
+    for path, doc_id, data in documents:
+        if path == 'feed':
+            posts[data['userId']].append((data['timestamp'], doc_id))
+        elif path.endswith('/following'):
+            following[path.split('/')[1]].add(doc_id)
+        elif path.endswith('/timeline'):
+            timelines[path.split('/')[1]].append((data['timestamp'], doc_id))
+    assert following
+    for user_id, followees in following.items():
+        expected = sorted((post for followee in followees for post in posts[followee]), reverse=True)
+        assert sorted(timelines[user_id], reverse=True) == expected[:TIMELINE_SIZE]
+
+def test_timeline_entries_copy_the_feed_post(documents):
+    feed = {doc_id: data for path, doc_id, data in documents if path == 'feed'}
+    entries = [data for path, _, data in documents if path.endswith('/timeline')]
+    assert entries
+    for entry in entries:
+        post = feed[entry['feedId']]
+        for field in ('userId', 'userDisplayName', 'userPhotoURL', 'timestamp', 'activityType', 'photoUrl'):
+            assert entry.get(field) == post.get(field)
+        assert entry['type'] == post.get('type', 'checkIn')
@@ -0,0 +1,58 @@
+import datetime
+import random
+from collections import Counter
+
+import pytest
+
+import generate_sample_data as seeder
+
+# A Saturday evening, so the window covers whole weeks and today's late hours lie in the future
+NOW = datetime.datetime(2025, 3, 1, 20, 30)
+DAYS_BACK = 27
+
+@pytest.mark.parametrize('name', list(seeder.TIMESTAMP_MODELS))
+def test_timestamps_stay_inside_the_window(name):
+    model = seeder.timestamp_model(name)
+    rng = random.Random(1)
+    for _ in range(5000):
+        timestamp = model.sample(DAYS_BACK, NOW, rng, model.user_habit(rng))
+        assert NOW - datetime.timedelta(days=DAYS_BACK + 1) <= timestamp <= NOW
+
+def test_diurnal_timestamps_follow_the_hourly_profile():
+    model = seeder.DiurnalTimestamps()
+    rng = random.Random(2)
+    hours = Counter(model.sample(DAYS_BACK, NOW, rng).hour for _ in range(20000))
+    assert hours[18] > 5 * hours[3]
+    assert hours[7] > 2 * hours[10]
+
+def test_habits_cluster_a_users_posts():
+    model = seeder.DiurnalTimestamps()
+    rng = random.Random(3)
+    habit = 12.5
+    hours = [model.sample(DAYS_BACK, NOW, rng, habit) for _ in range(2000)]
+    near = sum(abs(timestamp.hour + timestamp.minute / 60 - habit) <= 2 for timestamp in hours)
+    assert near / len(hours) > seeder.HABIT_SHARE * 0.9
+
+def test_numpy_draws_match_the_python_ones():
+    np = pytest.importorskip('numpy')
+    model = seeder.DiurnalTimestamps()
+    rng = random.Random(4)
+    python = Counter(model.sample(DAYS_BACK, NOW, rng).hour for _ in range(20000))
+    microseconds = model.sample_array(20000, DAYS_BACK, NOW, np.random.default_rng(4))
+    assert microseconds.max() <= NOW.timestamp() * 1_000_000
+    numpy = Counter(datetime.datetime.fromtimestamp(value / 1_000_000).hour for value in microseconds.tolist())
+    for hour in range(24):
+        assert numpy[hour] / 20000 == pytest.approx(python[hour] / 20000, abs=0.01)
+
+def test_unknown_models_are_rejected():
+    with pytest.raises(ValueError):
+        seeder.timestamp_model('lunar')
+
+def test_append_stamps_check_ins_with_the_wall_clock(memory_db):
+    start = datetime.datetime.now()
+    seeder.append_check_ins(5, seed=1, rate=200, duration=0.1)
+    check_ins = [data for path, data in memory_db.documents.items() if path.startswith('feed/')]
+    assert check_ins
+    assert all(start <= data['timestamp'] <= datetime.datetime.now() for data in check_ins)
+    owners = {seeder.user_id_for(1, index) for index in range(5)}
+    assert {data['userId'] for data in check_ins} <= owners